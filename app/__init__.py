@@ -7,47 +7,114 @@ Created on Tue Jan 13 14:09:11 2026
 
 from flask import Flask
 from flask_login import LoginManager
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from apscheduler.schedulers.background import BackgroundScheduler
 from dotenv import load_dotenv
+import atexit
 import os
 
 from .db import Base
-from .models import User
-from .services.notifications import process_notification_queue
-from .services.no_show import mark_no_shows
+from .engine import make_engine
+from .migrations import upgrade_schema
+from .services.notifications import NotificationDispatcher
+from .services.transports import make_transport
+from .services.interval_index import IntervalIndex
+from .services.leases import Lease
+from .services.no_show import NoShowTimer
+from .services.occupancy import OccupancyMap
+from .services.cache import TTLCache, bump_cache_version
+from .services.events import EventBus, BUS_KEY
+from .services.utilisation import mark_windows_dirty
+from .jobs import shared_jobs, local_jobs, add_jobs, LEASE_NAME
+from .services import dashboard, site_stats, identity
+from .services.identity import cached_identity
+from .services.machine_search import ensure_machine_search
+from .services.audit import AuditSink
+from .services.hashing import PasswordHasher
+from .services.pagination import page_url, PAGE_SIZES
 
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
-def create_app():
+def create_app(run_scheduler: bool | None = None, web: bool = True):
+    """Build the app. ``web=False`` is the worker's cut: the database, the event handlers
+    that write to it, the notification dispatcher and the no-show timer, without the
+    in-memory indexes, caches, views, audit sink, password pool or scheduler.
+    """
     load_dotenv()
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
     db_url = os.getenv("DATABASE_URL", "sqlite:///app.db")
 
-    engine = create_engine(
-        db_url,
-        echo=False,
-        future=True,
-        connect_args={"check_same_thread": False} if db_url.startswith("sqlite") else {},
-    )
+    engine = make_engine(db_url)
+    bus = EventBus()
     SessionLocal = scoped_session(
-        sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+        sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True, info={BUS_KEY: bus})
     )
 
     app.session_factory = SessionLocal
     app.engine = engine
 
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    ensure_machine_search(engine)
+
+    _subscribe_db_handlers(bus)
+    app.event_bus = bus
+
+    dispatcher = NotificationDispatcher(
+        SessionLocal,
+        transport=make_transport(os.getenv("NOTIFICATION_TRANSPORT", "console")),
+        workers=int(os.getenv("NOTIFICATION_WORKERS", "8")),
+    )
+    app.notification_dispatcher = dispatcher
+    # Whole months of audit rows older than this move to gzipped JSONL files (see services/audit_archive.py).
+    app.audit_archive_dir = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+    app.audit_retention_days = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))
+
+    if not web:
+        # Started by the worker once it knows whether it holds the lease.
+        app.no_show_timer = NoShowTimer(SessionLocal)
+        return app
+
+    # Approved booking spans per machine, used for fast conflict checks
+    conflict_index = IntervalIndex()
+    with SessionLocal() as db:
+        conflict_index.build(db)
+    app.conflict_index = conflict_index
+    # Approved bookings as 15-minute slot bitmaps per machine, for the timeline view
+    occupancy = OccupancyMap()
+    with SessionLocal() as db:
+        occupancy.build(db)
+    app.occupancy = occupancy
+
+    # Per-site machine counts for the map and the dashboard aggregates. Entries are keyed
+    # by a version stamp in the database, so every process sees a change on its next request.
+    app.site_stats_cache = TTLCache(ttl=float(os.getenv("SITE_STATS_TTL", "30")))
+    app.dashboard_cache = TTLCache(ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "300")), maxsize=32)
+    # Snapshots of signed-in users for the login manager. Changes made in this process drop the
+    # entry on commit; other processes pick them up when the entry expires.
+    user_cache = TTLCache(ttl=float(os.getenv("USER_CACHE_TTL", "60")), maxsize=int(os.getenv("USER_CACHE_SIZE", "4096")))
+    app.user_cache = user_cache
+
+    # Exact no-show deadlines for approved bookings, kept current by the booking events below.
+    # Loaded and started with the scheduler; other processes leave it empty.
+    no_show_timer = NoShowTimer(SessionLocal, conflict_index)
+    app.no_show_timer = no_show_timer
+
+    _subscribe_handlers(bus, conflict_index, occupancy, no_show_timer, user_cache)
+
+    app.add_template_global(page_url)
+    app.add_template_global(PAGE_SIZES, "page_sizes")
 
     login_manager.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        with SessionLocal() as db:
-            return db.get(User, int(user_id))
+        try:
+            return cached_identity(user_cache, SessionLocal, int(user_id))
+        except ValueError:
+            return None
 
     from .blueprints.auth import bp as auth_bp
     from .blueprints.bookings import bp as bookings_bp
@@ -59,10 +126,35 @@ def create_app():
     app.register_blueprint(admin_bp)
     app.register_blueprint(map_bp)
 
-    # Background jobs (advanced programming)
+    # Low-value audit rows (sign-ins and sign-outs) are queued and written in batches off the request path.
+    audit_sink = AuditSink(
+        SessionLocal,
+        maxsize=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+        batch=int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+    )
+    audit_sink.start()
+    atexit.register(audit_sink.close)
+    app.audit_sink = audit_sink
+    # Password hashing runs on a small process pool with a bounded queue; see services/hashing.py.
+    password_hasher = PasswordHasher(
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16")),
+        queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2")),
+    )
+    atexit.register(password_hasher.shutdown)
+    app.password_hasher = password_hasher
+
+    # Background jobs. Shared jobs run in whichever process holds the scheduler lease;
+    # set SCHEDULER_ENABLED=0 to leave them to `python -m app.worker`.
+    if run_scheduler is None:
+        run_scheduler = os.getenv("SCHEDULER_ENABLED", "1") == "1"
     scheduler = BackgroundScheduler(daemon=True)
-    scheduler.add_job(lambda: process_notification_queue(SessionLocal), "interval", seconds=30, id="notifications")
-    scheduler.add_job(lambda: mark_no_shows(SessionLocal), "interval", minutes=5, id="no_show")
+    add_jobs(scheduler, local_jobs(SessionLocal, conflict_index, occupancy))
+    if run_scheduler:
+        lease = Lease(SessionLocal, LEASE_NAME, ttl=float(os.getenv("SCHEDULER_LEASE_SECONDS", "90")))
+        add_jobs(scheduler, shared_jobs(SessionLocal, dispatcher, no_show_timer, app.audit_archive_dir, app.audit_retention_days), lease)
+        app.scheduler_lease = lease
+        no_show_timer.start(lease)
     scheduler.start()
     app.scheduler = scheduler
 
@@ -71,3 +163,29 @@ def create_app():
         SessionLocal.remove()
 
     return app
+
+
+def _subscribe_db_handlers(bus: EventBus):
+    # Writes that commit with the change itself; needed wherever bookings change, the worker included.
+    def dirty_utilisation(db, payloads):
+        windows = [(p["machine_ids"], p["start_at"], p["end_at"]) for p in payloads if p.get("was_approved", True)]
+        mark_windows_dirty(db, windows)
+
+    bus.subscribe(dashboard.INVALIDATED_BY, lambda db, ps: bump_cache_version(db, dashboard.CACHE_NAME), phase="before_commit", batch=True)
+    bus.subscribe(site_stats.INVALIDATED_BY, lambda db, ps: bump_cache_version(db, site_stats.CACHE_NAME), phase="before_commit", batch=True)
+    bus.subscribe(["booking.approved", "booking.cancelled"], dirty_utilisation, phase="before_commit", batch=True)
+
+
+def _subscribe_handlers(bus: EventBus, conflict_index: IntervalIndex, occupancy: OccupancyMap, no_show_timer: NoShowTimer, user_cache: TTLCache):
+    # This process's in-memory state, updated once a change has committed.
+    def drop_span(p):
+        if p["was_approved"]:
+            conflict_index.remove(p["booking_id"])
+            occupancy.remove(p["booking_id"])
+
+    bus.subscribe("booking.approved", lambda p: conflict_index.add(p["booking_id"], p["machine_ids"], p["start_at"], p["end_at"]))
+    bus.subscribe("booking.approved", lambda p: occupancy.add(p["booking_id"], p["machine_ids"], p["start_at"], p["end_at"]))
+    bus.subscribe("booking.cancelled", drop_span)
+    bus.subscribe("booking.approved", lambda p: no_show_timer.schedule(p["booking_id"], p["end_at"]))
+    bus.subscribe(["booking.cancelled", "booking.checked_in"], lambda p: no_show_timer.discard(p["booking_id"]))
+    bus.subscribe(identity.INVALIDATED_BY, lambda p: user_cache.invalidate(p["user_id"]))
@@ -5,17 +5,26 @@ Created on Tue Jan 13 14:18:54 2026
 @author: NBoyd1
 """
 
-import csv
-import io
-from sqlalchemy.orm import joinedload
+from collections import Counter
+from itertools import islice
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, Response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, Response, stream_with_context, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import select, func
-from ..models import User, BookingRequest, Machine, AuditLog
-from ..services.booking_rules import has_conflicts_for_approved_bookings
-from ..services.utilisation import utilisation_last_days
+from ..models import User, BookingRequest, Machine
+from ..services.decisions import decide_bookings, ACTIONS, ORDERS
+from ..services.utilisation import WINDOWS
+from ..services.cache import cache_version
+from ..services.events import emit
+from ..services.pagination import PageRequest
 from ..services.notifications import queue_notification
+from ..services import queries, exports
+from ..services.audit import audit
+from ..services.audit_archive import search_audit
+from ..services.dashboard import dashboard_summary, CACHE_NAME as DASHBOARD_CACHE
+from ..services.machine_search import machine_facets, filters_from_args
+from ..services.occupancy import RESOLUTIONS
+from ..services.booking_rules import parse_utc
 from ..security import require_role
 
 
@@ -34,43 +43,42 @@ def dashboard():
         return redirect(url_for("bookings.my_bookings"))
 
     status = request.args.get("status", "pending")
+    days = request.args.get("days", 30, type=int)
+    if days not in WINDOWS:
+        days = 30
     with current_app.session_factory() as db:
-        util = utilisation_last_days(db, days=30)
-
-        upcoming = db.execute(
-            select(BookingRequest)
-            .where(BookingRequest.start_at >= datetime.utcnow() - timedelta(days=1))
-            .order_by(BookingRequest.start_at.asc())
-            .limit(50)
-        ).scalars().all()
-
-        cancellations_30 = db.execute(
-            select(func.count()).select_from(BookingRequest)
-            .where(BookingRequest.status == "cancelled", BookingRequest.cancelled_at >= datetime.utcnow() - timedelta(days=30))
-        ).scalar_one()
-
-        no_shows_30 = db.execute(
-            select(func.count()).select_from(BookingRequest)
-            .where(BookingRequest.no_show.is_(True), BookingRequest.end_at >= datetime.utcnow() - timedelta(days=30))
-        ).scalar_one()
-
-        out_of_service = db.execute(
-            select(func.count()).select_from(Machine).where(Machine.status == "out_of_service")
-        ).scalar_one()
-
-        pending_bookings = db.execute(
-            select(BookingRequest).where(BookingRequest.status == status).order_by(BookingRequest.start_at.asc()).limit(100)
-        ).scalars().all()
+        version = cache_version(db, DASHBOARD_CACHE)
+        summary = current_app.dashboard_cache.get_or_set(
+            ("summary", days, version), lambda: dashboard_summary(db, days)
+        )
+        upcoming = queries.upcoming_bookings(
+            db, datetime.utcnow() - timedelta(days=1), PageRequest.from_args(request.args, "up_", per_page=50)
+        )
+        pending_bookings = queries.bookings_with_status(db, status, PageRequest.from_args(request.args, per_page=100))
 
     return render_template(
         "admin_dashboard.html",
-        util=util,
+        **summary,
         upcoming=upcoming,
-        cancellations_30=cancellations_30,
-        no_shows_30=no_shows_30,
-        out_of_service=out_of_service,
         pending_bookings=pending_bookings,
         status=status,
+        windows=WINDOWS,
+    )
+
+@bp.get("/metrics.json")
+@login_required
+def metrics():
+    if not _require({"admin"}):
+        return redirect(url_for("admin.dashboard"))
+    return jsonify(
+        caches={
+            "dashboard": current_app.dashboard_cache.stats(),
+            "site_stats": current_app.site_stats_cache.stats(),
+            "users": current_app.user_cache.stats(),
+        },
+        occupancy=current_app.occupancy.stats(),
+        audit_sink=current_app.audit_sink.stats(),
+        password_hasher=current_app.password_hasher.stats(),
     )
 
 @bp.get("/users")
@@ -79,8 +87,8 @@ def users():
     if not _require({"admin"}):
         return redirect(url_for("admin.dashboard"))
     with current_app.session_factory() as db:
-        pending = db.execute(select(User).where(User.status == "pending").order_by(User.created_at.asc())).scalars().all()
-        active = db.execute(select(User).where(User.status == "active").order_by(User.created_at.desc()).limit(50)).scalars().all()
+        pending = queries.users_with_status(db, "pending", page=PageRequest.from_args(request.args, "pending_"))
+        active = queries.users_with_status(db, "active", newest_first=True, page=PageRequest.from_args(request.args, "active_"))
     return render_template("admin_users.html", pending=pending, active=active)
 
 @bp.post("/users/<int:user_id>/approve")
@@ -94,7 +102,8 @@ def approve_user(user_id: int):
             flash("User not found.", "danger")
             return redirect(url_for("admin.users"))
         u.status = "active"
-        db.add(AuditLog(actor_email=current_user.email, action="user_approve", detail=f"Approved user {u.email}"))
+        audit(db, current_user.email, "user_approve", f"Approved user {u.email}")
+        emit(db, "user.approved", user_id=u.id)
         queue_notification(db, u.id, "Your account has been approved. You can now sign in.")
         db.commit()
     flash("User approved.", "success")
@@ -111,7 +120,8 @@ def reject_user(user_id: int):
             flash("User not found.", "danger")
             return redirect(url_for("admin.users"))
         u.status = "rejected"
-        db.add(AuditLog(actor_email=current_user.email, action="user_reject", detail=f"Rejected user {u.email}"))
+        audit(db, current_user.email, "user_reject", f"Rejected user {u.email}")
+        emit(db, "user.rejected", user_id=u.id)
         queue_notification(db, u.id, "Your account request has been rejected. Contact an admin if you think this is an error.")
         db.commit()
     flash("User rejected.", "info")
@@ -124,32 +134,15 @@ def approve_booking(booking_id: int):
         return redirect(url_for("admin.dashboard"))
 
     with current_app.session_factory() as db:
-        b = db.get(BookingRequest, booking_id)
-        if not b or b.status != "pending":
-            flash("Booking not found or not pending.", "warning")
-            return redirect(url_for("admin.dashboard"))
-
-        machine_ids = [it.machine_id for it in b.items]
-        if has_conflicts_for_approved_bookings(db, machine_ids, b.start_at, b.end_at):
-            b.status = "rejected"
-            b.approver_id = current_user.id
-            b.decision_note = "Rejected due to conflict with an existing approved booking."
-            b.decided_at = datetime.utcnow()
-            db.add(AuditLog(actor_email=current_user.email, action="booking_reject", detail=f"Rejected booking #{b.id} due to conflict"))
-            queue_notification(db, b.requester_id, f"Booking #{b.id} rejected: conflict with an existing approved booking.")
-            db.commit()
-            flash("Cannot approve: conflict detected. The request has been rejected.", "danger")
-            return redirect(url_for("admin.dashboard"))
-
-        b.status = "approved"
-        b.approver_id = current_user.id
-        b.decision_note = "Approved"
-        b.decided_at = datetime.utcnow()
-        db.add(AuditLog(actor_email=current_user.email, action="booking_approve", detail=f"Approved booking #{b.id}"))
-        queue_notification(db, b.requester_id, f"Booking #{b.id} approved.")
+        outcome, = decide_bookings(db, [booking_id], "approve", current_user)
         db.commit()
 
-    flash("Booking approved.", "success")
+    if outcome["outcome"] == "skipped":
+        flash("Booking not found or not pending.", "warning")
+    elif outcome["outcome"] == "rejected":
+        flash("Cannot approve: conflict detected. The request has been rejected.", "danger")
+    else:
+        flash("Booking approved.", "success")
     return redirect(url_for("admin.dashboard"))
 
 @bp.post("/booking/<int:booking_id>/reject")
@@ -159,38 +152,199 @@ def reject_booking(booking_id: int):
         return redirect(url_for("admin.dashboard"))
     note = (request.form.get("note") or "").strip()[:300]
     with current_app.session_factory() as db:
-        b = db.get(BookingRequest, booking_id)
-        if not b or b.status != "pending":
-            flash("Booking not found or not pending.", "warning")
-            return redirect(url_for("admin.dashboard"))
-        b.status = "rejected"
-        b.approver_id = current_user.id
-        b.decision_note = note or "Rejected"
-        b.decided_at = datetime.utcnow()
-        db.add(AuditLog(actor_email=current_user.email, action="booking_reject", detail=f"Rejected booking #{b.id}"))
-        queue_notification(db, b.requester_id, f"Booking #{b.id} rejected: {b.decision_note}")
+        outcome, = decide_bookings(db, [booking_id], "reject", current_user, note=note or None)
         db.commit()
-    flash("Booking rejected.", "info")
+
+    if outcome["outcome"] == "skipped":
+        flash("Booking not found or not pending.", "warning")
+    else:
+        flash("Booking rejected.", "info")
     return redirect(url_for("admin.dashboard"))
 
+def _valid_decision_body(data) -> bool:
+    if not isinstance(data, dict):
+        return False
+    ids = data.get("booking_ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return False
+    return all(data.get(k) is None or isinstance(data[k], str) for k in ("action", "order", "note"))
+
+@bp.post("/bookings/decide")
+@login_required
+def decide_many():
+    # Form posts from the dashboard redirect back with a summary; JSON posts get per-booking outcomes.
+    if not _require({"approver", "admin"}):
+        if request.is_json:
+            return jsonify(error="forbidden"), 403
+        return redirect(url_for("admin.dashboard"))
+
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not _valid_decision_body(data):
+            return jsonify(error="expected an object with booking_ids (a list of integers), action, and optional order and note strings"), 400
+        booking_ids = data["booking_ids"]
+    else:
+        data = request.form
+        try:
+            booking_ids = [int(i) for i in request.form.getlist("booking_ids")]
+        except ValueError:
+            booking_ids = None
+    action = data.get("action")
+    order = data.get("order") or "first_come"
+    note = (data.get("note") or "").strip()[:300] or None
+
+    if not booking_ids or action not in ACTIONS or order not in ORDERS:
+        if request.is_json:
+            return jsonify(error="booking_ids, a valid action and order are required"), 400
+        flash("Select at least one booking.", "warning")
+        return redirect(url_for("admin.dashboard"))
+
+    with current_app.session_factory() as db:
+        outcomes = decide_bookings(db, booking_ids, action, current_user, note=note, order=order)
+        db.commit()
+
+    if request.is_json:
+        return jsonify(outcomes=outcomes)
+    counts = Counter(o["outcome"] for o in outcomes)
+    flash(
+        f"{counts['approved']} approved, {counts['rejected']} rejected, {counts['skipped']} skipped.",
+        "success" if not counts["skipped"] else "warning",
+    )
+    return redirect(url_for("admin.dashboard", status=request.form.get("status", "pending")))
+
+def _parse_day(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d")
+
+def _date_range() -> tuple[datetime | None, datetime | None]:
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD, both inclusive; raises ValueError on bad input.
+    since = _parse_day(request.args.get("from"))
+    until = _parse_day(request.args.get("to"))
+    if until is not None:
+        until += timedelta(days=1)
+    return since, until
+
+
+def _export_response(filename: str, header: list[str], make_rows):
+    session_factory = current_app.session_factory
+
+    def generate():
+        with session_factory() as db:
+            yield from exports.csv_lines(header, make_rows(db))
+
+    if request.args.get("gzip") == "1":
+        return Response(
+            stream_with_context(exports.gzipped(generate())),
+            mimetype="application/gzip",
+            headers={"Content-Disposition": f"attachment; filename={filename}.gz"},
+        )
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 @bp.get("/export/bookings.csv")
 @login_required
 def export_bookings():
     if not _require({"admin"}):
         return redirect(url_for("admin.dashboard"))
+    try:
+        since, until = _date_range()
+    except ValueError:
+        flash("Dates must be in YYYY-MM-DD format.", "warning")
+        return redirect(url_for("admin.dashboard"))
+    status = request.args.get("status") or None
+
+    return _export_response(
+        "bookings_export.csv",
+        exports.BOOKING_HEADER,
+        lambda db: exports.booking_rows(db, since=since, until=until, status=status),
+    )
+
+@bp.get("/export/audit.csv")
+@login_required
+def export_audit():
+    if not _require({"admin"}):
+        return redirect(url_for("admin.dashboard"))
+    try:
+        since, until = _date_range()
+    except ValueError:
+        flash("Dates must be in YYYY-MM-DD format.", "warning")
+        return redirect(url_for("admin.dashboard"))
+    action = request.args.get("action") or None
+    actor = request.args.get("actor") or None
+
+    archive_dir = current_app.audit_archive_dir
+
+    return _export_response(
+        "audit_export.csv",
+        exports.AUDIT_HEADER,
+        lambda db: exports.audit_rows(db, since=since, until=until, action=action, actor=actor, archive_dir=archive_dir),
+    )
+
+@bp.get("/audit.json")
+@login_required
+def audit_search():
+    # Same filters as the CSV export, across live and archived months; newest first, up to ?limit= rows.
+    if not _require({"admin"}):
+        return jsonify(error="forbidden"), 403
+    try:
+        since, until = _date_range()
+    except ValueError:
+        return jsonify(error="dates must be in YYYY-MM-DD format"), 400
+    limit = min(max(1, request.args.get("limit", 100, type=int)), 1000)
     with current_app.session_factory() as db:
-        rows = db.execute(select(BookingRequest).order_by(BookingRequest.start_at.desc()).limit(2000)).scalars().all()
+        rows = list(islice(search_audit(
+            db, current_app.audit_archive_dir, since=since, until=until,
+            action=request.args.get("action") or None, actor=request.args.get("actor") or None,
+        ), limit))
+    return jsonify(rows=[{**r, "at": r["at"].isoformat()} for r in rows])
 
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["id", "requester_email", "start_at", "end_at", "status", "machines", "no_show", "cancelled_at", "decided_at", "decision_note"])
+@bp.get("/timeline")
+@login_required
+def timeline():
+    if not _require({"approver", "admin"}):
+        return redirect(url_for("bookings.my_bookings"))
+    with current_app.session_factory() as db:
+        facets = machine_facets(db)
+    return render_template("admin_timeline.html", facets=facets, today=datetime.utcnow().date())
 
-        for b in rows:
-            requester = b.requester.email if b.requester else ""
-            machines = "; ".join([it.machine.name for it in b.items])
-            writer.writerow([b.id, requester, b.start_at.isoformat(), b.end_at.isoformat(), b.status, machines, b.no_show, b.cancelled_at, b.decided_at, b.decision_note])
+@bp.get("/timeline.json")
+@login_required
+def timeline_data():
+    # ?from=YYYY-MM-DD&days=&resolution=day|hour plus the machine search filters and paging;
+    # start= and end= (ISO datetimes) add a "free" flag per machine for that window.
+    if not _require({"approver", "admin"}):
+        return jsonify(error="forbidden"), 403
+    resolution = request.args.get("resolution", "day")
+    if resolution not in RESOLUTIONS:
+        return jsonify(error="resolution must be day or hour"), 400
+    try:
+        first_day = (_parse_day(request.args.get("from")) or datetime.utcnow()).date()
+        start_at = parse_utc(request.args["start"]) if request.args.get("start") else None
+        end_at = parse_utc(request.args["end"]) if request.args.get("end") else None
+    except ValueError:
+        return jsonify(error="from must be YYYY-MM-DD; start and end ISO datetimes"), 400
+    days = min(max(1, request.args.get("days", 28, type=int)), 14 if resolution == "hour" else 90)
+    q = (request.args.get("q") or "").strip()
 
-    return Response(output.getvalue(), mimetype="text/csv", headers={"Content-Disposition": "attachment; filename=bookings_export.csv"})
+    with current_app.session_factory() as db:
+        page = queries.search_machines(db, q, PageRequest.from_args(request.args, per_page=100), **filters_from_args(request.args))
+        machines = [(m.id, m.name, m.site.city) for m in page]
+    occupancy = current_app.occupancy
+    days = occupancy.covered_days(first_day, days)
+    rows = occupancy.timeline([mid for mid, _, _ in machines], first_day, days, resolution)
+    payload = []
+    for mid, name, city in machines:
+        row = {"id": mid, "name": name, "site": city, "occupancy": rows[mid]}
+        if start_at is not None and end_at is not None:
+            row["free"] = occupancy.is_free(mid, start_at, end_at)
+        payload.append(row)
+    return jsonify(
+        {"from": first_day.isoformat(), "days": days, "resolution": resolution, "machines": payload, "next": page.next_cursor}
+    )
 
 @bp.post("/machines/<int:machine_id>/toggle_oos")
 @login_required
@@ -203,7 +357,8 @@ def toggle_oos(machine_id: int):
             flash("Machine not found.", "danger")
             return redirect(url_for("admin.inventory"))
         m.status = "available" if m.status == "out_of_service" else "out_of_service"
-        db.add(AuditLog(actor_email=current_user.email, action="machine_toggle", detail=f"Toggled {m.name} to {m.status}"))
+        audit(db, current_user.email, "machine_toggle", f"Toggled {m.name} to {m.status}")
+        emit(db, "machine.toggled", machine_id=machine_id, status=m.status)
         db.commit()
     flash("Machine status updated.", "success")
     return redirect(url_for("admin.inventory"))
@@ -215,21 +370,12 @@ def inventory():
         return redirect(url_for("admin.dashboard"))
     q = (request.args.get("q") or "").strip()
 
-    with current_app.session_factory() as db:
-        stmt = (
-            select(Machine)
-            .options(joinedload(Machine.site))   # ✅ eager load relationship
-            .order_by(Machine.name.asc())
-        )
-
-        if q:
-            stmt = stmt.where(
-                Machine.name.contains(q)
-                | Machine.category.contains(q)
-                | Machine.machine_type.contains(q)
-            )
+    filters = filters_from_args(request.args)
 
-        machines = db.execute(stmt.limit(200)).scalars().all()
+    with current_app.session_factory() as db:
+        machines = queries.search_machines(db, q, PageRequest.from_args(request.args, per_page=100), **filters)
+        facets = machine_facets(db, q, **filters)
 
-    return render_template("admin_inventory.html", machines=machines, q=q)
+    selected = {"site": filters["site_id"], "category": filters["category"], "status": filters["status"]}
+    return render_template("admin_inventory.html", machines=machines, q=q, facets=facets, selected=selected)
 
@@ -7,10 +7,12 @@ Created on Tue Jan 13 14:17:04 2026
 
 from flask import Blueprint, render_template, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from sqlalchemy import select
 from ..forms import RegisterForm, LoginForm
-from ..models import User, AuditLog
-from ..security import hash_password, verify_password
+from ..models import User
+from ..services.hashing import HasherBusy
+from ..services import queries
+from ..services.audit import audit
+from ..services.identity import UserIdentity
 
 bp = Blueprint("auth", __name__)
 
@@ -23,22 +25,28 @@ def register():
     form = RegisterForm()
     if form.validate_on_submit():
         with current_app.session_factory() as db:
-            exists = db.execute(select(User).where(User.email == form.email.data.lower())).scalar_one_or_none()
+            exists = queries.user_by_email(db, form.email.data)
             if exists:
                 flash("An account with that email already exists.", "warning")
                 return render_template("register.html", form=form)
 
+            try:
+                password_hash = current_app.password_hasher.hash(form.password.data)
+            except HasherBusy:
+                flash("Registration is busy right now. Please try again in a moment.", "warning")
+                return render_template("register.html", form=form), 503
+
             user = User(
                 name=form.name.data.strip(),
                 email=form.email.data.lower(),
-                password_hash=hash_password(form.password.data),
+                password_hash=password_hash,
                 team=form.team.data.strip(),
                 manager_email=form.manager_email.data.lower(),
                 role="user",
                 status="pending",
             )
             db.add(user)
-            db.add(AuditLog(actor_email=user.email, action="register", detail="User registered; awaiting manager approval"))
+            audit(db, user.email, "register", "User registered; awaiting manager approval")
             db.commit()
 
         flash("Account created. Your manager must approve your access before you can sign in.", "success")
@@ -51,8 +59,14 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         with current_app.session_factory() as db:
-            user = db.execute(select(User).where(User.email == form.email.data.lower())).scalar_one_or_none()
-            if not user or not verify_password(user.password_hash, form.password.data):
+            hasher = current_app.password_hasher
+            user = queries.user_by_email(db, form.email.data)
+            try:
+                valid = user is not None and hasher.verify(user.password_hash, form.password.data)
+            except HasherBusy:
+                flash("Sign-in is busy right now. Please try again in a moment.", "warning")
+                return render_template("login.html", form=form), 503
+            if not valid:
                 flash("Invalid email or password.", "danger")
                 return render_template("login.html", form=form)
 
@@ -60,9 +74,18 @@ def login():
                 flash("Your account is not active yet. Please wait for manager approval.", "warning")
                 return render_template("login.html", form=form)
 
-            login_user(user)
-            db.add(AuditLog(actor_email=user.email, action="login", detail="User signed in"))
-            db.commit()
+            if hasher.needs_rehash(user.password_hash):
+                # Cost parameters changed since this hash was made; the plain password is only here now.
+                try:
+                    user.password_hash = hasher.hash(form.password.data)
+                    db.commit()
+                except HasherBusy:
+                    pass
+
+            identity = UserIdentity.from_user(user)
+            current_app.user_cache.set(identity.id, identity)
+            login_user(identity)
+        current_app.audit_sink.record(identity.email, "login", "User signed in")
 
         return redirect(url_for("bookings.my_bookings"))
 
@@ -74,7 +97,5 @@ def logout():
     email = current_user.email
     logout_user()
     flash("Signed out.", "info")
-    with current_app.session_factory() as db:
-        db.add(AuditLog(actor_email=email, action="logout", detail="User signed out"))
-        db.commit()
+    current_app.audit_sink.record(email, "logout", "User signed out")
     return redirect(url_for("auth.home"))
@@ -5,14 +5,20 @@ Created on Tue Jan 13 14:17:27 2026
 @author: NBoyd1
 """
 
-from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app, request, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import select
-from ..forms import BookingForm
-from ..models import Machine, BookingRequest, BookingItem, User, AuditLog
-from ..services.booking_rules import validate_booking_window, machines_exist_and_available
-from ..services.notifications import queue_notification
+from ..forms import BookingForm, BookingImportForm
+from ..models import BookingRequest, BookingItem, Machine
+from ..services.booking_rules import validate_booking_window, machines_exist_and_available, has_conflicts_for_approved_bookings, parse_utc, MAX_DAYS_AHEAD
+from ..services.availability import free_machines, next_free_slots
+from ..services.bulk_booking import create_bulk_bookings, read_import, BulkBookingError, IMPORT_COLUMNS
+from ..services.notifications import queue_broadcast
+from ..services.events import emit
+from ..services.pagination import PageRequest
+from ..services.machine_search import machine_facets, filters_from_args
+from ..services import queries
+from ..services.audit import audit
 
 bp = Blueprint("bookings", __name__, url_prefix="/bookings")
 
@@ -20,9 +26,7 @@ bp = Blueprint("bookings", __name__, url_prefix="/bookings")
 @login_required
 def my_bookings():
     with current_app.session_factory() as db:
-        bookings = db.execute(
-            select(BookingRequest).where(BookingRequest.requester_id == current_user.id).order_by(BookingRequest.start_at.desc())
-        ).scalars().all()
+        bookings = queries.bookings_for_user(db, current_user.id, PageRequest.from_args(request.args, per_page=25))
     return render_template("my_bookings.html", bookings=bookings)
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -30,20 +34,24 @@ def my_bookings():
 def new_booking():
     form = BookingForm()
     with current_app.session_factory() as db:
-        machines = db.execute(select(Machine).where(Machine.status == "available").order_by(Machine.name)).scalars().all()
-        form.machines.choices = [(m.id, f"{m.name} • {m.machine_type.upper()} • {m.site.city}") for m in machines]
-
         if form.validate_on_submit():
             ok, msg = validate_booking_window(form.start_at.data, form.end_at.data)
             if not ok:
                 flash(msg, "warning")
-                return render_template("new_booking.html", form=form)
+                return _render_new_booking(db, form)
 
             ids = list(dict.fromkeys(form.machines.data))
             ok2, msg2 = machines_exist_and_available(db, ids)
             if not ok2:
                 flash(msg2, "warning")
-                return render_template("new_booking.html", form=form)
+                return _render_new_booking(db, form)
+
+            if form.repeat.data != "none":
+                return _submit_series(db, form, ids)
+
+            if has_conflicts_for_approved_bookings(db, ids, form.start_at.data, form.end_at.data, index=current_app.conflict_index):
+                flash("One or more selected machines are already booked in that window.", "warning")
+                return _render_new_booking(db, form)
 
             booking = BookingRequest(
                 requester_id=current_user.id,
@@ -58,23 +66,152 @@ def new_booking():
             for mid in ids:
                 db.add(BookingItem(booking_id=booking.id, machine_id=mid))
 
-            approvers = db.execute(select(User).where(User.role.in_(["approver", "admin"]), User.status == "active")).scalars().all()
-            for a in approvers:
-                queue_notification(db, a.id, f"New booking request #{booking.id} awaiting approval.")
+            queue_broadcast(db, ["approver", "admin"], f"New booking request #{booking.id} awaiting approval.")
 
-            db.add(AuditLog(actor_email=current_user.email, action="booking_request", detail=f"Created booking request #{booking.id}"))
+            audit(db, current_user.email, "booking_request", f"Created booking request #{booking.id}")
             db.commit()
 
             flash("Booking request submitted for approval.", "success")
             return redirect(url_for("bookings.my_bookings"))
 
+        return _render_new_booking(db, form)
+
+def _render_new_booking(db, form: BookingForm):
+    # Machines are picked through machines.json; only the ones already chosen are rendered as options.
+    chosen = list(dict.fromkeys(form.machines.data or []))
+    form.machines.choices = [(m.id, _machine_label(m)) for m in queries.machines_by_ids(db, chosen)]
     return render_template("new_booking.html", form=form)
 
+def _machine_label(m) -> str:
+    return f"{m.name} • {m.machine_type.upper()} • {m.site.city}"
+
+def _submit_series(db, form: BookingForm, machine_ids: list[int]):
+    row = {
+        "start_at": form.start_at.data,
+        "end_at": form.end_at.data,
+        "machines": [str(mid) for mid in machine_ids],
+        "purpose": form.purpose.data,
+        "repeat": form.repeat.data,
+        "until": form.repeat_until.data,
+        "weekdays": form.weekdays.data,
+    }
+    result = create_bulk_bookings(db, current_user, [row], skip_conflicts=True, index=current_app.conflict_index, source="recurring request")
+    if not result.ok:
+        for _, msg in result.errors[:5]:
+            flash(msg, "warning")
+        return _render_new_booking(db, form)
+    if not result.booking_ids:
+        flash("Every occurrence clashes with an approved booking; nothing was submitted.", "warning")
+        return _render_new_booking(db, form)
+    db.commit()
+
+    flash(f"{len(result.booking_ids)} recurring booking request(s) submitted for approval.", "success")
+    if result.skipped:
+        days = ", ".join(f"{start_at:%a %d %b}" for _, start_at, _ in result.skipped[:10])
+        flash(f"Skipped {len(result.skipped)} occurrence(s) that clash with approved bookings: {days}.", "warning")
+    return redirect(url_for("bookings.my_bookings"))
+
+@bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_bookings():
+    form = BookingImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            rows = read_import(upload.read(), upload.filename or "")
+        except BulkBookingError as e:
+            flash(str(e), "warning")
+            return render_template("bookings_import.html", form=form, result=None, columns=IMPORT_COLUMNS)
+
+        with current_app.session_factory() as db:
+            result = create_bulk_bookings(
+                db, current_user, rows, skip_conflicts=form.skip_conflicts.data, index=current_app.conflict_index
+            )
+            if result.ok and result.booking_ids:
+                db.commit()
+        if result.ok:
+            flash(f"Imported {len(result.booking_ids)} booking request(s).", "success" if result.booking_ids else "warning")
+        else:
+            flash("Nothing was imported; fix the rows below and try again.", "danger")
+    return render_template("bookings_import.html", form=form, result=result, columns=IMPORT_COLUMNS)
+
+@bp.get("/machines.json")
+@login_required
+def machine_picker():
+    # ?q=&site=&category=&per_page=&after=; add facets=1 for the site and category counts.
+    q = (request.args.get("q") or "").strip()
+    filters = {**filters_from_args(request.args), "status": "available"}
+    with current_app.session_factory() as db:
+        page = queries.search_machines(db, q, PageRequest.from_args(request.args, per_page=50), **filters)
+        payload = {
+            "machines": [{"id": m.id, "label": _machine_label(m), "site_id": m.site_id, "category": m.category} for m in page],
+            "next": page.next_cursor,
+        }
+        if request.args.get("facets") == "1":
+            facets = machine_facets(db, q, **filters)
+            payload["facets"] = {"site": facets["site"], "category": facets["category"]}
+    return jsonify(payload)
+
+def _parse_when(name: str, default: datetime | None = None) -> datetime:
+    raw = request.args.get(name)
+    if not raw:
+        if default is None:
+            raise ValueError(f"{name} is required")
+        return default
+    try:
+        return parse_utc(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO datetime, e.g. 2026-11-02T09:00") from None
+
+@bp.get("/availability.json")
+@login_required
+def availability():
+    try:
+        start_at, end_at = _parse_when("start"), _parse_when("end")
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if end_at <= start_at:
+        return jsonify(error="end must be after start"), 400
+
+    with current_app.session_factory() as db:
+        machines = free_machines(
+            db,
+            start_at,
+            end_at,
+            site_id=request.args.get("site", type=int),
+            category=request.args.get("category") or None,
+            machine_type=request.args.get("type") or None,
+            limit=request.args.get("limit", type=int),
+        )
+    return jsonify(start=start_at.isoformat(), end=end_at.isoformat(), machines=machines)
+
+@bp.get("/availability/<int:machine_id>/slots.json")
+@login_required
+def free_slots(machine_id: int):
+    try:
+        after = _parse_when("after", datetime.utcnow())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    # No slot can be longer than the booking horizon; anything above it would only overflow.
+    duration = timedelta(minutes=min(max(1, request.args.get("minutes", 60, type=int)), MAX_DAYS_AHEAD * 24 * 60))
+    count = min(max(1, request.args.get("count", 5, type=int)), 50)
+
+    with current_app.session_factory() as db:
+        machine = db.get(Machine, machine_id)
+        if machine is None:
+            return jsonify(error="machine not found"), 404
+        # A machine out of service has no bookable slots, however empty its calendar.
+        slots = []
+        if machine.status == "available":
+            slots = next_free_slots(db, machine_id, duration, after, count, index=current_app.conflict_index)
+    return jsonify(machine_id=machine_id, slots=[{"start": s.isoformat(), "end": e.isoformat()} for s, e in slots])
+
 @bp.post("/cancel/<int:booking_id>")
 @login_required
 def cancel_booking(booking_id: int):
     with current_app.session_factory() as db:
-        b = db.get(BookingRequest, booking_id)
+        b = queries.get_booking(db, booking_id)
         if not b or b.requester_id != current_user.id:
             flash("Booking not found.", "danger")
             return redirect(url_for("bookings.my_bookings"))
@@ -83,9 +220,12 @@ def cancel_booking(booking_id: int):
             flash("This booking cannot be cancelled.", "warning")
             return redirect(url_for("bookings.my_bookings"))
 
+        was_approved = b.status == "approved"
         b.status = "cancelled"
         b.cancelled_at = datetime.utcnow()
-        db.add(AuditLog(actor_email=current_user.email, action="booking_cancel", detail=f"Cancelled booking #{b.id}"))
+        audit(db, current_user.email, "booking_cancel", f"Cancelled booking #{b.id}")
+        emit(db, "booking.cancelled", booking_id=booking_id, was_approved=was_approved,
+             machine_ids=[it.machine_id for it in b.items], start_at=b.start_at, end_at=b.end_at)
         db.commit()
 
     flash("Booking cancelled.", "info")
@@ -110,7 +250,8 @@ def check_in(booking_id: int):
             return redirect(url_for("bookings.my_bookings"))
 
         b.checked_in = True
-        db.add(AuditLog(actor_email=current_user.email, action="booking_checkin", detail=f"Checked in for booking #{b.id}"))
+        audit(db, current_user.email, "booking_checkin", f"Checked in for booking #{b.id}")
+        emit(db, "booking.checked_in", booking_id=b.id)
         db.commit()
 
     flash("Checked in successfully.", "success")
@@ -5,43 +5,24 @@ Created on Tue Jan 13 14:19:20 2026
 @author: NBoyd1
 """
 
-from flask import Blueprint, render_template, current_app
+from flask import Blueprint, render_template, current_app, jsonify
 from flask_login import login_required
-from sqlalchemy import select, func
-from ..models import Site, Machine
+from ..services.site_stats import site_stats, CACHE_NAME
+from ..services.cache import cache_version
 
 bp = Blueprint("map", __name__, url_prefix="/map")
 
+def _cached_site_stats() -> list[dict]:
+    with current_app.session_factory() as db:
+        version = cache_version(db, CACHE_NAME)
+        return current_app.site_stats_cache.get_or_set(("sites", version), lambda: site_stats(db))
+
 @bp.get("/")
 @login_required
 def view_map():
-    with current_app.session_factory() as db:
-        sites = db.execute(select(Site).order_by(Site.city.asc())).scalars().all()
-
-        stats = {}
-        sites_payload = []
-
-        for s in sites:
-            total_machines = db.execute(
-                select(func.count()).select_from(Machine).where(Machine.site_id == s.id)
-            ).scalar_one()
-
-            oos = db.execute(
-                select(func.count()).select_from(Machine).where(
-                    Machine.site_id == s.id, Machine.status == "out_of_service"
-                )
-            ).scalar_one()
-
-            stats[s.id] = {"total_machines": total_machines, "out_of_service": oos}
-
-            # ✅ JSON-serialisable dict
-            sites_payload.append({
-                "id": s.id,
-                "name": s.name,
-                "city": s.city,
-                "lat": s.lat,
-                "lon": s.lon,
-            })
-
-    return render_template("map.html", sites=sites_payload, stats=stats)
+    return render_template("map.html", sites=_cached_site_stats())
 
+@bp.get("/stats.json")
+@login_required
+def stats_json():
+    return jsonify(sites=_cached_site_stats())
@@ -0,0 +1,67 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+# Environment settings and their defaults. SQLite ones are applied per connection;
+# pool ones only matter for server databases.
+SQLITE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": "5000",
+    "SQLITE_CACHE_SIZE_KB": "65536",
+    "SQLITE_MMAP_SIZE": str(256 * 1024 * 1024),
+}
+POOL_DEFAULTS = {
+    "DB_POOL_SIZE": "10",
+    "DB_MAX_OVERFLOW": "20",
+    "DB_POOL_TIMEOUT": "30",
+    "DB_POOL_RECYCLE": "1800",
+    "DB_POOL_PRE_PING": "1",
+}
+
+
+def _setting(env, name: str, defaults: dict) -> str:
+    return env.get(name, defaults[name])
+
+
+def sqlite_pragmas(env=os.environ) -> list[str]:
+    return [
+        f"PRAGMA journal_mode={_setting(env, 'SQLITE_JOURNAL_MODE', SQLITE_DEFAULTS)}",
+        f"PRAGMA synchronous={_setting(env, 'SQLITE_SYNCHRONOUS', SQLITE_DEFAULTS)}",
+        f"PRAGMA busy_timeout={int(_setting(env, 'SQLITE_BUSY_TIMEOUT_MS', SQLITE_DEFAULTS))}",
+        # negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{int(_setting(env, 'SQLITE_CACHE_SIZE_KB', SQLITE_DEFAULTS))}",
+        f"PRAGMA mmap_size={int(_setting(env, 'SQLITE_MMAP_SIZE', SQLITE_DEFAULTS))}",
+    ]
+
+
+def engine_options(db_url: str, env=os.environ) -> dict:
+    """Keyword arguments for ``create_engine`` for this URL and environment."""
+    options = {"echo": env.get("DB_ECHO", "0") == "1", "future": True}
+    if db_url.startswith("sqlite"):
+        # Request threads and scheduler jobs share connections from the pool.
+        timeout = int(_setting(env, "SQLITE_BUSY_TIMEOUT_MS", SQLITE_DEFAULTS)) / 1000.0
+        options["connect_args"] = {"check_same_thread": False, "timeout": timeout}
+        return options
+    options.update(
+        pool_size=int(_setting(env, "DB_POOL_SIZE", POOL_DEFAULTS)),
+        max_overflow=int(_setting(env, "DB_MAX_OVERFLOW", POOL_DEFAULTS)),
+        pool_timeout=float(_setting(env, "DB_POOL_TIMEOUT", POOL_DEFAULTS)),
+        pool_recycle=int(_setting(env, "DB_POOL_RECYCLE", POOL_DEFAULTS)),
+        pool_pre_ping=_setting(env, "DB_POOL_PRE_PING", POOL_DEFAULTS) == "1",
+    )
+    return options
+
+
+def make_engine(db_url: str, env=os.environ) -> Engine:
+    engine = create_engine(db_url, **engine_options(db_url, env))
+    if engine.dialect.name == "sqlite" and ":memory:" not in db_url:
+        pragmas = sqlite_pragmas(env)
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_conn, _record):
+            cursor = dbapi_conn.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    return engine
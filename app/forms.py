@@ -6,8 +6,10 @@ Created on Tue Jan 13 14:13:55 2026
 """
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, DateTimeLocalField, TextAreaField, SelectMultipleField
-from wtforms.validators import DataRequired, Email, Length, ValidationError
+from flask_wtf.file import FileField, FileRequired, FileAllowed, FileSize
+from wtforms import StringField, PasswordField, SubmitField, DateTimeLocalField, TextAreaField, SelectMultipleField, SelectField, DateField, BooleanField
+from wtforms.validators import DataRequired, Email, Length, ValidationError, Optional
+from .services.bulk_booking import MAX_IMPORT_BYTES
 
 class RegisterForm(FlaskForm):
     name = StringField("Full name", validators=[DataRequired(), Length(min=2, max=120)])
@@ -26,9 +28,26 @@ class BookingForm(FlaskForm):
     start_at = DateTimeLocalField("Start", validators=[DataRequired()], format="%Y-%m-%dT%H:%M")
     end_at = DateTimeLocalField("End", validators=[DataRequired()], format="%Y-%m-%dT%H:%M")
     purpose = TextAreaField("Purpose / notes", validators=[DataRequired(), Length(min=5, max=300)])
-    machines = SelectMultipleField("Machines", coerce=int, validators=[DataRequired()])
+    # Choices are loaded on demand by the picker; the view checks the submitted ids against the database.
+    machines = SelectMultipleField("Machines", coerce=int, validators=[DataRequired()], validate_choice=False)
+    repeat = SelectField("Repeat", choices=[("none", "Does not repeat"), ("daily", "Daily"), ("weekly", "Weekly")], default="none")
+    repeat_until = DateField("Until", validators=[Optional()])
+    weekdays = SelectMultipleField(
+        "On",
+        choices=[("MO", "Mon"), ("TU", "Tue"), ("WE", "Wed"), ("TH", "Thu"), ("FR", "Fri"), ("SA", "Sat"), ("SU", "Sun")],
+        validators=[Optional()],
+    )
     submit = SubmitField("Request booking")
 
     def validate_end_at(self, field):
         if self.start_at.data and field.data and field.data <= self.start_at.data:
             raise ValidationError("End time must be after start time.")
+
+class BookingImportForm(FlaskForm):
+    file = FileField("CSV or JSON file", validators=[
+        FileRequired(),
+        FileAllowed(["csv", "json"], "Upload a .csv or .json file."),
+        FileSize(MAX_IMPORT_BYTES, message=f"Imports are limited to {MAX_IMPORT_BYTES // (1024 * 1024)} MB."),
+    ])
+    skip_conflicts = BooleanField("Skip rows that clash with approved bookings")
+    submit = SubmitField("Import bookings")
@@ -0,0 +1,42 @@
+"""Background job definitions, shared by the web app and ``python -m app.worker``.
+
+Shared jobs write to the database and must run in exactly one process, so
+they only run while the process holds the scheduler lease. Local jobs keep
+this process's in-memory state (the conflict index and occupancy map) in step with the
+database and run in every web process.
+"""
+
+from datetime import datetime, timedelta
+from .services.notifications import process_notification_queue
+from .services.interval_index import verify_interval_index
+from .services.utilisation import refresh_utilisation_rollup
+from .services.audit_archive import archive_audit_log
+from .services.occupancy import rebuild_occupancy
+
+LEASE_NAME = "scheduler"
+
+
+def shared_jobs(SessionLocal, dispatcher, no_show_timer, audit_archive_dir: str, audit_retention_days: int) -> list[tuple]:
+    return [
+        ("notifications", lambda: process_notification_queue(SessionLocal, dispatcher), {"seconds": 30}),
+        # Deadlines fire from the timer thread; this catches up on anything it missed.
+        ("no_show", no_show_timer.sweep, {"minutes": 5}),
+        ("utilisation_rollup", lambda: refresh_utilisation_rollup(SessionLocal), {"minutes": 1}),
+        ("audit_retention", lambda: archive_audit_log(SessionLocal, audit_archive_dir, audit_retention_days), {"hours": 6}),
+    ]
+
+
+def local_jobs(SessionLocal, conflict_index, occupancy) -> list[tuple]:
+    def maintain_index():
+        conflict_index.prune(datetime.utcnow() - timedelta(minutes=15))
+        verify_interval_index(SessionLocal, conflict_index)
+
+    return [
+        ("conflict_index", maintain_index, {"minutes": 10}),
+        ("occupancy", lambda: rebuild_occupancy(SessionLocal, occupancy), {"minutes": 10}),
+    ]
+
+
+def add_jobs(scheduler, jobs: list[tuple], lease=None):
+    for job_id, fn, interval in jobs:
+        scheduler.add_job(lease.guard(fn) if lease is not None else fn, "interval", id=job_id, **interval)
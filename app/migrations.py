@@ -0,0 +1,91 @@
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateTable, Table
+from .db import Base
+
+
+def upgrade_schema(engine: Engine) -> list[str]:
+    """Bring an existing database up to the current models.
+
+    ``Base.metadata.create_all`` only creates missing tables. Changes to tables
+    that already exist are applied here: new nullable or defaulted columns,
+    columns that became nullable, and new indexes. Every step checks first, so
+    this is safe to run on every start-up.
+
+    Returns the names of the objects that were created.
+    """
+    created = []
+    with engine.connect() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            # Table rebuilds drop a table others may point at. SQLite only changes this
+            # setting outside a transaction, so it is switched off before the work starts.
+            enforced = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            conn.commit()
+        try:
+            with conn.begin():
+                existing_tables = set(inspect(conn).get_table_names())
+                for table in Base.metadata.sorted_tables:
+                    if table.name not in existing_tables:
+                        continue
+                    created.extend(_relax_not_null(conn, table))
+                    created.extend(_add_missing_columns(conn, table))
+                    existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+                    for index in sorted(table.indexes, key=lambda ix: ix.name):
+                        if index.name not in existing:
+                            index.create(bind=conn)
+                            created.append(index.name)
+
+                if created and sqlite:
+                    # Refresh planner statistics so the new indexes get picked up straight away.
+                    conn.exec_driver_sql("ANALYZE")
+        finally:
+            if sqlite and enforced:
+                conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+                conn.commit()
+    return created
+
+
+def _add_missing_columns(conn: Connection, table: Table) -> list[str]:
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        if not column.nullable and column.server_default is None:
+            raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+        added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _relax_not_null(conn: Connection, table: Table) -> list[str]:
+    live = {c["name"]: c for c in inspect(conn).get_columns(table.name)}
+    relaxed = [c.name for c in table.columns if c.nullable and c.name in live and not live[c.name]["nullable"]]
+    if not relaxed:
+        return []
+
+    if conn.dialect.name != "sqlite":
+        for name in relaxed:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL")
+        return [f"{table.name}.{name} nullable" for name in relaxed]
+
+    # SQLite cannot alter a column constraint. Following the documented procedure, build the
+    # new table under another name, copy the rows, drop the old one and rename the new one into
+    # place: renaming the live table instead would repoint other tables' foreign keys at it.
+    new = f"_{table.name}_new"
+    before = set(conn.exec_driver_sql("PRAGMA foreign_key_check").all())
+    for ix in inspect(conn).get_indexes(table.name):
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {ix['name']}")
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new} ", 1))
+    shared = ", ".join(name for name in live if name in table.columns)
+    conn.exec_driver_sql(f"INSERT INTO {new} ({shared}) SELECT {shared} FROM {table.name}")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {new} RENAME TO {table.name}")
+    violations = [v for v in conn.exec_driver_sql("PRAGMA foreign_key_check").all() if v not in before]
+    if violations:
+        raise RuntimeError(f"Rebuilding {table.name} left foreign key violations: {violations[:5]}")
+    return [f"{table.name}.{name} nullable" for name in relaxed]
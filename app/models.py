@@ -7,11 +7,11 @@ Created on Tue Jan 13 14:31:25 2026
 
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List
 
 from flask_login import UserMixin
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Boolean
+from sqlalchemy import String, Integer, DateTime, Date, Float, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -30,6 +30,10 @@ class Site(Base):
 
 class Machine(Base):
     __tablename__ = "machines"
+    __table_args__ = (
+        Index("ix_machines_site_status", "site_id", "status"),
+        Index("ix_machines_status_name", "status", "name"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False, unique=True)
     machine_type: Mapped[str] = mapped_column(String(20), nullable=False)  # lab | virtual
@@ -43,6 +47,10 @@ class Machine(Base):
 
 class User(Base, UserMixin):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_status_created", "status", "created_at"),
+        Index("ix_users_role_status", "role", "status"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     email: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
@@ -67,6 +75,27 @@ class User(Base, UserMixin):
 
 class BookingRequest(Base):
     __tablename__ = "booking_requests"
+    __table_args__ = (
+        Index("ix_booking_requests_status_start", "status", "start_at", "end_at"),
+        Index("ix_booking_requests_status_end", "status", "end_at", "start_at"),
+        Index("ix_booking_requests_requester_start", "requester_id", "start_at"),
+        Index("ix_booking_requests_status_cancelled", "status", "cancelled_at"),
+        Index("ix_booking_requests_start", "start_at"),
+        Index("ix_booking_requests_series", "series_id"),
+        Index(
+            "ix_booking_requests_no_show_end",
+            "end_at",
+            sqlite_where=text("no_show IS 1"),
+            postgresql_where=text("no_show IS true"),
+        ),
+        # mark_no_shows: approved bookings nobody has checked in to yet
+        Index(
+            "ix_booking_requests_no_show_due",
+            "end_at",
+            sqlite_where=text("status = 'approved' AND checked_in IS 0 AND no_show IS 0"),
+            postgresql_where=text("status = 'approved' AND checked_in IS false AND no_show IS false"),
+        ),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     requester_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     start_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -81,6 +110,7 @@ class BookingRequest(Base):
     cancelled_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     checked_in: Mapped[bool] = mapped_column(Boolean, default=False)
     no_show: Mapped[bool] = mapped_column(Boolean, default=False)
+    series_id: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # shared by occurrences of one recurring or imported request
 
     requester: Mapped["User"] = relationship(back_populates="requests", foreign_keys=[requester_id])
     approver: Mapped[Optional["User"]] = relationship(back_populates="approvals", foreign_keys=[approver_id])
@@ -89,6 +119,10 @@ class BookingRequest(Base):
 
 class BookingItem(Base):
     __tablename__ = "booking_items"
+    __table_args__ = (
+        Index("ix_booking_items_machine_booking", "machine_id", "booking_id"),
+        Index("ix_booking_items_booking_machine", "booking_id", "machine_id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     booking_id: Mapped[int] = mapped_column(ForeignKey("booking_requests.id"), nullable=False)
     machine_id: Mapped[int] = mapped_column(ForeignKey("machines.id"), nullable=False)
@@ -99,19 +133,115 @@ class BookingItem(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user", "user_id"),
+        Index(
+            "ix_notifications_unsent",
+            "created_at",
+            sqlite_where=text("sent_at IS NULL"),
+            postgresql_where=text("sent_at IS NULL"),
+        ),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Direct notifications have a user_id; broadcasts leave it empty and name an audience instead.
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)
+    audience_roles: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)  # comma separated, e.g. "approver,admin"
+    audience_team: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
     message: Mapped[str] = mapped_column(String(500), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
-    user: Mapped["User"] = relationship(back_populates="notifications")
+    # dispatcher claim: who is sending it and since when (stale claims are retried)
+    claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    claim_token: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+
+    user: Mapped[Optional["User"]] = relationship(back_populates="notifications")
+
+    @property
+    def is_broadcast(self) -> bool:
+        return self.user_id is None
+
+
+class NotificationDelivery(Base):
+    # One row per broadcast and recipient it has been sent to. Written by the dispatcher, not
+    # the request that queued the broadcast; a per-user high-water mark cannot stand in for it,
+    # because a broadcast that failed for a user is retried after later ones have reached them.
+    __tablename__ = "notification_deliveries"
+    notification_id: Mapped[int] = mapped_column(ForeignKey("notifications.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 class AuditLog(Base):
+    # Live partition only; months past the retention window are moved to files (services/audit_archive.py).
     __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_at", "at"),
+        Index("ix_audit_log_actor_at", "actor_email", "at"),
+        Index("ix_audit_log_action_at", "action", "at"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     actor_email: Mapped[str] = mapped_column(String(255), nullable=False)
     action: Mapped[str] = mapped_column(String(100), nullable=False)
     detail: Mapped[str] = mapped_column(String(700), nullable=False)
+
+
+class AuditArchive(Base):
+    # One row per archived segment file: a month's audit rows, removed from audit_log in the same transaction.
+    __tablename__ = "audit_archives"
+    __table_args__ = (Index("ix_audit_archives_month", "month"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), nullable=False)  # YYYY-MM
+    filename: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    first_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    rows: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class UtilisationDaily(Base):
+    # Approved booking hours per machine per UTC day, maintained from utilisation_dirty.
+    __tablename__ = "utilisation_daily"
+    __table_args__ = (
+        Index("ix_utilisation_daily_day", "day"),
+    )
+    machine_id: Mapped[int] = mapped_column(ForeignKey("machines.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String(80), nullable=False)
+    site_id: Mapped[int] = mapped_column(ForeignKey("sites.id"), nullable=False)
+    hours: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+
+class UtilisationDirty(Base):
+    # (machine, day) cells whose rollup must be recomputed after a booking changed state.
+    __tablename__ = "utilisation_dirty"
+    machine_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    marked_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class CacheVersion(Base):
+    # Bumped whenever the data behind a named cache changes; shared by all worker processes.
+    __tablename__ = "cache_versions"
+    name: Mapped[str] = mapped_column(String(60), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class MachineLock(Base):
+    # One row per machine, locked for the rest of the transaction by anyone approving a booking on it.
+    __tablename__ = "machine_locks"
+    machine_id: Mapped[int] = mapped_column(ForeignKey("machines.id"), primary_key=True)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class SchedulerLease(Base):
+    # Whoever holds an unexpired row runs the shared background jobs; see services/leases.py.
+    __tablename__ = "scheduler_leases"
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(120), nullable=False)
+    acquired_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -5,13 +5,31 @@ Created on Tue Jan 13 14:13:28 2026
 @author: NBoyd1
 """
 
+import os
+from functools import lru_cache
 from werkzeug.security import generate_password_hash, check_password_hash
 
-def hash_password(password: str) -> str:
-    return generate_password_hash(password)
+# Werkzeug method string with explicit cost parameters, e.g. "scrypt:32768:8:1"
+# (N, r, p) or "pbkdf2:sha256:600000". Hashes made with other parameters are
+# replaced the next time their owner signs in.
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"
+
+def hash_method() -> str:
+    return os.getenv("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+
+def hash_password(password: str, method: str | None = None) -> str:
+    return generate_password_hash(password, method=method or hash_method())
 
 def verify_password(password_hash: str, password: str) -> bool:
     return check_password_hash(password_hash, password)
 
+@lru_cache(maxsize=8)
+def _method_prefix(method: str) -> str:
+    # Werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"); compare what it actually writes.
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+def needs_rehash(password_hash: str, method: str | None = None) -> bool:
+    return password_hash.split("$", 1)[0] != _method_prefix(method or hash_method())
+
 def require_role(user_role: str, allowed: set[str]) -> bool:
     return user_role in allowed
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from ..models import AuditLog
+from . import staging
+
+STAGED_KEY = "audit_staged"
+
+
+# Sync mode: rows that must commit (or roll back) with the change they describe are staged
+# on the session and written in one executemany just before it commits.
+
+def audit(db: Session, actor_email: str, action: str, detail: str):
+    staging.stage(db, STAGED_KEY, {"at": datetime.utcnow(), "actor_email": actor_email, "action": action, "detail": detail})
+
+@staging.on_commit(staging.AUDIT, STAGED_KEY)
+def _flush_staged_on_commit(session):
+    rows = session.info.pop(STAGED_KEY, None)
+    if rows:
+        session.execute(insert(AuditLog), rows)
+
+
+class AuditSink:
+    """Async mode: a bounded in-process queue drained by a background writer thread.
+
+    ``record`` never blocks the request; when the queue is full the row is
+    dropped and counted. The writer takes up to ``batch`` rows at a time and
+    inserts them with one executemany. A failed batch is kept and retried, and
+    ``close`` drains whatever is left before returning, so rows are written at
+    least once unless the process dies outright.
+    """
+
+    def __init__(self, SessionFactory, maxsize: int = 10_000, batch: int = 500, interval: float = 1.0):
+        self.SessionFactory = SessionFactory
+        self.batch = batch
+        self.interval = interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._retry: list[dict] = []
+        self._write_lock = threading.Lock()
+        # Guards ``dropped``, which request threads bump; the write lock is held across database writes.
+        self._count_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, actor_email: str, action: str, detail: str) -> bool:
+        row = {"at": datetime.utcnow(), "actor_email": actor_email, "action": action, "detail": detail}
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            return False
+
+    def _take(self, first=None) -> list[dict]:
+        rows = [first] if first is not None else []
+        while len(rows) < self.batch:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _write(self, rows: list[dict]) -> bool:
+        with self._write_lock:
+            rows = self._retry + rows
+            self._retry = []
+            if not rows:
+                return True
+            try:
+                with self.SessionFactory() as db:
+                    db.execute(insert(AuditLog), rows)
+                    db.commit()
+            except Exception as e:
+                self.failures += 1
+                overflow = len(rows) - self._queue.maxsize
+                if overflow > 0:
+                    # Hold on to at most a queue's worth while the database is unavailable.
+                    with self._count_lock:
+                        self.dropped += overflow
+                    rows = rows[overflow:]
+                self._retry = rows
+                print(f"[AuditSink] write of {len(rows)} row(s) failed, will retry: {e}")
+                return False
+            self.written += len(rows)
+            self.batches += 1
+            return True
+
+    def flush(self) -> int:
+        """Write everything queued so far on the calling thread. Returns the rows written."""
+        before = self.written
+        while True:
+            rows = self._take()
+            if not rows and not self._retry:
+                break
+            if not self._write(rows):
+                break
+        return self.written - before
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)  # wake the writer
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                if self._retry:
+                    self._write([])
+                continue
+            if first is None:
+                continue
+            if not self._write(self._take(first)):
+                time.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() + len(self._retry),
+            "maxsize": self._queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
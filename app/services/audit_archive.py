@@ -0,0 +1,149 @@
+import gzip
+import heapq
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Iterator
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+from ..models import AuditLog, AuditArchive
+
+# audit_log holds the live months. Whole months older than the retention window are
+# written to gzipped JSONL segment files (one per archiving run per month, never
+# modified afterwards) and deleted from the table; audit_archives lists the segments.
+# Each segment is written newest first, (at, id) descending, the order searches read
+# it in, so it can be streamed without holding the month in memory.
+BATCH_SIZE = 2000
+
+
+def _month_start(d: datetime) -> datetime:
+    return datetime(d.year, d.month, 1)
+
+
+def _next_month(d: datetime) -> datetime:
+    return datetime(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def archive_audit_log(SessionFactory, archive_dir: str, retention_days: int = 365, now: datetime | None = None) -> list[str]:
+    """Move every whole month that ended more than ``retention_days`` ago out of audit_log.
+
+    Returns the segment files written.
+    """
+    boundary = _month_start((now or datetime.utcnow()) - timedelta(days=retention_days))
+    with SessionFactory() as db:
+        oldest = db.execute(select(func.min(AuditLog.at))).scalar()
+    written = []
+    month = _month_start(oldest) if oldest is not None else boundary
+    while month < boundary:
+        filename = _archive_month(SessionFactory, archive_dir, month, _next_month(month))
+        if filename:
+            written.append(filename)
+        month = _next_month(month)
+    return written
+
+
+def _archive_month(SessionFactory, archive_dir: str, start: datetime, end: datetime) -> str | None:
+    os.makedirs(archive_dir, exist_ok=True)
+    tmp = os.path.join(archive_dir, f".audit-{start:%Y-%m}.tmp")
+    first_id = last_id = lo = hi = None
+    count = 0
+    with SessionFactory() as db:
+        stmt = (
+            select(AuditLog.id, AuditLog.at, AuditLog.actor_email, AuditLog.action, AuditLog.detail)
+            .where(AuditLog.at >= start, AuditLog.at < end)
+            .order_by(AuditLog.at.desc(), AuditLog.id.desc())
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as z:
+                for r in db.execute(stmt):
+                    z.write((json.dumps({"id": r[0], "at": r[1].isoformat(), "actor_email": r[2], "action": r[3], "detail": r[4]}) + "\n").encode("utf-8"))
+                    first_id = r[0] if first_id is None else min(first_id, r[0])
+                    last_id = r[0] if last_id is None else max(last_id, r[0])
+                    lo = r[1] if lo is None else min(lo, r[1])
+                    hi = r[1] if hi is None else max(hi, r[1])
+                    count += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+        if not count:
+            os.remove(tmp)
+            return None
+
+        # Same rows, same name: re-running after a crash between the rename and the commit
+        # replaces the file instead of duplicating it.
+        filename = f"audit-{start:%Y-%m}.{first_id}-{last_id}.jsonl.gz"
+        os.replace(tmp, os.path.join(archive_dir, filename))
+        db.execute(delete(AuditLog).where(AuditLog.at >= start, AuditLog.at < end, AuditLog.id <= last_id))
+        if db.execute(select(AuditArchive.id).where(AuditArchive.filename == filename)).first() is None:
+            db.add(AuditArchive(
+                month=f"{start:%Y-%m}", filename=filename, first_id=first_id, last_id=last_id,
+                first_at=lo, last_at=hi, rows=count,
+            ))
+        db.commit()
+    return filename
+
+
+def _read_segment(path: str, keep) -> Iterator[dict]:
+    # Decoded line by line, so only the rows that pass ``keep`` are ever held.
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            r["at"] = datetime.fromisoformat(r["at"])
+            if keep(r):
+                yield r
+
+
+def _archived(db: Session, archive_dir: str, since, until, keep) -> Iterator[dict]:
+    segments = select(AuditArchive.month, AuditArchive.filename).order_by(AuditArchive.month.desc(), AuditArchive.last_id.desc())
+    if since is not None:
+        segments = segments.where(AuditArchive.month >= f"{since:%Y-%m}")
+    if until is not None:
+        segments = segments.where(AuditArchive.month <= f"{until:%Y-%m}")
+    # Months are read newest first. A month archived in more than one run has several
+    # segments, each already newest first, so only those are merged with each other.
+    months: dict[str, list[str]] = {}
+    for month, filename in db.execute(segments).all():
+        months.setdefault(month, []).append(filename)
+    for filenames in months.values():
+        readers = [_read_segment(os.path.join(archive_dir, f), keep) for f in filenames]
+        yield from heapq.merge(*readers, key=_order_key, reverse=True)
+
+
+def _order_key(r: dict) -> tuple:
+    return r["at"], r["id"]
+
+
+def search_audit(db: Session, archive_dir: str | None = None, since: datetime | None = None, until: datetime | None = None,
+                 action: str | None = None, actor: str | None = None) -> Iterator[dict]:
+    """Audit rows matching the filters, newest first, from the live table and archived segments.
+
+    ``since`` is inclusive and ``until`` exclusive. Segments are chosen from
+    audit_archives by month, so only files that can overlap the range are read.
+    """
+    actor = actor.lower() if actor else None
+    stmt = select(AuditLog.id, AuditLog.at, AuditLog.actor_email, AuditLog.action, AuditLog.detail).order_by(AuditLog.at.desc(), AuditLog.id.desc())
+    if since is not None:
+        stmt = stmt.where(AuditLog.at >= since)
+    if until is not None:
+        stmt = stmt.where(AuditLog.at < until)
+    if action:
+        stmt = stmt.where(AuditLog.action == action)
+    if actor:
+        stmt = stmt.where(AuditLog.actor_email == actor)
+    live = (
+        {"id": r[0], "at": r[1], "actor_email": r[2], "action": r[3], "detail": r[4]}
+        for r in db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    )
+    if archive_dir is None:
+        yield from live
+        return
+
+    def keep(r: dict) -> bool:
+        return ((since is None or r["at"] >= since)
+                and (until is None or r["at"] < until)
+                and (not action or r["action"] == action)
+                and (not actor or r["actor_email"] == actor))
+
+    yield from heapq.merge(live, _archived(db, archive_dir, since, until, keep), key=_order_key, reverse=True)
@@ -5,13 +5,22 @@ Created on Tue Jan 13 14:14:21 2026
 @author: NBoyd1
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from ..models import BookingRequest, BookingItem, Machine
+from .interval_index import IntervalIndex
 
 MAX_DAYS_AHEAD = 90
 
+def parse_utc(value) -> datetime:
+    # Stored times are naive UTC; an ISO value with an offset (or "Z") is converted to that.
+    # Raises ValueError for anything that is not an ISO datetime.
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
 def validate_booking_window(start_at: datetime, end_at: datetime) -> tuple[bool, str | None]:
     now = datetime.utcnow()
     if start_at < now - timedelta(minutes=1):
@@ -32,7 +41,11 @@ def machines_exist_and_available(db: Session, machine_ids: list[int]) -> tuple[b
         return False, "One or more selected machines are out of service."
     return True, None
 
-def has_conflicts_for_approved_bookings(db: Session, machine_ids: list[int], start_at: datetime, end_at: datetime) -> bool:
+def has_conflicts_for_approved_bookings(db: Session, machine_ids: list[int], start_at: datetime, end_at: datetime, index=None) -> bool:
+    # Use the in-memory interval index when it has been built and still holds spans for this window.
+    if index is not None and index.covers(start_at):
+        return index.has_conflict(machine_ids, start_at, end_at)
+
     # overlap rule: existing.start < new.end AND existing.end > new.start
     q = (
         select(BookingRequest.id)
@@ -46,3 +59,51 @@ def has_conflicts_for_approved_bookings(db: Session, machine_ids: list[int], sta
         .limit(1)
     )
     return db.execute(q).first() is not None
+
+def find_conflicts(db: Session, windows, index=None) -> dict:
+    """Set-based conflict check for a batch of ``(key, machine_ids, start_at, end_at)`` windows.
+
+    Windows are taken in the order given: each is checked against approved
+    bookings and against the windows before it that were clear, so the first
+    of two overlapping windows wins. Returns ``{key: reason}`` for the losers.
+    """
+    windows = list(windows)
+    if not windows:
+        return {}
+    lo = min(w[2] for w in windows)
+    hi = max(w[3] for w in windows)
+
+    if index is None or not index.covers(lo):
+        # Scratch index over just the approved spans this batch can reach, loaded in one query.
+        index = IntervalIndex()
+        machine_ids = {mid for w in windows for mid in w[1]}
+        q = (
+            select(BookingRequest.id, BookingRequest.start_at, BookingRequest.end_at, BookingItem.machine_id)
+            .join(BookingItem, BookingItem.booking_id == BookingRequest.id)
+            .where(
+                BookingRequest.status == "approved",
+                BookingRequest.end_at > lo,
+                BookingRequest.start_at < hi,
+            )
+        )
+        if len(machine_ids) <= 50:
+            # A long IN list is probed once per candidate booking; past a few dozen
+            # machines it is cheaper to filter the rows here.
+            q = q.where(BookingItem.machine_id.in_(machine_ids))
+        spans: dict[tuple, list[int]] = {}
+        for booking_id, start_at, end_at, machine_id in db.execute(q):
+            if machine_id in machine_ids:
+                spans.setdefault((booking_id, start_at, end_at), []).append(machine_id)
+        for (booking_id, start_at, end_at), mids in spans.items():
+            index.add(booking_id, mids, start_at, end_at)
+
+    accepted = IntervalIndex()
+    conflicts = {}
+    for n, (key, machine_ids, start_at, end_at) in enumerate(windows):
+        if index.has_conflict(machine_ids, start_at, end_at):
+            conflicts[key] = "clashes with an approved booking"
+        elif accepted.has_conflict(machine_ids, start_at, end_at):
+            conflicts[key] = "overlaps another booking in this batch"
+        else:
+            accepted.add(-n - 1, machine_ids, start_at, end_at)
+    return conflicts
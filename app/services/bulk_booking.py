@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, insert, or_
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, BookingItem, Machine
+from .audit import audit
+from .booking_rules import MAX_DAYS_AHEAD, validate_booking_window, find_conflicts, parse_utc
+from .notifications import queue_broadcast
+
+FREQUENCIES = ("daily", "weekly")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_OCCURRENCES = 20_000
+IMPORT_COLUMNS = ("start_at", "end_at", "machines", "purpose", "repeat", "until", "weekdays")
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+
+
+class BulkBookingError(ValueError):
+    pass
+
+
+def parse_weekdays(value) -> list[int]:
+    if not value:
+        return []
+    tokens = value if isinstance(value, (list, tuple)) else str(value).replace(",", " ").split()
+    try:
+        return sorted({WEEKDAYS.index(str(t).strip().upper()[:2]) for t in tokens})
+    except ValueError:
+        raise BulkBookingError(f"Weekdays must be among {', '.join(WEEKDAYS)}.")
+
+
+def expand_recurrence(
+    start_at: datetime,
+    end_at: datetime,
+    freq: str,
+    until: date | None = None,
+    weekdays: list[int] | None = None,
+    interval: int = 1,
+) -> list[tuple[datetime, datetime]]:
+    """Occurrences of an RRULE-style daily or weekly series, up to ``until`` (inclusive).
+
+    ``weekdays`` are 0=Monday..6=Sunday; a weekly series without them repeats on
+    the first occurrence's weekday. Nothing is generated past the booking horizon.
+    """
+    if freq not in FREQUENCIES:
+        raise BulkBookingError(f"Repeat must be one of {', '.join(FREQUENCIES)}.")
+    if interval < 1:
+        raise BulkBookingError("Repeat interval must be at least 1.")
+    # The horizon is the same instant validate_booking_window checks, not just its date:
+    # an occurrence later in the day than now on the 90th day would be rejected.
+    horizon = datetime.utcnow() + timedelta(days=MAX_DAYS_AHEAD)
+    days = set(weekdays) if weekdays else (set(range(7)) if freq == "daily" else {start_at.weekday()})
+    duration = end_at - start_at
+
+    out = []
+    offset = 0
+    while True:
+        at = start_at + timedelta(days=offset)
+        if at > horizon or (until and at.date() > until):
+            break
+        period = offset if freq == "daily" else offset // 7
+        if period % interval == 0 and at.weekday() in days:
+            out.append((at, at + duration))
+            if len(out) > MAX_OCCURRENCES:
+                raise BulkBookingError(f"A series can have at most {MAX_OCCURRENCES} occurrences.")
+        offset += 1
+    return out
+
+
+def read_import(data: bytes, filename: str) -> list[dict]:
+    """Rows from an uploaded CSV (header row required) or JSON (a list of objects) file."""
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise BulkBookingError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise BulkBookingError("JSON imports must be a list of objects.")
+        return rows
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"start_at", "end_at", "machines", "purpose"} - set(reader.fieldnames or ())
+    if missing:
+        raise BulkBookingError(f"CSV is missing column(s): {', '.join(sorted(missing))}.")
+    return list(reader)
+
+
+def _machine_tokens(value) -> list[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [t for t in str(value or "").replace(",", ";").replace(" ", ";").split(";") if t]
+
+def _resolve_machines(db: Session, rows: list[dict]) -> dict[str, tuple[int, str]]:
+    # Machines may be given by id or name; resolve every token in the import with one query.
+    tokens = {t for r in rows for t in _machine_tokens(r.get("machines"))}
+    # Anything longer than 18 digits cannot be an id (and would overflow the bind); it is reported as unknown.
+    ids = [int(t) for t in tokens if t.isascii() and t.isdigit() and len(t) <= 18]
+    found = db.execute(
+        select(Machine.id, Machine.name, Machine.status).where(or_(Machine.name.in_(tokens), Machine.id.in_(ids)))
+    ).all()
+    out = {}
+    for mid, name, status in found:
+        out[name] = out[str(mid)] = (mid, status)
+    return out
+
+def _expand_row(row: dict, machines: dict) -> tuple[list[tuple[datetime, datetime]], list[int], str]:
+    try:
+        start_at, end_at = parse_utc(row.get("start_at")), parse_utc(row.get("end_at"))
+    except (TypeError, ValueError):
+        raise BulkBookingError("start_at and end_at must be ISO dates, e.g. 2026-11-02T09:00.")
+    if end_at <= start_at:
+        raise BulkBookingError("End time must be after start time.")
+
+    purpose = str(row.get("purpose") or "").strip()
+    if not 5 <= len(purpose) <= 300:
+        raise BulkBookingError("Purpose must be between 5 and 300 characters.")
+
+    tokens = _machine_tokens(row.get("machines"))
+    if not tokens:
+        raise BulkBookingError("Select at least one machine.")
+    unknown = [t for t in tokens if t not in machines]
+    if unknown:
+        raise BulkBookingError(f"Unknown machine(s): {', '.join(unknown)}.")
+    if any(machines[t][1] != "available" for t in tokens):
+        raise BulkBookingError("One or more selected machines are out of service.")
+    machine_ids = list(dict.fromkeys(machines[t][0] for t in tokens))
+
+    freq = str(row.get("repeat") or "").strip().lower()
+    if not freq or freq == "none":
+        return [(start_at, end_at)], machine_ids, purpose
+    until = row.get("until")
+    try:
+        until = date.fromisoformat(str(until).strip()[:10]) if until else None
+    except ValueError:
+        raise BulkBookingError("until must be an ISO date, e.g. 2026-12-18.")
+    occurrences = expand_recurrence(start_at, end_at, freq, until, parse_weekdays(row.get("weekdays")))
+    if not occurrences:
+        raise BulkBookingError("The series has no occurrences before its end date.")
+    return occurrences, machine_ids, purpose
+
+
+class BulkResult:
+    def __init__(self):
+        self.booking_ids: list[int] = []
+        self.series_id: str | None = None
+        self.errors: list[tuple[int, str]] = []  # (row number, message)
+        self.skipped: list[tuple[int, datetime, str]] = []  # (row number, occurrence start, reason)
+        self.occurrences = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def create_bulk_bookings(
+    db: Session,
+    requester,
+    rows: list[dict],
+    skip_conflicts: bool = False,
+    index=None,
+    source: str = "import",
+) -> BulkResult:
+    """Validate, conflict-check and insert every occurrence described by ``rows`` in one transaction.
+
+    Any invalid row aborts the whole import. Occurrences that clash with an
+    approved booking (or an earlier occurrence in the same import) abort it too,
+    unless ``skip_conflicts`` is set, in which case they are left out and reported.
+    Nothing is committed here; the caller commits.
+    """
+    result = BulkResult()
+    machines = _resolve_machines(db, rows)
+
+    planned = []  # (row number, start_at, end_at, machine_ids, purpose)
+    for n, row in enumerate(rows, start=1):
+        try:
+            occurrences, machine_ids, purpose = _expand_row(row, machines)
+            for start_at, end_at in occurrences:
+                ok, msg = validate_booking_window(start_at, end_at)
+                if not ok:
+                    raise BulkBookingError(f"{start_at:%Y-%m-%d %H:%M}: {msg}")
+                planned.append((n, start_at, end_at, machine_ids, purpose))
+        except BulkBookingError as e:
+            result.errors.append((n, str(e)))
+    if len(planned) > MAX_OCCURRENCES:
+        result.errors.append((0, f"An import can create at most {MAX_OCCURRENCES} bookings."))
+    if result.errors:
+        return result
+
+    conflicts = find_conflicts(db, ((i, p[3], p[1], p[2]) for i, p in enumerate(planned)), index=index)
+    for i, reason in conflicts.items():
+        n, start_at = planned[i][0], planned[i][1]
+        if skip_conflicts:
+            result.skipped.append((n, start_at, reason))
+        else:
+            result.errors.append((n, f"{start_at:%Y-%m-%d %H:%M}: {reason}"))
+    if result.errors:
+        result.errors.sort()
+        return result
+    planned = [p for i, p in enumerate(planned) if i not in conflicts]
+    if not planned:
+        return result
+
+    result.series_id = uuid.uuid4().hex
+    result.occurrences = len(planned)
+    # Plain executemany without RETURNING: SQLite would fall back to one statement per row to
+    # keep RETURNING in order. Ids are read back through the series id instead.
+    db.execute(
+        insert(BookingRequest),
+        [
+            {
+                "requester_id": requester.id,
+                "start_at": start_at,
+                "end_at": end_at,
+                "purpose": purpose,
+                "status": "pending",
+                "checked_in": False,
+                "no_show": False,
+                "series_id": result.series_id,
+            }
+            for _, start_at, end_at, _, purpose in planned
+        ],
+    )
+    result.booking_ids = db.execute(
+        select(BookingRequest.id).where(BookingRequest.series_id == result.series_id).order_by(BookingRequest.id)
+    ).scalars().all()
+    db.execute(
+        insert(BookingItem),
+        [
+            {"booking_id": booking_id, "machine_id": mid}
+            for booking_id, (_, _, _, machine_ids, _) in zip(result.booking_ids, planned)
+            for mid in machine_ids
+        ],
+    )
+
+    first, last = result.booking_ids[0], result.booking_ids[-1]
+    audit(db, requester.email, "booking_request_bulk",
+          f"Created {len(result.booking_ids)} booking request(s) #{first}-#{last} via {source} (series {result.series_id})")
+    queue_broadcast(db, ["approver", "admin"], f"{len(result.booking_ids)} new booking request(s) #{first}-#{last} from {requester.email} awaiting approval.")
+    return result
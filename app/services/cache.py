@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models import CacheVersion
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+            }
+
+
+# Version stamps live in the database so every worker process sees an invalidation:
+# cache keys include the current version, and bumping it orphans the old entries.
+
+# Bumped by the dashboard's events and by utilisation rollup refreshes, which cannot
+# import services/dashboard.py (it imports them).
+DASHBOARD_CACHE = "dashboard"
+
+def cache_version(db: Session, name: str) -> int:
+    return db.execute(select(CacheVersion.version).where(CacheVersion.name == name)).scalar_one_or_none() or 0
+
+def bump_cache_version(db: Session, name: str):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(CacheVersion).values(name=name, version=1)
+    db.execute(stmt.on_conflict_do_update(index_elements=["name"], set_={"version": CacheVersion.version + 1}))
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, Machine
+from .cache import DASHBOARD_CACHE
+from .utilisation import utilisation_last_days
+
+CACHE_NAME = DASHBOARD_CACHE
+
+# Events that change any of the aggregate blocks below.
+INVALIDATED_BY = ("booking.approved", "booking.rejected", "booking.cancelled", "booking.no_show", "machine.toggled")
+
+
+def dashboard_summary(db: Session, days: int = 30) -> dict:
+    # Utilisation, cancellations and no-shows all cover the last ``days`` days.
+    now = datetime.utcnow()
+    return {
+        "util": utilisation_last_days(db, days=days),
+        "cancellations": db.execute(
+            select(func.count()).select_from(BookingRequest)
+            .where(BookingRequest.status == "cancelled", BookingRequest.cancelled_at >= now - timedelta(days=days))
+        ).scalar_one(),
+        "no_shows": db.execute(
+            select(func.count()).select_from(BookingRequest)
+            .where(BookingRequest.no_show.is_(True), BookingRequest.end_at >= now - timedelta(days=days))
+        ).scalar_one(),
+        "out_of_service": db.execute(
+            select(func.count()).select_from(Machine).where(Machine.status == "out_of_service")
+        ).scalar_one(),
+    }
@@ -0,0 +1,96 @@
+from datetime import datetime
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, BookingItem, AuditLog
+from .booking_rules import find_conflicts
+from .locks import lock_machines
+from .events import emit
+from .notifications import queue_notification
+from .queries import BOOKING_WITH_ITEMS
+
+ACTIONS = ("approve", "reject")
+ORDERS = ("first_come", "given")  # by submission (booking id) or in the order the ids were passed
+
+
+def decide_bookings(
+    db: Session,
+    booking_ids: list[int],
+    action: str,
+    actor,
+    note: str | None = None,
+    order: str = "first_come",
+) -> list[dict]:
+    """Approve or reject a set of pending bookings in one transaction.
+
+    Approvals are conflict-checked together: a booking that clashes with an
+    approved booking, or with one approved earlier in the same batch, is
+    rejected instead. Returns one ``{"id", "outcome", "reason"}`` per id, where
+    outcome is approved, rejected or skipped. The caller commits.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action {action!r}")
+    if order not in ORDERS:
+        raise ValueError(f"Unknown order {order!r}")
+    wanted = list(dict.fromkeys(booking_ids))
+
+    # Lock the machines first and read everything the decision depends on afterwards, so a
+    # concurrent approver on another worker either goes first or waits for this commit.
+    lock_machines(db, db.execute(select(BookingItem.machine_id).where(BookingItem.booking_id.in_(wanted))).scalars())
+    found = {
+        b.id: b
+        for b in db.execute(
+            select(BookingRequest)
+            .options(*BOOKING_WITH_ITEMS)
+            .where(BookingRequest.id.in_(wanted))
+            .execution_options(populate_existing=True)
+        ).scalars()
+    }
+
+    outcomes = {}
+    pending = []
+    for booking_id in wanted:
+        b = found.get(booking_id)
+        if b is None or b.status != "pending":
+            outcomes[booking_id] = {"id": booking_id, "outcome": "skipped", "reason": "not found or not pending"}
+        else:
+            pending.append(b)
+    if order == "first_come":
+        pending.sort(key=lambda b: b.id)
+
+    conflicts = {}
+    if action == "approve":
+        # Checked against the database, not the in-process interval index: approvals made by
+        # other workers only reach this process's index on its next resync.
+        conflicts = find_conflicts(db, ((b.id, [it.machine_id for it in b.items], b.start_at, b.end_at) for b in pending))
+
+    now = datetime.utcnow()
+    audit = []
+    for b in pending:
+        b.approver_id = actor.id
+        b.decided_at = now
+        if action == "approve" and b.id not in conflicts:
+            b.status = "approved"
+            b.decision_note = "Approved"
+            audit.append({"actor_email": actor.email, "action": "booking_approve", "detail": f"Approved booking #{b.id}"})
+            queue_notification(db, b.requester_id, f"Booking #{b.id} approved.")
+            emit(db, "booking.approved", booking_id=b.id, machine_ids=[it.machine_id for it in b.items], start_at=b.start_at, end_at=b.end_at)
+            outcomes[b.id] = {"id": b.id, "outcome": "approved", "reason": None}
+        elif action == "approve":
+            reason = conflicts[b.id]
+            b.status = "rejected"
+            b.decision_note = f"Rejected: {reason}."
+            audit.append({"actor_email": actor.email, "action": "booking_reject", "detail": f"Rejected booking #{b.id} due to conflict"})
+            queue_notification(db, b.requester_id, f"Booking #{b.id} rejected: {reason}.")
+            emit(db, "booking.rejected", booking_id=b.id)
+            outcomes[b.id] = {"id": b.id, "outcome": "rejected", "reason": reason}
+        else:
+            b.status = "rejected"
+            b.decision_note = note or "Rejected"
+            audit.append({"actor_email": actor.email, "action": "booking_reject", "detail": f"Rejected booking #{b.id}"})
+            queue_notification(db, b.requester_id, f"Booking #{b.id} rejected: {b.decision_note}")
+            emit(db, "booking.rejected", booking_id=b.id)
+            outcomes[b.id] = {"id": b.id, "outcome": "rejected", "reason": note}
+    if audit:
+        # One executemany; ORM adds would each need their own INSERT ... RETURNING on SQLite.
+        db.execute(insert(AuditLog), [{"at": now, **row} for row in audit])
+    return [outcomes[i] for i in wanted]
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import staging
+
+EVENTS_KEY = "domain_events"
+BUS_KEY = "event_bus"
+
+
+class EventBus:
+    """Domain events raised by views and jobs, delivered around the commit that carries them.
+
+    ``before_commit`` handlers get ``(db, payload)`` and run inside the
+    transaction, so anything they write commits (or rolls back) with the change
+    itself. ``after_commit`` handlers get ``payload`` once the change is durable
+    and are meant for in-process state such as caches and indexes.
+    """
+
+    def __init__(self):
+        self._handlers = defaultdict(list)
+
+    def subscribe(self, names, handler, phase: str = "after_commit", batch: bool = False):
+        # batch=True: called once per commit with the list of every matching payload, so a
+        # commit carrying hundreds of events still costs the handler one statement.
+        if phase not in ("before_commit", "after_commit"):
+            raise ValueError(f"Unknown phase {phase!r}")
+        for name in [names] if isinstance(names, str) else names:
+            self._handlers[(name, phase)].append((handler, batch))
+
+    def publish(self, phase: str, events, db: Session | None = None):
+        batched = {}
+        for name, payload in events:
+            for handler, batch in self._handlers.get((name, phase), ()):
+                if batch:
+                    batched.setdefault(handler, []).append(payload)
+                elif phase == "before_commit":
+                    handler(db, payload)
+                else:
+                    handler(payload)
+        for handler, payloads in batched.items():
+            if phase == "before_commit":
+                handler(db, payloads)
+            else:
+                handler(payloads)
+
+
+def emit(db: Session, name: str, **payload):
+    # Staged on the session; nothing happens unless the surrounding transaction commits.
+    if BUS_KEY not in db.info:
+        return
+    staging.stage(db, EVENTS_KEY, (name, payload))
+
+@staging.on_commit(staging.EVENTS, EVENTS_KEY)
+def _publish_before_commit(session):
+    # Left staged for after_commit; the staging listener drops them if the commit fails.
+    bus = session.info.get(BUS_KEY)
+    if bus:
+        bus.publish("before_commit", list(session.info[EVENTS_KEY]), session)
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    bus = session.info.get(BUS_KEY)
+    events = session.info.pop(EVENTS_KEY, None)
+    if bus and events:
+        bus.publish("after_commit", events)
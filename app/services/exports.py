@@ -0,0 +1,78 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from itertools import groupby
+from typing import Iterable, Iterator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, BookingItem, Machine, User
+from .audit_archive import search_audit
+
+BATCH_SIZE = 1000
+
+BOOKING_HEADER = ["id", "requester_email", "start_at", "end_at", "status", "machines", "no_show", "cancelled_at", "decided_at", "decision_note"]
+AUDIT_HEADER = ["id", "at", "actor_email", "action", "detail"]
+
+
+def booking_rows(db: Session, since: datetime | None = None, until: datetime | None = None, status: str | None = None) -> Iterator[list]:
+    # One row per (booking, machine), streamed in batches and folded back into one line per booking.
+    stmt = (
+        select(
+            BookingRequest.id,
+            User.email,
+            BookingRequest.start_at,
+            BookingRequest.end_at,
+            BookingRequest.status,
+            BookingRequest.no_show,
+            BookingRequest.cancelled_at,
+            BookingRequest.decided_at,
+            BookingRequest.decision_note,
+            Machine.name,
+        )
+        .outerjoin(User, User.id == BookingRequest.requester_id)
+        .outerjoin(BookingItem, BookingItem.booking_id == BookingRequest.id)
+        .outerjoin(Machine, Machine.id == BookingItem.machine_id)
+        .order_by(BookingRequest.start_at.desc(), BookingRequest.id.desc(), Machine.name.asc())
+    )
+    if since is not None:
+        stmt = stmt.where(BookingRequest.start_at >= since)
+    if until is not None:
+        stmt = stmt.where(BookingRequest.start_at < until)
+    if status:
+        stmt = stmt.where(BookingRequest.status == status)
+
+    result = db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    for _, group in groupby(result, key=lambda r: r[0]):
+        group = list(group)
+        b = group[0]
+        machines = "; ".join(r[9] for r in group if r[9])
+        yield [b[0], b[1] or "", b[2].isoformat(), b[3].isoformat(), b[4], machines, b[5], b[6], b[7], b[8]]
+
+
+def audit_rows(db: Session, since: datetime | None = None, until: datetime | None = None,
+               action: str | None = None, actor: str | None = None, archive_dir: str | None = None) -> Iterator[list]:
+    for r in search_audit(db, archive_dir, since=since, until=until, action=action, actor=actor):
+        yield [r["id"], r["at"].isoformat() if r["at"] else "", r["actor_email"], r["action"], r["detail"]]
+
+
+def csv_lines(header: list[str], rows: Iterable[list], flush_every: int = 500) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for n, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if n % flush_every == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def gzipped(chunks: Iterable[str]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
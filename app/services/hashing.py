@@ -0,0 +1,124 @@
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ..security import hash_password, verify_password, needs_rehash, hash_method
+
+
+class HasherBusy(RuntimeError):
+    """Raised when a hash cannot start within ``queue_timeout``; the caller should ask the user to retry."""
+
+
+def _started(fn, *args):
+    # Runs in the pool; the start time (wall clock, shared across processes) gives the queue wait.
+    return time.time(), fn(*args)
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded process pool.
+
+    scrypt and pbkdf2 hold the GIL, so on request threads a burst of logins
+    stalls every other request in the process. Here at most ``max_pending``
+    hashes are queued or running at once; callers beyond that wait up to
+    ``queue_timeout`` seconds for a slot and then get ``HasherBusy``.
+    ``workers=0`` hashes on the calling thread, with the same throttle.
+    If a worker process dies, the pool is replaced and the call retried once.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, queue_timeout: float = 2.0, method: str | None = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.method = method or hash_method()
+        self.completed = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._in_flight = 0
+        self._wait_ms: deque = deque(maxlen=1000)
+        self._total_ms: deque = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the web process has scheduler and writer threads running.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _submit(self, fn, *args):
+        for attempt in (1, 2):
+            pool = self._executor()
+            try:
+                return pool.submit(_started, fn, *args).result()
+            except BrokenProcessPool:
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                if attempt == 2:
+                    raise
+
+    def _run(self, fn, *args):
+        called = time.time()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy("too many password checks in progress")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if self.workers:
+                started, result = self._submit(fn, *args)
+            else:
+                started, result = _started(fn, *args)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._in_flight -= 1
+        with self._lock:
+            self.completed += 1
+            # Waiting for a slot plus waiting in the pool's queue for a free worker.
+            self._wait_ms.append(max(0.0, started - called) * 1000.0)
+            self._total_ms.append((time.time() - called) * 1000.0)
+        return result
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return needs_rehash(password_hash, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        def pct(samples, q):
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+        with self._lock:
+            wait, total = list(self._wait_ms), list(self._total_ms)
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms_p50": round(statistics.median(wait), 2) if wait else None,
+                "wait_ms_p95": pct(wait, 0.95),
+                "total_ms_p50": round(statistics.median(total), 2) if total else None,
+                "total_ms_p95": pct(total, 0.95),
+            }
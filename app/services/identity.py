@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from ..models import User
+
+# Events after which a cached identity may be stale; payloads carry ``user_id``.
+INVALIDATED_BY = ("user.approved", "user.rejected")
+
+
+@dataclass(frozen=True, slots=True)
+class UserIdentity:
+    """Detached, read-only snapshot of a ``User`` for ``current_user``.
+
+    Carries the columns views read from ``current_user`` and the attributes
+    Flask-Login expects, so it can be cached across requests and threads.
+    """
+
+    id: int
+    name: str
+    email: str
+    team: str
+    role: str
+    status: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        return cls(user.id, user.name, user.email, user.team, user.role, user.status)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == "active"
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+
+def load_identity(SessionFactory, user_id: int) -> UserIdentity | None:
+    with SessionFactory() as db:
+        row = db.execute(
+            select(User.id, User.name, User.email, User.team, User.role, User.status).where(User.id == user_id)
+        ).first()
+    return UserIdentity(*row) if row else None
+
+
+def cached_identity(cache, SessionFactory, user_id: int) -> UserIdentity | None:
+    identity = cache.get(user_id)
+    if identity is None:
+        identity = load_identity(SessionFactory, user_id)
+        if identity is not None:
+            cache.set(user_id, identity)
+    return identity
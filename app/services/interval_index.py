@@ -0,0 +1,141 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, BookingItem
+
+
+class IntervalIndex:
+    """Per-machine sorted index of approved (start_at, end_at, booking_id) spans.
+
+    Each machine keeps its spans sorted by start time in a plain list, so an
+    overlap check is two bisects plus a scan of the spans that could still
+    reach into the window (bounded by the longest span seen on that machine).
+
+    The index lives in process memory. Spans that ended before ``horizon`` are
+    pruned, and checks reaching behind the horizon fall back to the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._spans: dict[int, list[tuple[datetime, datetime, int]]] = {}
+        self._longest: dict[int, timedelta] = {}
+        self._machines_by_booking: dict[int, tuple[int, ...]] = {}
+        self._version = 0
+        self.horizon: datetime | None = None
+        self.built_at: datetime | None = None
+
+    def build(self, db: Session):
+        spans, longest, by_booking = self._load(db)
+        with self._lock:
+            self._spans, self._longest, self._machines_by_booking = spans, longest, by_booking
+            self._version += 1
+            self.horizon = None
+            self.built_at = datetime.utcnow()
+
+    @staticmethod
+    def _load(db: Session, horizon: datetime | None = None):
+        q = (
+            select(BookingItem.machine_id, BookingRequest.start_at, BookingRequest.end_at, BookingRequest.id)
+            .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
+            .where(BookingRequest.status == "approved")
+        )
+        if horizon is not None:
+            q = q.where(BookingRequest.end_at > horizon)
+
+        spans: dict[int, list[tuple[datetime, datetime, int]]] = {}
+        longest: dict[int, timedelta] = {}
+        by_booking: dict[int, list[int]] = {}
+        for machine_id, start_at, end_at, booking_id in db.execute(q):
+            spans.setdefault(machine_id, []).append((start_at, end_at, booking_id))
+            longest[machine_id] = max(longest.get(machine_id, timedelta(0)), end_at - start_at)
+            by_booking.setdefault(booking_id, []).append(machine_id)
+        for rows in spans.values():
+            rows.sort()
+        return spans, longest, {k: tuple(v) for k, v in by_booking.items()}
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def covers(self, start_at: datetime) -> bool:
+        return self.ready and (self.horizon is None or start_at >= self.horizon)
+
+    def add(self, booking_id: int, machine_ids: list[int], start_at: datetime, end_at: datetime):
+        with self._lock:
+            self._discard(booking_id)
+            for mid in machine_ids:
+                insort(self._spans.setdefault(mid, []), (start_at, end_at, booking_id))
+                self._longest[mid] = max(self._longest.get(mid, timedelta(0)), end_at - start_at)
+            self._machines_by_booking[booking_id] = tuple(machine_ids)
+
+    def remove(self, booking_id: int):
+        with self._lock:
+            self._discard(booking_id)
+
+    def _discard(self, booking_id: int):
+        self._version += 1
+        for mid in self._machines_by_booking.pop(booking_id, ()):
+            rows = self._spans.get(mid, [])
+            self._spans[mid] = [r for r in rows if r[2] != booking_id]
+
+    def prune(self, before: datetime):
+        # Drop spans that ended before `before`; they can no longer clash with a bookable window.
+        with self._lock:
+            for mid, rows in self._spans.items():
+                kept = [r for r in rows if r[1] > before]
+                if len(kept) != len(rows):
+                    for r in rows:
+                        if r[1] <= before:
+                            self._machines_by_booking.pop(r[2], None)
+                    self._spans[mid] = kept
+                    self._version += 1
+            if self.horizon is None or before > self.horizon:
+                self.horizon = before
+
+    def spans(self, machine_id: int, start_at: datetime, end_at: datetime) -> list[tuple[datetime, datetime, int]]:
+        # overlap rule: existing.start < new.end AND existing.end > new.start
+        with self._lock:
+            rows = self._spans.get(machine_id)
+            if not rows:
+                return []
+            lo = bisect_right(rows, (start_at - self._longest[machine_id], datetime.max, 0))
+            hi = bisect_left(rows, (end_at, datetime.min, 0))
+            return [r for r in rows[lo:hi] if r[1] > start_at]
+
+    def overlapping(self, machine_id: int, start_at: datetime, end_at: datetime) -> list[int]:
+        return [r[2] for r in self.spans(machine_id, start_at, end_at)]
+
+    def has_conflict(self, machine_ids: list[int], start_at: datetime, end_at: datetime) -> bool:
+        return any(self.overlapping(mid, start_at, end_at) for mid in machine_ids)
+
+    def snapshot(self) -> dict[int, list[tuple[datetime, datetime, int]]]:
+        with self._lock:
+            return {mid: list(rows) for mid, rows in self._spans.items() if rows}
+
+    def verify(self, db: Session) -> int:
+        """Compare the index against the database and resync it if they drifted.
+
+        Returns the number of machines whose spans differed.
+        """
+        with self._lock:
+            horizon, version = self.horizon, self._version
+        spans, longest, by_booking = self._load(db, horizon)
+        with self._lock:
+            if version != self._version:
+                # Updated while we were reading; compare again on the next run.
+                return 0
+            current = {mid: rows for mid, rows in self._spans.items() if rows}
+            drift = sum(1 for mid in set(spans) | set(current) if spans.get(mid, []) != current.get(mid, []))
+            if drift:
+                self._spans, self._longest, self._machines_by_booking = spans, longest, by_booking
+            self.built_at = datetime.utcnow()
+        return drift
+
+
+def verify_interval_index(SessionFactory, index: IntervalIndex):
+    with SessionFactory() as db:
+        drift = index.verify(db)
+    if drift:
+        print(f"[IntervalIndex] resynced {drift} machine(s) from the database")
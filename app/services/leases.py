@@ -0,0 +1,73 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models import SchedulerLease
+
+
+def make_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl: timedelta) -> bool:
+    """Take or renew the lease ``name`` for ``holder``; True if ``holder`` now holds it.
+
+    A single upsert claims the row when it is missing, already ours, or expired,
+    so two processes racing for it cannot both win. Commits.
+    """
+    now = datetime.utcnow()
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(SchedulerLease).values(name=name, holder=holder, acquired_at=now, expires_at=now + ttl)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={
+            "holder": stmt.excluded.holder,
+            "expires_at": stmt.excluded.expires_at,
+            "acquired_at": case((SchedulerLease.holder == holder, SchedulerLease.acquired_at), else_=stmt.excluded.acquired_at),
+        },
+        where=or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now),
+    )
+    db.execute(stmt)
+    current = db.execute(select(SchedulerLease.holder).where(SchedulerLease.name == name)).scalar_one()
+    db.commit()
+    return current == holder
+
+
+def release_lease(db: Session, name: str, holder: str):
+    db.execute(delete(SchedulerLease).where(SchedulerLease.name == name, SchedulerLease.holder == holder))
+    db.commit()
+
+
+class Lease:
+    """A named lease held by this process, renewed each time a guarded job runs."""
+
+    def __init__(self, SessionFactory, name: str = "scheduler", ttl: float = 90.0, holder: str | None = None):
+        self.SessionFactory = SessionFactory
+        self.name = name
+        self.ttl = timedelta(seconds=ttl)
+        self.holder = holder or make_holder_id()
+        self.held = False
+
+    def acquire(self) -> bool:
+        with self.SessionFactory() as db:
+            held = acquire_lease(db, self.name, self.holder, self.ttl)
+        if held != self.held:
+            print(f"[Lease] {self.holder} {'acquired' if held else 'lost'} lease {self.name!r}")
+        self.held = held
+        return held
+
+    def release(self):
+        if self.held:
+            with self.SessionFactory() as db:
+                release_lease(db, self.name, self.holder)
+            self.held = False
+
+    def guard(self, fn):
+        # Run `fn` only while this process holds the lease.
+        def run():
+            if self.acquire():
+                fn()
+        return run
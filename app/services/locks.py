@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models import MachineLock
+
+
+def lock_machines(db: Session, machine_ids) -> list[int]:
+    """Hold a lock on each machine until the current transaction ends.
+
+    Anything that must read and then write booking state for a machine (an
+    approval checking for overlaps) takes these locks first and reads after,
+    so two approvers on different workers cannot both see the machine free.
+
+    PostgreSQL locks just the rows, in id order so concurrent callers cannot
+    deadlock. SQLite has no row locks; the UPDATE takes the database write
+    lock, which serialises every writer until commit.
+    """
+    ids = sorted(set(machine_ids))
+    if not ids:
+        return ids
+    dialect_name = db.get_bind().dialect.name
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    db.execute(dialect.insert(MachineLock).values([{"machine_id": mid} for mid in ids]).on_conflict_do_nothing(index_elements=["machine_id"]))
+    if dialect_name == "postgresql":
+        db.execute(select(MachineLock.machine_id).where(MachineLock.machine_id.in_(ids)).order_by(MachineLock.machine_id).with_for_update())
+    else:
+        db.execute(
+            update(MachineLock).where(MachineLock.machine_id.in_(ids)).values(locked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    return ids
@@ -0,0 +1,127 @@
+import re
+from sqlalchemy import select, func, or_, literal_column, table, column, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..models import Machine, Site
+from .pagination import PageRequest, Page, paginate
+
+# On SQLite, machine search goes through an FTS5 table kept in step with machines and
+# sites by triggers; rowid is the machine id. Other databases fall back to LIKE.
+FTS_TABLE = "machines_fts"
+
+_fts = table(FTS_TABLE, column("rowid"))
+
+_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(name, category, machine_type, site, city)",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON machines BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, category, machine_type, site, city)
+        SELECT new.id, new.name, new.category, new.machine_type, s.name, s.city FROM sites s WHERE s.id = new.site_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF name, category, machine_type, site_id ON machines BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, category, machine_type, site, city)
+        SELECT new.id, new.name, new.category, new.machine_type, s.name, s.city FROM sites s WHERE s.id = new.site_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON machines BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_su AFTER UPDATE OF name, city ON sites BEGIN
+        UPDATE {FTS_TABLE} SET site = new.name, city = new.city
+        WHERE rowid IN (SELECT id FROM machines WHERE site_id = new.id);
+    END""",
+]
+
+
+def ensure_machine_search(engine: Engine) -> bool:
+    """Create and fill the FTS table on SQLite if it is missing. Returns True if it was created."""
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        if FTS_TABLE in inspect(conn).get_table_names():
+            return False
+        for ddl in _FTS_DDL:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, category, machine_type, site, city) "
+            "SELECT m.id, m.name, m.category, m.machine_type, s.name, s.city FROM machines m JOIN sites s ON s.id = m.site_id"
+        )
+    return True
+
+
+def filters_from_args(args) -> dict:
+    # ?site=<id>&category=<name>&status=<status>, as the facet links write them.
+    return {
+        "site_id": args.get("site", type=int),
+        "category": args.get("category") or None,
+        "status": args.get("status") or None,
+    }
+
+
+def _terms(q: str) -> list[str]:
+    # Split the way FTS5's unicode61 tokenizer does, so "TM-001" finds "tm" and "001".
+    return [t for t in re.split(r"\W+", q.lower()) if t]
+
+
+def _matches(db: Session, q: str):
+    terms = _terms(q)
+    if not terms:
+        return None
+    if db.get_bind().dialect.name == "sqlite":
+        expr = " ".join(f'"{t}"*' for t in terms)
+        return Machine.id.in_(select(_fts.c.rowid).where(literal_column(FTS_TABLE).op("MATCH")(expr)))
+    return Machine.id.in_(
+        select(Machine.id).join(Site, Site.id == Machine.site_id).where(*[
+            or_(
+                Machine.name.ilike(f"%{t}%"), Machine.category.ilike(f"%{t}%"), Machine.machine_type.ilike(f"%{t}%"),
+                Site.name.ilike(f"%{t}%"), Site.city.ilike(f"%{t}%"),
+            )
+            for t in terms
+        ])
+    )
+
+
+def _filters(db: Session, q: str, site_id=None, category=None, status=None, machine_type=None, skip=None) -> list:
+    conds = []
+    match = _matches(db, q)
+    if match is not None:
+        conds.append(match)
+    if site_id is not None and skip != "site":
+        conds.append(Machine.site_id == site_id)
+    if category and skip != "category":
+        conds.append(Machine.category == category)
+    if status and skip != "status":
+        conds.append(Machine.status == status)
+    if machine_type:
+        conds.append(Machine.machine_type == machine_type)
+    return conds
+
+
+def search_machines(db: Session, q: str = "", page: PageRequest | None = None, options=(), **filters) -> Page:
+    """Machines matching every term of ``q`` (prefix match on name, category, type,
+    site and city) and the exact ``site_id``/``category``/``status``/``machine_type``
+    filters, in name order."""
+    stmt = select(Machine).options(*options).where(*_filters(db, q, **filters))
+    return paginate(db, stmt, [(Machine.name, "asc"), (Machine.id, "asc")], page or PageRequest(per_page=200))
+
+
+def machine_facets(db: Session, q: str = "", **filters) -> dict:
+    """Counts per site, category and status for the same search.
+
+    Each facet ignores its own filter, so the other values stay visible as
+    alternatives once one is selected.
+    """
+    facets = {}
+    site_rows = db.execute(
+        select(Site.id, Site.city, func.count(Machine.id))
+        .join(Machine, Machine.site_id == Site.id)
+        .where(*_filters(db, q, skip="site", **filters))
+        .group_by(Site.id, Site.city)
+        .order_by(Site.city)
+    ).all()
+    facets["site"] = [{"value": site_id, "label": city, "count": n} for site_id, city, n in site_rows]
+    for name, col in (("category", Machine.category), ("status", Machine.status)):
+        rows = db.execute(
+            select(col, func.count()).where(*_filters(db, q, skip=name, **filters)).group_by(col).order_by(col)
+        ).all()
+        facets[name] = [{"value": value, "label": value, "count": n} for value, n in rows]
+    return facets
@@ -5,27 +5,187 @@ Created on Tue Jan 13 14:16:22 2026
 @author: NBoyd1
 """
 
+import heapq
+import threading
 from datetime import datetime, timedelta
-from sqlalchemy import select
+from sqlalchemy import select, update
 from ..models import BookingRequest
 from .notifications import queue_notification
+from .events import emit
 
-def mark_no_shows(SessionFactory):
-    # Mark bookings as no-show if booking ended > 15 minutes ago, approved, and not checked in.
+# A booking becomes a no-show if nobody has checked in this long after it ends.
+GRACE = timedelta(minutes=15)
+CHUNK = 5000
+
+def _due(cutoff: datetime):
+    return (
+        BookingRequest.status == "approved",
+        BookingRequest.end_at <= cutoff,
+        BookingRequest.checked_in.is_(False),
+        BookingRequest.no_show.is_(False),
+    )
+
+def mark_no_shows(SessionFactory, index=None, booking_ids=None, now: datetime | None = None) -> int:
+    """Mark approved bookings that ended more than GRACE ago without a check-in.
+
+    Works through the backlog in chunks of CHUNK, one bulk UPDATE and one
+    commit per chunk. ``booking_ids`` limits it to those bookings (a timer
+    firing, which passes the ``now`` it popped them at so none of them is
+    judged against a different clock reading); the conditions are re-checked
+    in the UPDATE, so a booking cancelled or checked in meanwhile, or already
+    marked by another process, is left alone. Returns the number of bookings
+    marked.
+    """
+    cutoff = (now or datetime.utcnow()) - GRACE
+    marked = 0
+    pending = sorted(booking_ids) if booking_ids is not None else None
     with SessionFactory() as db:
-        cutoff = datetime.utcnow() - timedelta(minutes=15)
+        while True:
+            q = select(BookingRequest.id).where(*_due(cutoff)).order_by(BookingRequest.id).limit(CHUNK)
+            if pending is not None:
+                if not pending:
+                    break
+                q = q.where(BookingRequest.id.in_(pending[:CHUNK]))
+                pending = pending[CHUNK:]
+            ids = db.execute(q).scalars().all()
+            if not ids:
+                if pending:
+                    continue
+                break
+            rows = db.execute(
+                update(BookingRequest)
+                .where(BookingRequest.id.in_(ids), *_due(cutoff))
+                .values(no_show=True)
+                .returning(BookingRequest.id, BookingRequest.requester_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for booking_id, requester_id in rows:
+                queue_notification(db, requester_id, f"No-show recorded for booking #{booking_id}. If this is incorrect, contact an admin.")
+            if rows:
+                emit(db, "booking.no_show", booking_ids=[r[0] for r in rows])
+            db.commit()
+            marked += len(rows)
+            if pending is None and len(ids) < CHUNK:
+                break
+
+    if index is not None:
+        index.prune(cutoff)
+    return marked
+
+
+class NoShowTimer:
+    """Fires the no-show check for each approved booking at ``end_at + GRACE``.
+
+    Deadlines sit in a min-heap; cancelled or checked-in bookings are dropped
+    from ``_deadlines`` and their heap entries skipped when they surface. A
+    single daemon thread sleeps until the earliest deadline and marks every
+    booking due by then in one call to ``mark_no_shows``. Deadlines are loaded
+    when the timer starts, and ``schedule`` does nothing until then. Started
+    with a ``lease``, it only marks bookings while this process holds it;
+    deadlines that fall due elsewhere are left to the holder.
+    """
+
+    def __init__(self, SessionFactory, index=None):
+        self.SessionFactory = SessionFactory
+        self.index = index
+        self.fired = 0
+        self._heap: list[tuple[datetime, int]] = []
+        self._deadlines: dict[int, datetime] = {}
+        self._wake = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.lease = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def load(self, db) -> int:
+        # Bookings still inside their grace period; anything older is the sweep's job.
+        cutoff = datetime.utcnow() - GRACE
         rows = db.execute(
-            select(BookingRequest)
-            .where(
+            select(BookingRequest.id, BookingRequest.end_at).where(
                 BookingRequest.status == "approved",
-                BookingRequest.end_at < cutoff,
+                BookingRequest.end_at >= cutoff,
                 BookingRequest.checked_in.is_(False),
                 BookingRequest.no_show.is_(False),
             )
-            .limit(50)
-        ).scalars().all()
+        ).all()
+        with self._wake:
+            self._deadlines = {booking_id: end_at + GRACE for booking_id, end_at in rows}
+            self._heap = [(deadline, booking_id) for booking_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+            self._wake.notify()
+        return len(rows)
+
+    def schedule(self, booking_id: int, end_at: datetime):
+        deadline = end_at + GRACE
+        with self._wake:
+            # Only a process running the timer keeps deadlines; elsewhere they would pile up.
+            if self._thread is None or self._stopped:
+                return
+            self._deadlines[booking_id] = deadline
+            heapq.heappush(self._heap, (deadline, booking_id))
+            if self._heap[0] == (deadline, booking_id):
+                self._wake.notify()
+
+    def discard(self, booking_id: int):
+        with self._wake:
+            self._deadlines.pop(booking_id, None)
+
+    def pop_due(self, now: datetime) -> list[int]:
+        due = []
+        with self._wake:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, booking_id = heapq.heappop(self._heap)
+                if self._deadlines.get(booking_id) == deadline:
+                    del self._deadlines[booking_id]
+                    due.append(booking_id)
+        return due
+
+    def sweep(self) -> int:
+        """Catch up on the whole backlog in bulk, then reload the deadlines.
+
+        Run periodically as well, so bookings approved by another process are
+        picked up.
+        """
+        marked = mark_no_shows(self.SessionFactory, self.index)
+        with self.SessionFactory() as db:
+            self.load(db)
+        return marked
+
+    def start(self, lease=None):
+        if self._thread is None:
+            self.lease = lease
+            with self.SessionFactory() as db:
+                self.load(db)
+            self._thread = threading.Thread(target=self._run, name="no-show-timer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
 
-        for b in rows:
-            b.no_show = True
-            queue_notification(db, b.requester_id, f"No-show recorded for booking #{b.id}. If this is incorrect, contact an admin.")
-        db.commit()
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._stopped:
+                    # Heap entries for discarded bookings are skipped by pop_due.
+                    timeout = None
+                    if self._heap:
+                        timeout = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                        if timeout <= 0:
+                            break
+                    self._wake.wait(timeout)
+                if self._stopped:
+                    return
+            now = datetime.utcnow()
+            due = self.pop_due(now)
+            if due:
+                try:
+                    # Without the lease they are left to the holder: its timer or its next sweep marks them.
+                    if self.lease is None or self.lease.acquire():
+                        self.fired += mark_no_shows(self.SessionFactory, self.index, booking_ids=due, now=now)
+                except Exception as e:
+                    # Left for the next sweep.
+                    print(f"[NoShowTimer] failed to mark {len(due)} booking(s): {e}")
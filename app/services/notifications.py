@@ -5,27 +5,214 @@ Created on Tue Jan 13 14:15:54 2026
 @author: NBoyd1
 """
 
-from datetime import datetime
-from sqlalchemy import select
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, or_
 from sqlalchemy.orm import Session
-from ..models import Notification
+from ..models import Notification, NotificationDelivery, User
+from . import staging
+from .transports import ConsoleTransport
+
+OUTBOX_KEY = "notification_outbox"
+# A message that has failed this many sends is no longer claimed; it stays unsent with
+# attempts == MAX_ATTEMPTS as a dead letter.
+MAX_ATTEMPTS = 5
+
+
+def _stage(db: Session, row: dict):
+    # Staged on the session and written in one bulk insert when the caller commits.
+    staging.stage(db, OUTBOX_KEY, {"user_id": None, "audience_roles": None, "audience_team": None, "created_at": datetime.utcnow(), **row})
 
 def queue_notification(db: Session, user_id: int, message: str):
-    db.add(Notification(user_id=user_id, message=message))
-    db.commit()
+    _stage(db, {"user_id": user_id, "message": message})
+
+def queue_broadcast(db: Session, roles: list[str], message: str, team: str | None = None):
+    # One row for the whole audience; recipients are resolved when it is dispatched.
+    _stage(db, {"audience_roles": ",".join(roles), "audience_team": team, "message": message})
+
+@staging.on_commit(staging.NOTIFICATIONS, OUTBOX_KEY)
+def flush_outbox(db: Session) -> int:
+    rows = db.info.pop(OUTBOX_KEY, None)
+    if not rows:
+        return 0
+    db.execute(insert(Notification), rows)
+    return len(rows)
+
+
+class NotificationDispatcher:
+    """Claims unsent notifications in batches and sends them through a transport.
+
+    A batch is claimed with a single UPDATE ... RETURNING, so several
+    dispatchers (or processes) never send the same row twice; claims older than
+    ``lease`` are considered abandoned and picked up again. Sends run on a small
+    thread pool, and the batch size doubles while the queue keeps filling it and
+    halves once it drains. A failed send is released for the next run, up to
+    ``max_attempts`` sends per message.
+
+    Broadcast rows are expanded here, so the audience is whoever is active in
+    the roles (and team) when the broadcast is sent, not when it was queued:
+    someone who has since left no longer gets it, and a new approver sees
+    requests that are still waiting. Each successful send is recorded per
+    broadcast and recipient, so a retried broadcast only goes to the users it
+    has not reached yet.
+    """
+
+    def __init__(self, SessionFactory, transport=None, workers: int = 8,
+                 min_batch: int = 25, max_batch: int = 1000, lease: timedelta = timedelta(minutes=5),
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.SessionFactory = SessionFactory
+        self.transport = transport or ConsoleTransport()
+        self.workers = workers
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.batch_size = min_batch
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify")
+
+    def claim(self, limit: int) -> tuple[str, list]:
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        claimable = (
+            Notification.sent_at.is_(None),
+            Notification.attempts < self.max_attempts,
+            or_(Notification.claimed_at.is_(None), Notification.claimed_at < now - self.lease),
+        )
+        # The conditions are repeated on the UPDATE: under READ COMMITTED two dispatchers can
+        # pick the same ids, and the second UPDATE must then find them already claimed. Where
+        # supported, SKIP LOCKED lets the second one pick different rows instead of waiting.
+        due = (
+            select(Notification.id)
+            .where(*claimable)
+            .order_by(Notification.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        with self.SessionFactory() as db:
+            rows = db.execute(
+                update(Notification)
+                .where(Notification.id.in_(due.scalar_subquery()), *claimable)
+                .values(claimed_at=now, claim_token=token)
+                .returning(
+                    Notification.id,
+                    Notification.user_id,
+                    Notification.audience_roles,
+                    Notification.audience_team,
+                    Notification.message,
+                    Notification.attempts,
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        return token, sorted(rows, key=lambda r: r.id)
+
+    def _send(self, item) -> bool:
+        user_id, message = item
+        try:
+            self.transport.send(user_id, message)
+            return True
+        except Exception as exc:
+            print(f"[Notification] send to user_id={user_id} failed: {exc}")
+            return False
+
+    def _send_all(self, items: list[tuple[int, str]]) -> list[bool]:
+        return list(self._pool.map(self._send, items))
+
+    @staticmethod
+    def _recipients(db: Session, row) -> list[int]:
+        sent = select(NotificationDelivery.user_id).where(NotificationDelivery.notification_id == row.id)
+        q = select(User.id).where(
+            User.status == "active",
+            User.role.in_(row.audience_roles.split(",")),
+            User.id.not_in(sent),
+        )
+        if row.audience_team:
+            q = q.where(User.team == row.audience_team)
+        return list(db.execute(q).scalars())
+
+    def _dispatch_broadcasts(self, db: Session, rows: list) -> tuple[list[int], list[int]]:
+        # A broadcast is done once every recipient has it. On its last attempt the ones that
+        # still fail are given up on, so one dead address cannot keep it in the queue.
+        done, retry = [], []
+        for row in rows:
+            recipients = self._recipients(db, row)
+            results = self._send_all([(uid, row.message) for uid in recipients])
+            delivered = [uid for uid, ok in zip(recipients, results) if ok]
+            failed = [uid for uid, ok in zip(recipients, results) if not ok]
+            if delivered:
+                db.execute(insert(NotificationDelivery), [{"notification_id": row.id, "user_id": uid} for uid in delivered])
+                db.commit()
+            if failed and row.attempts + 1 >= self.max_attempts:
+                print(f"[Notification] giving up on broadcast #{row.id} to user_ids={failed} after {row.attempts + 1} attempts")
+                failed = []
+            (retry if failed else done).append(row.id)
+        return done, retry
+
+    def dispatch_once(self) -> int:
+        limit = self.batch_size
+        token, rows = self.claim(limit)
+        if not rows:
+            self.batch_size = self.min_batch
+            return 0
+
+        direct = [r for r in rows if r.user_id is not None]
+        broadcasts = [r for r in rows if r.user_id is None]
+
+        results = self._send_all([(r.user_id, r.message) for r in direct])
+        sent = [r.id for r, ok in zip(direct, results) if ok]
+        failed = [r.id for r, ok in zip(direct, results) if not ok]
+        for r, ok in zip(direct, results):
+            if not ok and r.attempts + 1 >= self.max_attempts:
+                print(f"[Notification] giving up on #{r.id} to user_id={r.user_id} after {r.attempts + 1} attempts")
+
+        with self.SessionFactory() as db:
+            if broadcasts:
+                done, retry = self._dispatch_broadcasts(db, broadcasts)
+                sent += done
+                failed += retry
+            if sent:
+                db.execute(
+                    update(Notification)
+                    .where(Notification.id.in_(sent), Notification.claim_token == token)
+                    .values(sent_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            if failed:
+                db.execute(
+                    update(Notification)
+                    .where(Notification.id.in_(failed), Notification.claim_token == token)
+                    .values(claimed_at=None, claim_token=None, attempts=Notification.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+
+        if len(rows) == limit:
+            self.batch_size = min(self.max_batch, limit * 2)
+        else:
+            self.batch_size = max(self.min_batch, limit // 2)
+        return len(sent)
 
-def process_notification_queue(SessionFactory):
-    # Simulated email/SMS sender: prints messages to console and marks sent.
-    with SessionFactory() as db:
-        pending = db.execute(
-            select(Notification).where(Notification.sent_at.is_(None)).order_by(Notification.created_at).limit(25)
-        ).scalars().all()
+    def run(self, max_rounds: int = 50) -> int:
+        # Keep going while batches come back full, i.e. while there is a backlog.
+        total = 0
+        for _ in range(max_rounds):
+            limit = self.batch_size
+            sent = self.dispatch_once()
+            total += sent
+            if sent < limit:
+                break
+        return total
 
-        if not pending:
-            return
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
 
-        for n in pending:
-            print(f"[Notification] to user_id={n.user_id}: {n.message}")
-            n.sent_at = datetime.utcnow()
 
-        db.commit()
+def process_notification_queue(SessionFactory, dispatcher: NotificationDispatcher | None = None) -> int:
+    if dispatcher is not None:
+        return dispatcher.run()
+    dispatcher = NotificationDispatcher(SessionFactory, workers=1)
+    try:
+        return dispatcher.run()
+    finally:
+        dispatcher.shutdown()
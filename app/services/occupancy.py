@@ -0,0 +1,200 @@
+import threading
+from datetime import datetime, timedelta, date, time
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models import BookingRequest, BookingItem
+from .booking_rules import MAX_DAYS_AHEAD
+
+SLOT = timedelta(minutes=15)
+SLOTS_PER_DAY = 96  # 12 bytes, so every day starts on a byte boundary
+PAST_DAYS = 7
+RESOLUTIONS = {"day": SLOTS_PER_DAY, "hour": 4}
+
+
+class OccupancyMap:
+    """Per-machine bitmaps of approved bookings in 15-minute slots.
+
+    Each machine has one ``bytearray`` with a bit per slot, from midnight
+    PAST_DAYS ago to the end of the booking horizon (about 1.2 KB per
+    machine). A slot's bit is set if any approved booking touches it, so
+    ``is_free`` is conservative at slot granularity: a False can be a
+    partial overlap, and a True is definite.
+
+    Approvals set bits directly. Cancellations clear the booking's slots and
+    redraw the machine's other bookings over them, so neighbours sharing a
+    slot keep their bits. ``rebuild_occupancy`` runs periodically to pick up
+    other processes' changes and move the window forward each day.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows: dict[int, bytearray] = {}
+        self._bookings: dict[int, tuple[tuple[int, ...], datetime, datetime]] = {}
+        self._by_machine: dict[int, set[int]] = {}
+        self.origin: datetime | None = None
+        self.slots = (PAST_DAYS + MAX_DAYS_AHEAD + 2) * SLOTS_PER_DAY
+        self.built_at: datetime | None = None
+        self._version = 0
+
+    @property
+    def end(self) -> datetime:
+        return self.origin + self.slots * SLOT
+
+    def build(self, db: Session, now: datetime | None = None) -> bool:
+        """Load approved bookings in the window starting PAST_DAYS before ``now``.
+
+        If the map was updated while the rows were being read, the read is
+        repeated (up to three times) so an approval is not lost in the swap.
+        Returns False if the map was left as it was.
+        """
+        origin = datetime.combine((now or datetime.utcnow()).date() - timedelta(days=PAST_DAYS), time.min)
+        end = origin + self.slots * SLOT
+        q = (
+            select(BookingRequest.id, BookingRequest.start_at, BookingRequest.end_at, BookingItem.machine_id)
+            .join(BookingItem, BookingItem.booking_id == BookingRequest.id)
+            .where(BookingRequest.status == "approved", BookingRequest.end_at > origin, BookingRequest.start_at < end)
+        )
+        for _ in range(3):
+            version = self._version
+            spans: dict[int, list] = {}
+            for booking_id, start_at, end_at, machine_id in db.execute(q):
+                spans.setdefault(booking_id, [start_at, end_at, []])[2].append(machine_id)
+            with self._lock:
+                if version == self._version or self.origin is None:
+                    self._swap(origin, spans)
+                    return True
+            db.rollback()  # end the read so the next one sees the newer rows
+        return False
+
+    def _swap(self, origin: datetime, spans: dict[int, list]):
+        with self._lock:
+            self.origin = origin
+            self._rows, self._bookings, self._by_machine = {}, {}, {}
+            for booking_id, (start_at, end_at, machine_ids) in spans.items():
+                self._add(booking_id, machine_ids, start_at, end_at)
+            self.built_at = datetime.utcnow()
+            self._version += 1
+
+    def _slot_range(self, start_at: datetime, end_at: datetime) -> tuple[int, int]:
+        first = int((start_at - self.origin) / SLOT)
+        last = -int(-(end_at - self.origin) / SLOT)  # ceiling
+        return max(0, first), min(self.slots, last)
+
+    def _row(self, machine_id: int) -> bytearray:
+        row = self._rows.get(machine_id)
+        if row is None:
+            row = self._rows[machine_id] = bytearray(self.slots // 8)
+        return row
+
+    @staticmethod
+    def _fill(row: bytearray, a: int, b: int, on: bool):
+        # Set or clear bits [a, b): whole bytes by slice, the ragged ends bit by bit.
+        while a < b and a % 8:
+            row[a >> 3] = row[a >> 3] | (1 << (a & 7)) if on else row[a >> 3] & ~(1 << (a & 7))
+            a += 1
+        while b > a and b % 8:
+            b -= 1
+            row[b >> 3] = row[b >> 3] | (1 << (b & 7)) if on else row[b >> 3] & ~(1 << (b & 7))
+        if a < b:
+            row[a >> 3:b >> 3] = (b"\xff" if on else b"\x00") * ((b - a) >> 3)
+
+    def _add(self, booking_id: int, machine_ids, start_at: datetime, end_at: datetime):
+        a, b = self._slot_range(start_at, end_at)
+        if a >= b:
+            return
+        self._bookings[booking_id] = (tuple(machine_ids), start_at, end_at)
+        for mid in machine_ids:
+            self._by_machine.setdefault(mid, set()).add(booking_id)
+            self._fill(self._row(mid), a, b, True)
+
+    def add(self, booking_id: int, machine_ids, start_at: datetime, end_at: datetime):
+        with self._lock:
+            if self.origin is not None:
+                self.remove(booking_id)
+                self._add(booking_id, machine_ids, start_at, end_at)
+            self._version += 1
+
+    def remove(self, booking_id: int):
+        with self._lock:
+            self._version += 1
+            entry = self._bookings.pop(booking_id, None)
+            if entry is None:
+                return
+            machine_ids, start_at, end_at = entry
+            a, b = self._slot_range(start_at, end_at)
+            for mid in machine_ids:
+                others = self._by_machine.get(mid, set())
+                others.discard(booking_id)
+                row = self._row(mid)
+                self._fill(row, a, b, False)
+                for other in others:
+                    _, o_start, o_end = self._bookings[other]
+                    oa, ob = self._slot_range(o_start, o_end)
+                    if oa < b and ob > a:
+                        self._fill(row, max(a, oa), min(b, ob), True)
+
+    def covers(self, start_at: datetime, end_at: datetime) -> bool:
+        return self.origin is not None and start_at >= self.origin and end_at <= self.end
+
+    def is_free(self, machine_id: int, start_at: datetime, end_at: datetime) -> bool | None:
+        """True if no approved booking touches the window's slots; None outside the map."""
+        if not self.covers(start_at, end_at):
+            return None
+        a, b = self._slot_range(start_at, end_at)
+        with self._lock:
+            row = self._rows.get(machine_id)
+            if row is None or a >= b:
+                return True
+            lo, hi = a >> 3, (b + 7) >> 3
+            bits = int.from_bytes(row[lo:hi], "little") >> (a - (lo << 3))
+            return bits & ((1 << (b - a)) - 1) == 0
+
+    def covered_days(self, first_day: date, days: int) -> int:
+        """How many of ``days`` days from ``first_day`` fall inside the map; 0 if it starts before it."""
+        start = int((datetime.combine(first_day, time.min) - self.origin) / SLOT)
+        if start < 0:
+            return 0
+        return max(0, min(days, (self.slots - start) // SLOTS_PER_DAY))
+
+    def timeline(self, machine_ids, first_day: date, days: int, resolution: str = "day") -> dict[int, list[float]]:
+        """Fraction of each day (or hour) occupied, per machine, for ``days`` days from ``first_day``.
+
+        Days past the end of the map are left out; ``covered_days`` says how many are returned.
+        """
+        per_bucket = RESOLUTIONS[resolution]
+        start = int((datetime.combine(first_day, time.min) - self.origin) / SLOT)
+        days = self.covered_days(first_day, days)
+        if not days:
+            return {mid: [] for mid in machine_ids}
+        mask = (1 << per_bucket) - 1
+        out = {}
+        with self._lock:
+            for mid in machine_ids:
+                row = self._rows.get(mid)
+                if row is None:
+                    out[mid] = [0.0] * (days * SLOTS_PER_DAY // per_bucket)
+                    continue
+                window = row[start >> 3:(start >> 3) + days * SLOTS_PER_DAY // 8]
+                buckets = []
+                for d in range(days):
+                    day = int.from_bytes(window[d * 12:(d + 1) * 12], "little")
+                    if per_bucket == SLOTS_PER_DAY:
+                        buckets.append(round(day.bit_count() / SLOTS_PER_DAY, 3))
+                    else:
+                        buckets.extend(((day >> (i * per_bucket)) & mask).bit_count() / per_bucket for i in range(SLOTS_PER_DAY // per_bucket))
+                out[mid] = buckets
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "origin": self.origin.isoformat() if self.origin else None,
+                "machines": len(self._rows),
+                "bookings": len(self._bookings),
+                "bytes": sum(len(r) for r in self._rows.values()),
+            }
+
+
+def rebuild_occupancy(SessionFactory, occupancy: OccupancyMap):
+    with SessionFactory() as db:
+        occupancy.build(db)
@@ -0,0 +1,135 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import request, url_for
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+PAGE_SIZES = (10, 25, 50, 100, 200)
+MAX_PER_PAGE = PAGE_SIZES[-1]
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str, keys) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Malformed cursor")
+    out = []
+    for (column, _), value in zip(keys, values):
+        # Decoded JSON can hold anything; each value must match its key column's type
+        # (datetimes travel as ISO strings) before it goes into the seek predicate.
+        expected = column.type.python_type
+        if value is None and column.nullable:
+            pass
+        elif expected is datetime:
+            if not isinstance(value, str):
+                raise ValueError("Malformed cursor")
+            value = datetime.fromisoformat(value)
+        elif expected is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        elif type(value) is not expected:
+            raise ValueError("Malformed cursor")
+        out.append(value)
+    return out
+
+
+class PageRequest:
+    """Which page of a list to show: ``per_page`` rows after (or before) an opaque cursor."""
+
+    def __init__(self, per_page: int = 50, after: str | None = None, before: str | None = None):
+        self.per_page = max(1, min(per_page, MAX_PER_PAGE))
+        self.after = after
+        self.before = None if after else before
+
+    @classmethod
+    def from_args(cls, args, prefix: str = "", per_page: int = 50) -> "PageRequest":
+        # Query-string names are prefixed so one page can hold several paginated lists.
+        return cls(
+            per_page=args.get(f"{prefix}per_page", per_page, type=int),
+            after=args.get(f"{prefix}after") or None,
+            before=args.get(f"{prefix}before") or None,
+        )
+
+
+class Page:
+    def __init__(self, items: list, per_page: int, next_cursor: str | None, prev_cursor: str | None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _seek(keys, values, backwards: bool):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), honouring each key's direction.
+    clauses = []
+    for i, (column, direction) in enumerate(keys):
+        forward = (direction == "desc") == backwards
+        step = column > values[i] if forward else column < values[i]
+        clauses.append(and_(*[keys[j][0] == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+def paginate(db: Session, stmt, keys, page: PageRequest) -> Page:
+    """Run ``stmt`` one keyset page at a time.
+
+    ``keys`` is a list of ``(column, "asc" | "desc")`` pairs that together are
+    unique per row, normally a timestamp followed by the primary key. The
+    statement must not carry its own ORDER BY or LIMIT.
+    """
+    token, backwards = (page.before, True) if page.before else (page.after, False)
+    if token:
+        try:
+            stmt = stmt.where(_seek(keys, decode_cursor(token, keys), backwards))
+        except ValueError:
+            token, backwards = None, False
+
+    order = []
+    for column, direction in keys:
+        descending = (direction == "desc") != backwards
+        order.append(column.desc() if descending else column.asc())
+    rows = db.execute(stmt.order_by(*order).limit(page.per_page + 1)).scalars().all()
+
+    more = len(rows) > page.per_page
+    rows = rows[:page.per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor(item):
+        return encode_cursor([getattr(item, column.key) for column, _ in keys])
+
+    next_cursor = cursor(rows[-1]) if rows and (more or backwards) else None
+    prev_cursor = cursor(rows[0]) if rows and ((more and backwards) or (token and not backwards)) else None
+    return Page(rows, page.per_page, next_cursor, prev_cursor)
+
+
+def page_url(prefix: str = "", **changes) -> str:
+    """URL for the current view with one list's paging arguments replaced; other arguments are kept."""
+    args = request.args.to_dict()
+    for name in ("after", "before"):
+        args.pop(f"{prefix}{name}", None)
+    for name, value in changes.items():
+        if value is None:
+            args.pop(f"{prefix}{name}", None)
+        else:
+            args[f"{prefix}{name}"] = value
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
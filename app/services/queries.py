@@ -0,0 +1,67 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload, joinedload
+from ..models import BookingRequest, BookingItem, Machine, User
+from .pagination import PageRequest, Page, paginate
+from . import machine_search
+
+# Named loader strategies. Views close their session before the template renders,
+# so anything a template touches has to be loaded up front.
+BOOKING_WITH_ITEMS = (selectinload(BookingRequest.items).joinedload(BookingItem.machine),)
+BOOKING_WITH_REQUESTER = (joinedload(BookingRequest.requester),)
+BOOKING_FULL = BOOKING_WITH_ITEMS + BOOKING_WITH_REQUESTER
+MACHINE_WITH_SITE = (joinedload(Machine.site),)
+
+
+def get_booking(db: Session, booking_id: int, options=BOOKING_WITH_ITEMS) -> BookingRequest | None:
+    return db.get(BookingRequest, booking_id, options=list(options))
+
+
+# Keyset orderings; each ends in the primary key so cursors are unique.
+NEWEST_START_FIRST = [(BookingRequest.start_at, "desc"), (BookingRequest.id, "desc")]
+OLDEST_START_FIRST = [(BookingRequest.start_at, "asc"), (BookingRequest.id, "asc")]
+
+
+def bookings_for_user(db: Session, user_id: int, page: PageRequest | None = None) -> Page:
+    stmt = (
+        select(BookingRequest)
+        .options(*BOOKING_WITH_ITEMS)
+        .where(BookingRequest.requester_id == user_id)
+    )
+    return paginate(db, stmt, NEWEST_START_FIRST, page or PageRequest())
+
+
+def bookings_with_status(db: Session, status: str, page: PageRequest | None = None) -> Page:
+    stmt = (
+        select(BookingRequest)
+        .options(*BOOKING_FULL)
+        .where(BookingRequest.status == status)
+    )
+    return paginate(db, stmt, OLDEST_START_FIRST, page or PageRequest(per_page=100))
+
+
+def upcoming_bookings(db: Session, since: datetime, page: PageRequest | None = None) -> Page:
+    stmt = select(BookingRequest).where(BookingRequest.start_at >= since)
+    return paginate(db, stmt, OLDEST_START_FIRST, page or PageRequest())
+
+
+def machines_by_ids(db: Session, machine_ids: list[int]) -> list[Machine]:
+    if not machine_ids:
+        return []
+    return db.execute(
+        select(Machine).options(*MACHINE_WITH_SITE).where(Machine.id.in_(machine_ids)).order_by(Machine.name)
+    ).scalars().all()
+
+
+def search_machines(db: Session, q: str = "", page: PageRequest | None = None, **filters) -> Page:
+    return machine_search.search_machines(db, q, page, options=MACHINE_WITH_SITE, **filters)
+
+
+def user_by_email(db: Session, email: str) -> User | None:
+    return db.execute(select(User).where(User.email == email.lower())).scalar_one_or_none()
+
+
+def users_with_status(db: Session, status: str, newest_first: bool = False, page: PageRequest | None = None) -> Page:
+    direction = "desc" if newest_first else "asc"
+    stmt = select(User).where(User.status == status)
+    return paginate(db, stmt, [(User.created_at, direction), (User.id, direction)], page or PageRequest())
@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+from ..models import Site, Machine, BookingRequest, BookingItem
+
+CACHE_NAME = "site_stats"
+
+# booked_now also drifts with the clock, which the cache TTL covers.
+INVALIDATED_BY = ("booking.approved", "booking.cancelled", "machine.toggled")
+
+
+def site_stats(db: Session, now: datetime | None = None) -> list[dict]:
+    # One grouped query: every site with its machine, out-of-service and booked-right-now counts.
+    now = now or datetime.utcnow()
+    booked_now = (
+        select(BookingItem.machine_id)
+        .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
+        .where(BookingRequest.status == "approved", BookingRequest.start_at <= now, BookingRequest.end_at > now)
+    )
+    rows = db.execute(
+        select(
+            Site.id,
+            Site.name,
+            Site.city,
+            Site.lat,
+            Site.lon,
+            func.count(Machine.id),
+            func.coalesce(func.sum(case((Machine.status == "out_of_service", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Machine.id.in_(booked_now), 1), else_=0)), 0),
+        )
+        .outerjoin(Machine, Machine.site_id == Site.id)
+        .group_by(Site.id, Site.name, Site.city, Site.lat, Site.lon)
+        .order_by(Site.city.asc())
+    ).all()
+
+    return [
+        {
+            "id": r[0],
+            "name": r[1],
+            "city": r[2],
+            "lat": r[3],
+            "lon": r[4],
+            "total_machines": r[5],
+            "out_of_service": r[6],
+            "booked_now": r[7],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,47 @@
+"""Writes staged on a session and flushed in one place just before it commits.
+
+Domain events, notifications and audit rows are all collected on ``session.info``
+while a request runs and written from a single ``before_commit`` listener, in
+the order of the steps below. Events go first because their ``before_commit``
+handlers may themselves queue notifications or audit rows; those have to be
+staged before the outbox and the audit step run.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+EVENTS = 10
+NOTIFICATIONS = 20
+AUDIT = 30
+
+_steps: list[tuple[int, str, object]] = []
+
+
+def stage(db: Session, key: str, item):
+    # Kept until the surrounding transaction commits (and flushed) or ends (and dropped).
+    if not db.in_transaction():
+        db.begin()
+    db.info.setdefault(key, []).append(item)
+
+
+def on_commit(order: int, key: str):
+    """Register ``fn(session)`` to flush what is staged under ``key``; lower ``order`` runs first."""
+    def register(fn):
+        _steps[:] = sorted([s for s in _steps if s[1] != key] + [(order, key, fn)], key=lambda s: s[0])
+        return fn
+    return register
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_staged(session):
+    for _, key, fn in list(_steps):
+        if session.info.get(key):
+            fn(session)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_staged(session, transaction):
+    # Whatever is still staged when the outer transaction ends was rolled back.
+    if transaction.parent is None:
+        for _, key, _ in _steps:
+            session.info.pop(key, None)
@@ -0,0 +1,42 @@
+import random
+import threading
+import time
+
+
+class ConsoleTransport:
+    # Simulated email/SMS sender: prints messages to console.
+    def send(self, user_id: int, message: str):
+        print(f"[Notification] to user_id={user_id}: {message}")
+
+
+class FakeTransport:
+    """In-memory stand-in for an SMTP/SMS gateway, for tests and benchmarks.
+
+    ``latency`` simulates the round trip of a real gateway and ``failure_rate``
+    makes a share of sends raise, so retry handling can be exercised.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent: list[tuple[int, str]] = []
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, user_id: int, message: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.failure_rate and self._rnd.random() < self.failure_rate:
+                raise ConnectionError("fake gateway refused the message")
+            self.sent.append((user_id, message))
+
+
+TRANSPORTS = {"console": ConsoleTransport, "fake": FakeTransport}
+
+
+def make_transport(name: str):
+    try:
+        return TRANSPORTS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown notification transport {name!r}; expected one of {sorted(TRANSPORTS)}") from None
@@ -5,42 +5,158 @@ Created on Tue Jan 13 14:15:27 2026
 @author: NBoyd1
 """
 
-from datetime import datetime, timedelta
-from sqlalchemy import select, func
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select, func, delete, insert, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from ..models import BookingRequest, BookingItem, Machine
+from ..models import BookingRequest, BookingItem, Machine, UtilisationDaily, UtilisationDirty
+from .cache import bump_cache_version, DASHBOARD_CACHE
 
-def utilisation_last_days(db: Session, days: int = 30):
-    since = datetime.utcnow() - timedelta(days=days)
+WINDOWS = (7, 30, 90, 365)
 
-    rows = db.execute(
-        select(
-            Machine.id,
-            Machine.name,
-            Machine.category,
-            func.sum((func.julianday(BookingRequest.end_at) - func.julianday(BookingRequest.start_at)) * 24.0).label("hours")
+
+def booking_days(start_at: datetime, end_at: datetime) -> list[date]:
+    # UTC days touched by [start_at, end_at); a booking ending at midnight does not touch the next day.
+    last = (end_at - timedelta(microseconds=1)).date()
+    return [start_at.date() + timedelta(days=i) for i in range((last - start_at.date()).days + 1)]
+
+
+def _day_hours(start_at: datetime, end_at: datetime) -> dict[date, float]:
+    out = {}
+    for day in booking_days(start_at, end_at):
+        lo = max(start_at, datetime.combine(day, time.min))
+        hi = min(end_at, datetime.combine(day + timedelta(days=1), time.min))
+        out[day] = (hi - lo).total_seconds() / 3600.0
+    return out
+
+
+def _upsert(db: Session):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(UtilisationDirty)
+
+
+def mark_windows_dirty(db: Session, windows: list[tuple[list[int], datetime, datetime]]):
+    # Flag the rollup cells these (machine_ids, start_at, end_at) windows cover, in the
+    # transaction that changes the bookings.
+    now = datetime.utcnow()
+    cells = {(mid, day) for machine_ids, start_at, end_at in windows for mid in machine_ids for day in booking_days(start_at, end_at)}
+    rows = [{"machine_id": mid, "day": day, "marked_at": now} for mid, day in sorted(cells)]
+    if rows:
+        stmt = _upsert(db)
+        db.execute(stmt.on_conflict_do_update(index_elements=["machine_id", "day"], set_={"marked_at": stmt.excluded.marked_at}), rows)
+
+
+def _recompute(db: Session, cells: list[tuple[int, date]]):
+    machine_ids = sorted({mid for mid, _ in cells})
+    lo = datetime.combine(min(day for _, day in cells), time.min)
+    hi = datetime.combine(max(day for _, day in cells) + timedelta(days=1), time.min)
+    wanted = set(cells)
+
+    hours: dict[tuple[int, date], float] = defaultdict(float)
+    for mid, start_at, end_at in db.execute(
+        select(BookingItem.machine_id, BookingRequest.start_at, BookingRequest.end_at)
+        .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
+        .where(
+            BookingRequest.status == "approved",
+            BookingItem.machine_id.in_(machine_ids),
+            BookingRequest.start_at < hi,
+            BookingRequest.end_at > lo,
         )
-        .join(BookingItem, BookingItem.machine_id == Machine.id)
+    ):
+        for day, h in _day_hours(start_at, end_at).items():
+            if (mid, day) in wanted:
+                hours[(mid, day)] += h
+
+    meta = {r[0]: (r[1], r[2]) for r in db.execute(select(Machine.id, Machine.category, Machine.site_id).where(Machine.id.in_(machine_ids)))}
+    db.execute(delete(UtilisationDaily).where(tuple_(UtilisationDaily.machine_id, UtilisationDaily.day).in_(cells)))
+    rows = [
+        {"machine_id": mid, "day": day, "category": meta[mid][0], "site_id": meta[mid][1], "hours": h}
+        for (mid, day), h in hours.items() if h > 0 and mid in meta
+    ]
+    if rows:
+        db.execute(insert(UtilisationDaily), rows)
+
+
+def rebuild_utilisation_rollup(db: Session, batch_size: int = 5000) -> int:
+    """Recompute the whole rollup from approved bookings (first run or repair)."""
+    hours: dict[tuple[int, date], float] = defaultdict(float)
+    q = (
+        select(BookingItem.machine_id, BookingRequest.start_at, BookingRequest.end_at)
         .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
-        .where(BookingRequest.status == "approved", BookingRequest.start_at >= since)
-        .group_by(Machine.id, Machine.name, Machine.category)
-        .order_by(func.sum((func.julianday(BookingRequest.end_at) - func.julianday(BookingRequest.start_at)) * 24.0).desc())
+        .where(BookingRequest.status == "approved")
+        .execution_options(yield_per=batch_size)
+    )
+    for mid, start_at, end_at in db.execute(q):
+        for day, h in _day_hours(start_at, end_at).items():
+            hours[(mid, day)] += h
+
+    meta = {r[0]: (r[1], r[2]) for r in db.execute(select(Machine.id, Machine.category, Machine.site_id))}
+    db.execute(delete(UtilisationDaily))
+    bump_cache_version(db, DASHBOARD_CACHE)
+    rows = [
+        {"machine_id": mid, "day": day, "category": meta[mid][0], "site_id": meta[mid][1], "hours": h}
+        for (mid, day), h in hours.items() if mid in meta
+    ]
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(UtilisationDaily), rows[i:i + batch_size])
+    db.commit()
+    return len(rows)
+
+
+def refresh_utilisation_rollup(SessionFactory, batch_size: int = 2000) -> int:
+    # Scheduler job: recompute the dirty (machine, day) cells.
+    refreshed = 0
+    with SessionFactory() as db:
+        rollup_empty = db.execute(select(UtilisationDaily.machine_id).limit(1)).first() is None
+        if rollup_empty and db.execute(select(BookingRequest.id).where(BookingRequest.status == "approved").limit(1)).first():
+            return rebuild_utilisation_rollup(db)
+
+        while True:
+            dirty = db.execute(
+                select(UtilisationDirty.machine_id, UtilisationDirty.day, UtilisationDirty.marked_at).limit(batch_size)
+            ).all()
+            if not dirty:
+                break
+            _recompute(db, [(r[0], r[1]) for r in dirty])
+            bump_cache_version(db, DASHBOARD_CACHE)
+            # Only clear markers nobody re-marked while we were recomputing.
+            db.execute(delete(UtilisationDirty).where(
+                tuple_(UtilisationDirty.machine_id, UtilisationDirty.day, UtilisationDirty.marked_at).in_([tuple(r) for r in dirty])
+            ))
+            db.commit()
+            refreshed += len(dirty)
+            if len(dirty) < batch_size:
+                break
+    return refreshed
+
+
+def utilisation_last_days(db: Session, days: int = 30, limit: int = 15):
+    # Reads the pre-aggregated rollup; the window is the last `days` UTC days including today.
+    today = datetime.utcnow().date()
+    since_day = today - timedelta(days=days - 1)
+    since = datetime.combine(since_day, time.min)
+    hours = func.sum(UtilisationDaily.hours).label("hours")
+    in_window = (UtilisationDaily.day >= since_day, UtilisationDaily.day <= today)
+
+    rows = db.execute(
+        select(Machine.id, Machine.name, UtilisationDaily.category, hours)
+        .join(Machine, Machine.id == UtilisationDaily.machine_id)
+        .where(*in_window)
+        .group_by(Machine.id, Machine.name, UtilisationDaily.category)
+        .order_by(hours.desc())
+        .limit(limit)
     ).all()
 
-    by_machine = [{"machine_id": r[0], "machine": r[1], "category": r[2], "hours": float(r[3] or 0)} for r in rows][:15]
+    by_machine = [{"machine_id": r[0], "machine": r[1], "category": r[2], "hours": float(r[3] or 0)} for r in rows]
 
     cat_rows = db.execute(
-        select(
-            Machine.category,
-            func.sum((func.julianday(BookingRequest.end_at) - func.julianday(BookingRequest.start_at)) * 24.0).label("hours")
-        )
-        .join(BookingItem, BookingItem.machine_id == Machine.id)
-        .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
-        .where(BookingRequest.status == "approved", BookingRequest.start_at >= since)
-        .group_by(Machine.category)
-        .order_by(func.sum((func.julianday(BookingRequest.end_at) - func.julianday(BookingRequest.start_at)) * 24.0).desc())
+        select(UtilisationDaily.category, hours)
+        .where(*in_window)
+        .group_by(UtilisationDaily.category)
+        .order_by(hours.desc())
     ).all()
 
     by_category = [{"category": r[0], "hours": float(r[1] or 0)} for r in cat_rows]
 
-    return {"since": since, "by_machine": by_machine, "by_category": by_category}
+    return {"since": since, "days": days, "by_machine": by_machine, "by_category": by_category}
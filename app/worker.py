@@ -0,0 +1,47 @@
+"""Standalone background worker:
+
+    SCHEDULER_ENABLED=0 gunicorn 'app:create_app()'   # web workers, no shared jobs
+    python -m app.worker                              # owns the shared jobs
+
+More than one worker can run; the scheduler lease lets only one of them do the work.
+"""
+
+import argparse
+import os
+from apscheduler.schedulers.blocking import BlockingScheduler
+from . import create_app
+from .jobs import shared_jobs, add_jobs, LEASE_NAME
+from .services.leases import Lease
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared background jobs.")
+    parser.add_argument("--lease-seconds", type=float, default=float(os.getenv("SCHEDULER_LEASE_SECONDS", "90")))
+    args = parser.parse_args()
+
+    app = create_app(web=False)
+    lease = Lease(app.session_factory, LEASE_NAME, ttl=args.lease_seconds)
+
+    scheduler = BlockingScheduler()
+    jobs = shared_jobs(app.session_factory, app.notification_dispatcher, app.no_show_timer, app.audit_archive_dir, app.audit_retention_days)
+    add_jobs(scheduler, jobs, lease)
+    # Heartbeat so a standby worker takes over within one lease period.
+    scheduler.add_job(lease.acquire, "interval", seconds=max(1.0, args.lease_seconds / 3), id="lease")
+    if lease.acquire():
+        # Drain whatever went overdue while no worker was running.
+        print(f"[Worker] marked {app.no_show_timer.sweep()} overdue no-show(s)")
+    app.no_show_timer.start(lease)
+    print(f"[Worker] {lease.holder} started ({'leader' if lease.held else 'standby'})")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        app.no_show_timer.stop()
+        app.notification_dispatcher.shutdown()
+        lease.release()
+        app.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Free-machine search and next-slot lookups against a large inventory.
+
+    python -m benchmarks.bench_availability --machines 10000 --bookings 300000
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.migrations import upgrade_schema
+from app.services.availability import free_machines, next_free_slots
+from app.services.interval_index import IntervalIndex
+from benchmarks._common import temp_db_url, timed, write_results
+from benchmarks.datagen import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--machines", type=int, default=10_000)
+    parser.add_argument("--bookings", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    engine = create_engine(temp_db_url("availability"), future=True)
+    sizes = generate(engine, sites=20, machines=args.machines, users=2_000, bookings=args.bookings, notifications=0)
+    upgrade_schema(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    Session = sessionmaker(bind=engine, future=True)
+
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+    end = start + timedelta(hours=4)
+    index = IntervalIndex()
+    with Session() as db:
+        index.build(db)
+        results = {
+            "free_machines": timed(lambda: free_machines(db, start, end), args.repeat),
+            "free_machines_filtered": timed(lambda: free_machines(db, start, end, site_id=3, machine_type="lab"), args.repeat),
+            "next_free_slots_db": timed(lambda: next_free_slots(db, 42, timedelta(hours=2), count=10), args.repeat),
+            "next_free_slots_index": timed(lambda: next_free_slots(db, 42, timedelta(hours=2), count=10, index=index), args.repeat),
+        }
+        free = len(free_machines(db, start, end))
+
+    for name, r in results.items():
+        print(f"{name:24s} {r['median_ms']:8.2f} ms")
+    print(f"{free} of {args.machines} machines free in the window")
+    path = write_results("availability", {"sizes": sizes, "results": results}, args.out)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
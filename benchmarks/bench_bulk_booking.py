@@ -0,0 +1,105 @@
+"""Importing 10k booking occurrences: the bulk path against one form-style
+request per occurrence.
+
+    python -m benchmarks.bench_bulk_booking --occurrences 10000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, delete
+from sqlalchemy.orm import sessionmaker
+from app.migrations import upgrade_schema
+from app.models import User, Machine, BookingRequest, BookingItem, AuditLog, Notification
+from app.services.booking_rules import has_conflicts_for_approved_bookings
+from app.services.bulk_booking import create_bulk_bookings
+from benchmarks._common import temp_db_url, write_results
+from benchmarks.datagen import generate
+
+
+def make_rows(occurrences: int, machine_ids: list[int], seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    rows = []
+    for _ in range(occurrences):
+        start = now + timedelta(hours=rnd.randint(2, 85 * 24))
+        rows.append({
+            "start_at": start,
+            "end_at": start + timedelta(hours=rnd.randint(1, 4)),
+            "machines": [str(m) for m in rnd.sample(machine_ids, k=rnd.choice([1, 1, 2]))],
+            "purpose": "Nightly regression",
+        })
+    return rows
+
+
+def one_at_a_time(Session, requester_id: int, rows: list[dict]) -> int:
+    # What submitting each occurrence through the booking form costs.
+    created = 0
+    for row in rows:
+        with Session() as db:
+            requester = db.get(User, requester_id)
+            ids = [int(m) for m in row["machines"]]
+            if has_conflicts_for_approved_bookings(db, ids, row["start_at"], row["end_at"]):
+                continue
+            b = BookingRequest(requester_id=requester.id, start_at=row["start_at"], end_at=row["end_at"], purpose=row["purpose"], status="pending")
+            db.add(b)
+            db.flush()
+            for mid in ids:
+                db.add(BookingItem(booking_id=b.id, machine_id=mid))
+            db.add(Notification(audience_roles="approver,admin", message=f"New booking request #{b.id} awaiting approval."))
+            db.add(AuditLog(actor_email=requester.email, action="booking_request", detail=f"Created booking request #{b.id}"))
+            db.commit()
+            created += 1
+    return created
+
+
+def bulk(Session, requester_id: int, rows: list[dict]) -> int:
+    with Session() as db:
+        result = create_bulk_bookings(db, db.get(User, requester_id), rows, skip_conflicts=True)
+        if result.errors:
+            raise SystemExit(f"bulk import rejected: {result.errors[:3]}")
+        db.commit()
+    return len(result.booking_ids)
+
+
+def reset(Session, since_id: int):
+    with Session() as db:
+        db.execute(delete(BookingItem).where(BookingItem.booking_id > since_id))
+        db.execute(delete(BookingRequest).where(BookingRequest.id > since_id))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--occurrences", type=int, default=10_000)
+    parser.add_argument("--machines", type=int, default=1_000)
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--serial", type=int, default=1_000, help="occurrences to submit one at a time (slow)")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    engine = create_engine(temp_db_url("bulk_booking"), future=True)
+    sizes = generate(engine, machines=args.machines, bookings=args.bookings, notifications=0)
+    upgrade_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    with Session() as db:
+        requester_id = db.execute(select(User.id).where(User.status == "active").limit(1)).scalar_one()
+        available = db.execute(select(Machine.id).where(Machine.status == "available")).scalars().all()
+    rows = make_rows(args.occurrences, available)
+
+    results = {}
+    for name, fn, batch in (("one_at_a_time", one_at_a_time, rows[:args.serial]), ("bulk", bulk, rows)):
+        t0 = time.perf_counter()
+        created = fn(Session, requester_id, batch)
+        ms = (time.perf_counter() - t0) * 1000.0
+        results[name] = {"occurrences": len(batch), "ms": round(ms, 1), "created": created, "per_occurrence_ms": round(ms / len(batch), 3)}
+        print(f"{name:14s} {len(batch):6d} occurrences {ms:10.1f} ms  ({ms / len(batch):.3f} ms each, {created} created)")
+        reset(Session, args.bookings)
+
+    path = write_results("bulk_booking", {"sizes": sizes, "occurrences": len(rows), "results": results}, args.out)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
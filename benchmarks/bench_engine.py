@@ -0,0 +1,138 @@
+"""Mixed read/write load against SQLite: the old engine (rollback journal,
+driver defaults) against the configured one from app.engine (WAL,
+synchronous=NORMAL, busy_timeout, bigger page cache, mmap).
+
+    python -m benchmarks.bench_engine --readers 8 --writers 2 --seconds 10
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, func, insert, text
+from sqlalchemy.exc import OperationalError
+from app.engine import make_engine
+from app.models import Machine, User, BookingRequest, BookingItem
+from benchmarks._common import temp_db_url, percentiles, write_results
+from benchmarks.datagen import generate
+
+
+def reader(engine, machine_ids, stop, stats, seed):
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    while not stop.is_set():
+        mid = rnd.choice(machine_ids)
+        start = now + timedelta(hours=rnd.randint(-24 * 30, 24 * 60))
+        q = (
+            select(func.count())
+            .select_from(BookingRequest)
+            .join(BookingItem, BookingItem.booking_id == BookingRequest.id)
+            .where(
+                BookingItem.machine_id == mid,
+                BookingRequest.status == "approved",
+                BookingRequest.start_at < start + timedelta(days=7),
+                BookingRequest.end_at > start,
+            )
+        )
+        t0 = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(q).scalar_one()
+        except OperationalError:
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append((time.perf_counter() - t0) * 1000.0)
+
+
+def writer(engine, machine_ids, requester_id, stop, stats, seed):
+    rnd = random.Random(seed)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    while not stop.is_set():
+        start = now + timedelta(hours=rnd.randint(1, 24 * 80))
+        t0 = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                booking_id = conn.execute(
+                    insert(BookingRequest).returning(BookingRequest.id),
+                    {"requester_id": requester_id, "start_at": start, "end_at": start + timedelta(hours=2),
+                     "purpose": "bench", "status": "pending", "created_at": datetime.utcnow()},
+                ).scalar_one()
+                conn.execute(insert(BookingItem), [{"booking_id": booking_id, "machine_id": rnd.choice(machine_ids)}])
+        except OperationalError:
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append((time.perf_counter() - t0) * 1000.0)
+
+
+def run(engine, readers: int, writers: int, seconds: float) -> dict:
+    with engine.connect() as conn:
+        machine_ids = conn.execute(select(Machine.id)).scalars().all()
+        requester_id = conn.execute(select(User.id).limit(1)).scalar_one()
+    stop = threading.Event()
+    read_stats = [{"latencies": [], "errors": 0} for _ in range(readers)]
+    write_stats = [{"latencies": [], "errors": 0} for _ in range(writers)]
+    threads = [threading.Thread(target=reader, args=(engine, machine_ids, stop, s, n)) for n, s in enumerate(read_stats)]
+    threads += [threading.Thread(target=writer, args=(engine, machine_ids, requester_id, stop, s, 100 + n)) for n, s in enumerate(write_stats)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    def summarise(stats):
+        lat = [x for s in stats for x in s["latencies"]]
+        pct = percentiles(lat)
+        return {
+            "ops": pct.pop("count"),
+            "ops_per_s": round(len(lat) / seconds, 1),
+            "errors": sum(s["errors"] for s in stats),
+            **pct,
+        }
+
+    return {"reads": summarise(read_stats), "writes": summarise(write_stats)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--machines", type=int, default=1_000)
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    url = temp_db_url("engine")
+    seed_engine = create_engine(url, future=True)
+    sizes = generate(seed_engine, machines=args.machines, bookings=args.bookings, notifications=0)
+    with seed_engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+    seed_engine.dispose()
+
+    # Baseline first: journal_mode is stored in the file, so put it back to the rollback journal explicitly.
+    default = create_engine(url, future=True, connect_args={"check_same_thread": False})
+    with default.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+    configured = make_engine(url)
+
+    results = {}
+    for name, engine in (("default", default), ("configured", configured)):
+        results[name] = run(engine, args.readers, args.writers, args.seconds)
+        engine.dispose()
+        for kind in ("reads", "writes"):
+            r = results[name][kind]
+            if not r["ops"]:
+                print(f"{name:10s} {kind:6s} no operations completed, errors {r['errors']}")
+                continue
+            print(f"{name:10s} {kind:6s} {r['ops_per_s']:9.1f} ops/s  p50 {r['p50_ms']:8.3f} ms  "
+                  f"p95 {r['p95_ms']:8.3f} ms  max {r['max_ms']:9.3f} ms  errors {r['errors']}")
+
+    path = write_results("engine", {"sizes": sizes, "readers": args.readers, "writers": args.writers,
+                                    "seconds": args.seconds, "results": results}, args.out)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Query plans and timings for the booking hot paths, before and after the
+secondary indexes are created by ``upgrade_schema``.
+
+    python -m benchmarks.bench_indexes --bookings 1000000
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.migrations import upgrade_schema
+from app.models import BookingRequest, BookingItem, Machine, Notification, User
+from app.services.utilisation import utilisation_last_days, rebuild_utilisation_rollup
+from benchmarks._common import temp_db_url, timed, write_results
+from benchmarks.datagen import generate
+
+
+def hot_path_queries():
+    now = datetime.utcnow()
+    return {
+        "dashboard_status_list": select(BookingRequest).where(BookingRequest.status == "pending").order_by(BookingRequest.start_at.asc()).limit(100),
+        "dashboard_upcoming": select(BookingRequest).where(BookingRequest.start_at >= now - timedelta(days=1)).order_by(BookingRequest.start_at.asc()).limit(50),
+        "dashboard_cancellations_30": select(func.count()).select_from(BookingRequest).where(BookingRequest.status == "cancelled", BookingRequest.cancelled_at >= now - timedelta(days=30)),
+        "dashboard_no_shows_30": select(func.count()).select_from(BookingRequest).where(BookingRequest.no_show.is_(True), BookingRequest.end_at >= now - timedelta(days=30)),
+        "my_bookings": select(BookingRequest).where(BookingRequest.requester_id == 42).order_by(BookingRequest.start_at.desc()),
+        "mark_no_shows": select(BookingRequest).where(
+            BookingRequest.status == "approved",
+            BookingRequest.end_at < now - timedelta(minutes=15),
+            BookingRequest.checked_in.is_(False),
+            BookingRequest.no_show.is_(False),
+        ).limit(50),
+        "notification_queue": select(Notification).where(Notification.sent_at.is_(None)).order_by(Notification.created_at).limit(25),
+        "conflict_check": select(BookingRequest.id).join(BookingItem, BookingItem.booking_id == BookingRequest.id).where(
+            BookingRequest.status == "approved",
+            BookingItem.machine_id.in_([1, 2, 3]),
+            BookingRequest.start_at < now + timedelta(hours=3),
+            BookingRequest.end_at > now + timedelta(hours=1),
+        ).limit(1),
+        "pending_users": select(User).where(User.status == "pending").order_by(User.created_at.asc()),
+        "out_of_service": select(func.count()).select_from(Machine).where(Machine.status == "out_of_service"),
+    }
+
+
+def measure(engine, Session, repeat: int) -> dict:
+    out = {}
+    with Session() as db:
+        for name, stmt in hot_path_queries().items():
+            compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+            plan = [row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+            out[name] = {"plan": plan, **timed(lambda: db.execute(stmt).all(), repeat)}
+        out["utilisation_last_days"] = {"plan": [], **timed(lambda: utilisation_last_days(db, days=30), repeat)}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--machines", type=int, default=1_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    engine = create_engine(temp_db_url("indexes"), future=True)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(bind=conn)
+    Session = sessionmaker(bind=engine, future=True)
+
+    sizes = generate(engine, machines=args.machines, users=args.users, bookings=args.bookings, notifications=args.bookings // 10)
+    with Session() as db:
+        rebuild_utilisation_rollup(db)
+    before = measure(engine, Session, args.repeat)
+    created = upgrade_schema(engine)
+    after = measure(engine, Session, args.repeat)
+
+    for name in before:
+        b, a = before[name]["median_ms"], after[name]["median_ms"]
+        print(f"{name:28s} {b:10.2f} ms -> {a:8.2f} ms")
+        for line in after[name]["plan"]:
+            print(f"{'':30s}{line}")
+
+    path = write_results("indexes", {"sizes": sizes, "created_indexes": created, "before": before, "after": after}, args.out)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""End-to-end load: requester threads drive the app through Flask test
+clients, each looping sign in -> new booking -> approval (by an approver
+client) -> check-in, against a generated database. Reports flows per
+second and per-step latency percentiles.
+
+Bookings start at the current minute, so check-in is open as soon as the
+approval lands. CSRF is switched off as in the tests; the background
+scheduler is off so only the driven requests touch the database.
+
+    python -m benchmarks.bench_load --threads 8 --flows 25 --bookings 200000
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.engine import make_engine
+from app.models import User, Machine, BookingRequest
+from benchmarks._common import temp_db_url, percentiles, write_results
+from benchmarks.datagen import generate, PASSWORD
+
+STEPS = ("login", "new_booking", "approve", "check_in")
+
+
+def _timed_post(client, samples: list, url: str, data: dict | None = None):
+    t0 = time.perf_counter()
+    r = client.post(url, data=data or {})
+    samples.append((time.perf_counter() - t0) * 1000.0)
+    return r
+
+
+def requester(app, email: str, approver_email: str, machine_ids: list[int], flows: int, stats: dict, seed: int):
+    rnd = random.Random(seed)
+    client, approver = app.test_client(), app.test_client()
+    for c, who in ((client, email), (approver, approver_email)):
+        r = _timed_post(c, stats["login"], "/login", {"email": who, "password": PASSWORD})
+        if r.status_code != 302:
+            stats["errors"].append(f"login {who}: {r.status_code}")
+            return
+
+    with app.session_factory() as db:
+        user_id = db.execute(select(User.id).where(User.email == email)).scalar_one()
+    for n in range(flows):
+        t_flow = time.perf_counter()
+        start = datetime.utcnow().replace(second=0, microsecond=0)
+        purpose = f"Load run {seed}-{n}"
+        form = {
+            "start_at": start.strftime("%Y-%m-%dT%H:%M"),
+            "end_at": (start + timedelta(minutes=15 * rnd.randint(1, 8))).strftime("%Y-%m-%dT%H:%M"),
+            "purpose": purpose,
+            "machines": [str(m) for m in rnd.sample(machine_ids, k=rnd.choice([1, 1, 2]))],
+            "repeat": "none",
+        }
+        r = _timed_post(client, stats["new_booking"], "/bookings/new", form)
+        if r.status_code >= 500:
+            stats["errors"].append(f"new_booking: {r.status_code}")
+            continue
+        with app.session_factory() as db:
+            booking_id = db.execute(
+                select(BookingRequest.id).where(BookingRequest.requester_id == user_id, BookingRequest.purpose == purpose)
+            ).scalar()
+        if booking_id is None:
+            stats["refused"] += 1  # a machine was already booked in that window
+            continue
+
+        r = _timed_post(approver, stats["approve"], f"/admin/booking/{booking_id}/approve")
+        with app.session_factory() as db:
+            status = db.get(BookingRequest, booking_id).status
+        if status != "approved":
+            stats["conflicts"] += 1
+            continue
+
+        _timed_post(client, stats["check_in"], f"/bookings/checkin/{booking_id}")
+        with app.session_factory() as db:
+            checked_in = db.get(BookingRequest, booking_id).checked_in
+        if checked_in:
+            stats["completed"] += 1
+            stats["flow"].append((time.perf_counter() - t_flow) * 1000.0)
+        else:
+            stats["errors"].append(f"check_in #{booking_id} not recorded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--flows", type=int, default=25, help="booking flows per thread")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--machines", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--bookings", type=int, default=200_000)
+    parser.add_argument("--hash-method", default="pbkdf2:sha256:100000",
+                        help="password hash method for generated users and the app (PASSWORD_HASH_METHOD)")
+    parser.add_argument("--hash-workers", type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    db_url = temp_db_url("load")
+    sizes = generate(make_engine(db_url), sites=args.sites, machines=args.machines, users=args.users,
+                     bookings=args.bookings, notifications=args.bookings // 10, password_method=args.hash_method)
+    os.environ.update({
+        "DATABASE_URL": db_url,
+        "SCHEDULER_ENABLED": "0",
+        "PASSWORD_HASH_METHOD": args.hash_method,
+        "PASSWORD_HASH_WORKERS": str(args.hash_workers),
+        "NOTIFICATION_TRANSPORT": "console",
+    })
+
+    from app import create_app
+    t0 = time.perf_counter()
+    app = create_app()
+    startup_s = time.perf_counter() - t0
+    app.config.update(WTF_CSRF_ENABLED=False)
+    app.scheduler.shutdown(wait=False)
+
+    with app.session_factory() as db:
+        requesters = db.execute(
+            select(User.email).where(User.role == "user", User.status == "active").order_by(User.id).limit(args.threads)
+        ).scalars().all()
+        approvers = db.execute(
+            select(User.email).where(User.role.in_(["approver", "admin"]), User.status == "active").order_by(User.id)
+        ).scalars().all()
+        machine_ids = db.execute(select(Machine.id).where(Machine.status == "available")).scalars().all()
+
+    per_thread = [{**{k: [] for k in (*STEPS, "flow", "errors")}, "completed": 0, "refused": 0, "conflicts": 0} for _ in requesters]
+    threads = [
+        threading.Thread(target=requester, args=(app, email, approvers[i % len(approvers)], machine_ids, args.flows, per_thread[i], i))
+        for i, email in enumerate(requesters)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - t0
+    stats = {k: sum((s[k] for s in per_thread), [] if isinstance(v, list) else 0) for k, v in per_thread[0].items()}
+
+    app.audit_sink.close()
+    app.password_hasher.shutdown()
+    app.notification_dispatcher.shutdown()
+
+    results = {
+        "sizes": sizes,
+        "threads": len(requesters),
+        "flows_per_thread": args.flows,
+        "hash_method": args.hash_method,
+        "startup_s": round(startup_s, 3),
+        "wall_s": round(wall_s, 3),
+        "completed": stats["completed"],
+        "refused": stats["refused"],
+        "conflicts": stats["conflicts"],
+        "errors": len(stats["errors"]),
+        "error_samples": stats["errors"][:10],
+        "flows_per_s": round(stats["completed"] / wall_s, 2),
+        "latency": {step: percentiles(stats[step]) for step in (*STEPS, "flow")},
+    }
+    print(f"{results['completed']} flows in {wall_s:.1f}s ({results['flows_per_s']} /s), "
+          f"{results['refused']} refused, {results['conflicts']} conflicts, {results['errors']} errors")
+    for step, p in results["latency"].items():
+        if p["count"]:
+            print(f"  {step:12s} p50 {p['p50_ms']:9.2f} ms   p95 {p['p95_ms']:9.2f} ms   p99 {p['p99_ms']:9.2f} ms")
+    print(f"results written to {write_results('load', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Notification throughput: staging (commit per message vs. outbox) and
+dispatch (the old 25-per-tick serial loop vs. the batched dispatcher).
+
+    python -m benchmarks.bench_notifications --messages 20000 --latency 0.002
+"""
+
+import argparse
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import Notification, User
+from app.services.notifications import queue_notification, NotificationDispatcher
+from app.services.transports import FakeTransport
+from benchmarks._common import temp_db_url, write_results
+
+
+def _setup(name: str):
+    engine = create_engine(temp_db_url(name), future=True, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, future=True)
+    with Session() as db:
+        db.add(User(name="Bench", email="bench@example.com", password_hash="x", team="T", role="user", status="active", manager_email="m@example.com"))
+        db.commit()
+    return Session
+
+
+def stage_commit_per_message(Session, n: int) -> float:
+    t0 = time.perf_counter()
+    with Session() as db:
+        for i in range(n):
+            db.add(Notification(user_id=1, message=f"m{i}"))
+            db.commit()
+    return time.perf_counter() - t0
+
+
+def stage_outbox(Session, n: int) -> float:
+    t0 = time.perf_counter()
+    with Session() as db:
+        for i in range(n):
+            queue_notification(db, 1, f"m{i}")
+        db.commit()
+    return time.perf_counter() - t0
+
+
+def dispatch_legacy(Session, transport, max_seconds: float) -> tuple[int, float]:
+    # The original job: 25 oldest unsent rows, sent one by one, one commit per tick.
+    sent, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < max_seconds:
+        with Session() as db:
+            pending = db.execute(
+                select(Notification).where(Notification.sent_at.is_(None)).order_by(Notification.created_at).limit(25)
+            ).scalars().all()
+            if not pending:
+                break
+            for n in pending:
+                transport.send(n.user_id, n.message)
+                n.sent_at = datetime.utcnow()
+            db.commit()
+            sent += len(pending)
+    return sent, time.perf_counter() - t0
+
+
+def dispatch_batched(Session, transport, workers: int) -> tuple[int, float]:
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=workers)
+    t0 = time.perf_counter()
+    sent = 0
+    try:
+        while True:
+            n = dispatcher.run(max_rounds=1000)
+            sent += n
+            if n == 0:
+                break
+    finally:
+        dispatcher.shutdown()
+    return sent, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated gateway latency per send, seconds")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    results = {"messages": args.messages, "latency_s": args.latency, "workers": args.workers}
+
+    n_stage = min(args.messages, 2_000)
+    results["stage_commit_per_message_s"] = round(stage_commit_per_message(_setup("notify_stage_a"), n_stage), 3)
+    results["stage_outbox_s"] = round(stage_outbox(_setup("notify_stage_b"), n_stage), 3)
+    results["stage_messages"] = n_stage
+
+    Session = _setup("notify_legacy")
+    stage_outbox(Session, args.messages)
+    sent, secs = dispatch_legacy(Session, FakeTransport(latency=args.latency), max_seconds=30)
+    results["legacy_msgs_per_s"] = round(sent / secs, 1)
+
+    Session = _setup("notify_batched")
+    stage_outbox(Session, args.messages)
+    sent, secs = dispatch_batched(Session, FakeTransport(latency=args.latency), args.workers)
+    results["batched_msgs_per_s"] = round(sent / secs, 1)
+    results["batched_sent"] = sent
+
+    for k, v in results.items():
+        print(f"{k:30s} {v}")
+    print(f"results written to {write_results('notifications', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Micro-benchmarks for the booking workflow's service calls against a
+generated database: conflict checks (database vs. interval index),
+dashboard utilisation, the no-show sweep and notification dispatch.
+
+    python -m benchmarks.bench_workflow --bookings 1000000 --machines 1000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import sessionmaker
+from app.engine import make_engine
+from app.migrations import upgrade_schema
+from app.models import BookingRequest, Notification
+from app.services.booking_rules import has_conflicts_for_approved_bookings
+from app.services.interval_index import IntervalIndex
+from app.services.utilisation import utilisation_last_days, rebuild_utilisation_rollup
+from app.services.no_show import mark_no_shows
+from app.services.notifications import process_notification_queue, NotificationDispatcher
+from app.services.transports import FakeTransport
+from benchmarks._common import temp_db_url, timed, write_results
+from benchmarks.datagen import generate
+
+
+def conflict_checks(Session, machines: int, checks: int, repeat: int) -> dict:
+    rnd = random.Random(7)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    windows = []
+    for _ in range(checks):
+        start = now + timedelta(minutes=15 * rnd.randint(0, 90 * 96))
+        windows.append((rnd.sample(range(1, machines + 1), k=rnd.choice([1, 1, 2, 3])), start, start + timedelta(hours=rnd.randint(1, 8))))
+
+    index = IntervalIndex()
+    with Session() as db:
+        t0 = time.perf_counter()
+        index.build(db)
+        build_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+
+        def run(index):
+            return sum(has_conflicts_for_approved_bookings(db, ids, start, end, index=index) for ids, start, end in windows)
+
+        return {
+            "checks": checks,
+            "conflicting": run(None),
+            "database": timed(lambda: run(None), repeat),
+            "interval_index": timed(lambda: run(index), repeat),
+            "index_build_ms": build_ms,
+        }
+
+
+def utilisation(Session, repeat: int) -> dict:
+    with Session() as db:
+        t0 = time.perf_counter()
+        rebuild_utilisation_rollup(db)
+        rollup_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+        return {
+            "rollup_rebuild_ms": rollup_ms,
+            "last_30_days": timed(lambda: utilisation_last_days(db, 30), repeat),
+            "last_90_days": timed(lambda: utilisation_last_days(db, 90), repeat),
+        }
+
+
+def no_shows(Session) -> dict:
+    with Session() as db:
+        backlog = db.execute(
+            select(func.count()).select_from(BookingRequest).where(
+                BookingRequest.status == "approved",
+                BookingRequest.end_at < datetime.utcnow(),
+                BookingRequest.checked_in.is_(False),
+                BookingRequest.no_show.is_(False),
+            )
+        ).scalar_one()
+    # The first sweep does the work; the second measures an empty pass over the same table.
+    t0 = time.perf_counter()
+    marked = mark_no_shows(Session)
+    backlog_s = time.perf_counter() - t0
+    return {
+        "backlog": backlog,
+        "marked": marked,
+        "backlog_ms": round(backlog_s * 1000.0, 3),
+        "marked_per_s": round(marked / backlog_s, 1) if backlog_s else None,
+        "empty_sweep": timed(lambda: mark_no_shows(Session), 3),
+    }
+
+
+def notifications(Session, messages: int, latency: float, workers: int) -> dict:
+    now = datetime.utcnow()
+    with Session() as db:
+        users = db.execute(select(func.max(Notification.user_id))).scalar_one() or 1
+        db.execute(insert(Notification), [
+            {"user_id": 1 + i % users, "message": f"Bench notification {i}", "created_at": now} for i in range(messages)
+        ])
+        db.commit()
+    transport = FakeTransport(latency=latency)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=workers)
+    sent, calls = 0, 0
+    t0 = time.perf_counter()
+    try:
+        while True:
+            n = process_notification_queue(Session, dispatcher)
+            calls += 1
+            sent += n
+            if n == 0:
+                break
+    finally:
+        dispatcher.shutdown()
+    secs = time.perf_counter() - t0
+    return {"messages": messages, "sent": sent, "job_runs": calls, "msgs_per_s": round(sent / secs, 1), "latency_s": latency, "workers": workers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--machines", type=int, default=1_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--checks", type=int, default=500, help="conflict checks per timed sample")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.001, help="simulated gateway latency per send, seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    engine = make_engine(temp_db_url("workflow"))
+    Session = sessionmaker(bind=engine, future=True)
+    t0 = time.perf_counter()
+    sizes = generate(engine, sites=args.sites, machines=args.machines, users=args.users, bookings=args.bookings,
+                     notifications=args.bookings // 10, password_method="pbkdf2:sha256:1000")
+    upgrade_schema(engine)
+    print(f"generated {sizes} in {time.perf_counter() - t0:.1f}s")
+
+    results = {"sizes": sizes}
+    results["conflicts"] = conflict_checks(Session, args.machines, args.checks, args.repeat)
+    results["utilisation"] = utilisation(Session, args.repeat)
+    results["no_show"] = no_shows(Session)
+    results["notifications"] = notifications(Session, args.messages, args.latency, args.workers)
+
+    c = results["conflicts"]
+    print(f"conflicts ({c['checks']} checks)     db {c['database']['median_ms']:10.2f} ms   index {c['interval_index']['median_ms']:8.2f} ms")
+    u = results["utilisation"]
+    print(f"utilisation_last_days     30d {u['last_30_days']['median_ms']:9.2f} ms   90d {u['last_90_days']['median_ms']:8.2f} ms")
+    n = results["no_show"]
+    print(f"mark_no_shows             {n['marked']} marked in {n['backlog_ms']:.0f} ms, empty sweep {n['empty_sweep']['median_ms']:.2f} ms")
+    print(f"process_notification_queue {results['notifications']['msgs_per_s']} msgs/s")
+    print(f"results written to {write_results('workflow', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
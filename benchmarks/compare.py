@@ -0,0 +1,64 @@
+"""Compare two results files from the same benchmark, e.g. a saved baseline
+against a fresh run. Timings (``*_ms``, ``*_s``) should go down and rates
+(``*_per_s``) up; a change beyond ``--threshold`` the wrong way is a
+regression and makes the exit status 1.
+
+    python -m benchmarks.compare baseline/workflow.json benchmarks/results/workflow.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def _metrics(payload, prefix: str = "") -> dict[str, float]:
+    out = {}
+    for key, value in payload.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_metrics(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(("_ms", "_s")):
+            out[name] = float(value)
+    return out
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list[dict]:
+    """One row per metric present in both runs, with the relative change and whether it regressed."""
+    before, after = _metrics(old), _metrics(new)
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        a, b = before[name], after[name]
+        change = (b - a) / a if a else 0.0
+        higher_is_better = name.endswith("_per_s")
+        worse = -change if higher_is_better else change
+        rows.append({"metric": name, "old": a, "new": b, "change": round(change, 4), "regressed": worse > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if old.get("benchmark") != new.get("benchmark"):
+        sys.exit(f"different benchmarks: {old.get('benchmark')} vs {new.get('benchmark')}")
+    if old.get("sizes") != new.get("sizes"):
+        print(f"warning: data sizes differ: {old.get('sizes')} vs {new.get('sizes')}")
+
+    rows = compare(old, new, args.threshold)
+    for r in rows:
+        flag = "REGRESSED" if r["regressed"] else ""
+        print(f"{r['metric']:45s} {r['old']:12.3f} -> {r['new']:12.3f}  {r['change']:+8.1%}  {flag}")
+    regressed = sum(r["regressed"] for r in rows)
+    print(f"{len(rows)} metrics compared, {regressed} regressed beyond {args.threshold:.0%}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Synthetic data at seed.py's shape but any size. Generated users sign in as
+user<id>@example.com with PASSWORD; user 1 is an active admin and every 25th
+user an approver. To fill a database the app can be pointed at:
+
+    python -m benchmarks.datagen --db sqlite:///bench.db --sites 20 --machines 5000 --users 5000 --bookings 2000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from app.db import Base
+from app.engine import make_engine
+from app.migrations import upgrade_schema
+from app.models import Site, Machine, User, BookingRequest, BookingItem, Notification
+from app.security import hash_password
+
+CHUNK = 20_000
+PASSWORD = "Password123!"
+
+
+def _chunks(rows, size=CHUNK):
+    buf = []
+    for r in rows:
+        buf.append(r)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def generate(
+    engine: Engine,
+    sites: int = 5,
+    machines: int = 100,
+    users: int = 200,
+    bookings: int = 100_000,
+    notifications: int = 10_000,
+    days_back: int = 365,
+    days_ahead: int = 90,
+    seed: int = 1,
+    password_method: str | None = None,
+) -> dict:
+    """Fill an empty database with synthetic but realistic-looking data.
+
+    Uses Core bulk inserts so a million bookings take seconds rather than the
+    minutes the ORM unit of work would need. Every user shares one password
+    hash, made with ``password_method`` (the app's configured method if None).
+    """
+    rnd = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    categories = ["Payments", "Devices", "Networking", "Core Platform", "Data Pipelines"]
+    statuses = ["approved"] * 6 + ["pending"] * 2 + ["rejected", "cancelled"]
+    password_hash = hash_password(PASSWORD, password_method)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Site), [
+            {"id": i, "name": f"Site {i:03d}", "city": f"City {i:03d}", "lat": 50 + rnd.random() * 8, "lon": -5 + rnd.random() * 6}
+            for i in range(1, sites + 1)
+        ])
+        conn.execute(insert(Machine), [
+            {
+                "id": i,
+                "name": f"TM-{i:06d}",
+                "machine_type": rnd.choice(["lab", "virtual"]),
+                "category": rnd.choice(categories),
+                "status": "available" if rnd.random() > 0.08 else "out_of_service",
+                "site_id": rnd.randint(1, sites),
+            }
+            for i in range(1, machines + 1)
+        ])
+        conn.execute(insert(User), [
+            {
+                "id": i,
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "password_hash": password_hash,
+                "team": f"Team {i % 20}",
+                "role": "admin" if i == 1 else ("approver" if i % 25 == 0 else "user"),
+                "status": "active" if i == 1 or rnd.random() > 0.05 else "pending",
+                "manager_email": "manager@example.com",
+                "created_at": now - timedelta(days=rnd.randint(0, days_back)),
+            }
+            for i in range(1, users + 1)
+        ])
+
+        def booking_rows():
+            for i in range(1, bookings + 1):
+                start = now + timedelta(minutes=15 * rnd.randint(-days_back * 96, days_ahead * 96))
+                end = start + timedelta(minutes=15 * rnd.randint(2, 32))
+                status = rnd.choice(statuses)
+                past = end < now
+                yield {
+                    "id": i,
+                    "requester_id": rnd.randint(1, users),
+                    "start_at": start,
+                    "end_at": end,
+                    "purpose": "Synthetic regression run",
+                    "status": status,
+                    "decided_at": start - timedelta(days=1) if status != "pending" else None,
+                    "cancelled_at": start - timedelta(hours=2) if status == "cancelled" else None,
+                    "checked_in": status == "approved" and past and rnd.random() > 0.1,
+                    "no_show": False,
+                }
+
+        for chunk in _chunks(booking_rows()):
+            conn.execute(insert(BookingRequest), chunk)
+
+        def item_rows():
+            n = 0
+            for booking_id in range(1, bookings + 1):
+                for mid in rnd.sample(range(1, machines + 1), k=min(machines, rnd.choice([1, 1, 1, 2, 3]))):
+                    n += 1
+                    yield {"id": n, "booking_id": booking_id, "machine_id": mid}
+
+        for chunk in _chunks(item_rows()):
+            conn.execute(insert(BookingItem), chunk)
+
+        def notification_rows():
+            for i in range(1, notifications + 1):
+                created = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))
+                yield {
+                    "id": i,
+                    "user_id": rnd.randint(1, users),
+                    "message": f"Synthetic notification {i}",
+                    "created_at": created,
+                    "sent_at": created + timedelta(seconds=30) if rnd.random() > 0.02 else None,
+                }
+
+        for chunk in _chunks(notification_rows()):
+            conn.execute(insert(Notification), chunk)
+
+    return {"sites": sites, "machines": machines, "users": users, "bookings": bookings, "notifications": notifications}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="database URL; must be empty")
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--machines", type=int, default=100)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--notifications", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = make_engine(args.db)
+    t0 = time.perf_counter()
+    sizes = generate(
+        engine, sites=args.sites, machines=args.machines, users=args.users,
+        bookings=args.bookings, notifications=args.notifications, seed=args.seed,
+    )
+    upgrade_schema(engine)
+    print(f"generated {sizes} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import create_app
+from seed import seed
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(engine, budget: int):
+    """Fail if the wrapped block issues more than `budget` SQL statements."""
+    with count_queries(engine) as counter:
+        yield counter
+    assert counter.count <= budget, (
+        f"{counter.count} queries issued (budget {budget}):\n" + "\n".join(counter.statements)
+    )
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    monkeypatch.setenv("DATABASE_URL", db_url)
+    # Cheap hashes, checked on the request thread; test_password_hashing covers the pool.
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    monkeypatch.setenv("PASSWORD_HASH_WORKERS", "0")
+    seed(db_url)
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    yield app
+    app.scheduler.shutdown(wait=False)
+    app.no_show_timer.stop()
+    app.audit_sink.close()
+    app.password_hasher.shutdown()
+    app.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, email="admin@example.com", password="Admin123!"):
+    return client.post("/login", data={"email": email, "password": password})
@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, insert
+from app.models import AuditLog, AuditArchive
+from app.services.audit_archive import archive_audit_log, search_audit
+from conftest import login
+
+
+def _seed_history(app, boundary):
+    when = [boundary - timedelta(days=70), boundary - timedelta(days=40), boundary - timedelta(days=1), boundary + timedelta(days=1)]
+    with app.session_factory() as db:
+        db.execute(insert(AuditLog), [
+            {"at": at, "actor_email": "old@example.com", "action": "machine_toggle" if n % 2 else "login", "detail": f"event {n}"}
+            for n, at in enumerate(when)
+        ])
+        db.commit()
+    return when
+
+
+def test_old_months_move_to_gzipped_segments_and_stay_searchable(app, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    now = datetime.utcnow()
+    boundary = datetime((now - timedelta(days=40)).year, (now - timedelta(days=40)).month, 1)
+    when = _seed_history(app, boundary)
+
+    written = archive_audit_log(app.session_factory, archive_dir, retention_days=40, now=now)
+    assert len(written) == 3  # one segment per archived month
+    assert archive_audit_log(app.session_factory, archive_dir, retention_days=40, now=now) == []
+
+    with app.session_factory() as db:
+        assert db.execute(select(func.min(AuditLog.at))).scalar() >= boundary
+        assert db.execute(select(func.sum(AuditArchive.rows))).scalar() == 3
+        with gzip.open(os.path.join(archive_dir, written[0]), "rt") as f:
+            assert json.loads(f.readline())["actor_email"] == "old@example.com"
+
+        found = list(search_audit(db, archive_dir, actor="OLD@example.com"))
+        assert [r["at"] for r in found] == sorted(when, reverse=True)
+        toggles = list(search_audit(db, archive_dir, action="machine_toggle", until=boundary))
+        assert [r["at"] for r in toggles] == [when[1]]
+        assert list(search_audit(db, archive_dir, actor="old@example.com", since=boundary)) == found[:1]
+
+
+def test_audit_search_endpoint_and_export_include_archives(app, client, tmp_path):
+    app.audit_archive_dir = str(tmp_path / "archive")
+    now = datetime.utcnow()
+    boundary = datetime((now - timedelta(days=40)).year, (now - timedelta(days=40)).month, 1)
+    _seed_history(app, boundary)
+    archive_audit_log(app.session_factory, app.audit_archive_dir, retention_days=40, now=now)
+
+    login(client)
+    rows = client.get("/admin/audit.json?actor=old@example.com").get_json()["rows"]
+    assert len(rows) == 4
+    assert len(client.get("/admin/audit.json?actor=old@example.com&limit=2").get_json()["rows"]) == 2
+    csv = client.get("/admin/export/audit.csv?actor=old@example.com").data.decode()
+    assert csv.count("old@example.com") == 4
+
+
+def test_archived_rows_come_back_newest_first_when_ids_are_out_of_time_order(app, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    now = datetime.utcnow()
+    boundary = datetime((now - timedelta(days=40)).year, (now - timedelta(days=40)).month, 1)
+    month = boundary - timedelta(days=20)
+
+    def add(ats):
+        # Inserted newest first, so ids run against time, as batched audit writes can leave them.
+        with app.session_factory() as db:
+            db.execute(insert(AuditLog), [{"at": at, "actor_email": "batch@example.com", "action": "login", "detail": "x"} for at in ats])
+            db.commit()
+
+    add([month + timedelta(hours=h) for h in (5, 3, 1)])
+    archive_audit_log(app.session_factory, archive_dir, retention_days=40, now=now)
+    add([month + timedelta(hours=h) for h in (4, 2)])  # a second run over the same month
+    archive_audit_log(app.session_factory, archive_dir, retention_days=40, now=now)
+    add([boundary + timedelta(hours=1)])
+
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(AuditArchive)).scalar_one() == 2
+        found = [r["at"] for r in search_audit(db, archive_dir, actor="batch@example.com")]
+    assert found == [boundary + timedelta(hours=1)] + [month + timedelta(hours=h) for h in (5, 4, 3, 2, 1)]
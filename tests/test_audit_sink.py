@@ -0,0 +1,77 @@
+import threading
+from sqlalchemy import select, func
+from app.models import AuditLog, Notification
+from app.services.audit import AuditSink, audit
+from app.services.events import emit
+from app.services.notifications import queue_notification
+from conftest import login, count_queries
+
+
+def _count(app, action) -> int:
+    with app.session_factory() as db:
+        return db.execute(select(func.count()).select_from(AuditLog).where(AuditLog.action == action)).scalar_one()
+
+
+def test_sign_ins_are_queued_off_the_request_and_flushed(app, client):
+    app.audit_sink.close()  # stop the writer thread so the queue can be inspected
+    before = _count(app, "login")
+    with count_queries(app.engine) as q:
+        login(client)
+    assert not any(s.startswith("INSERT INTO audit_log") for s in q.statements)
+    client.get("/logout")
+    assert app.audit_sink.stats()["queued"] == 2
+
+    assert app.audit_sink.flush() == 2
+    assert _count(app, "login") == before + 1 and _count(app, "logout") >= 1
+    assert client.get("/admin/metrics.json").status_code == 302  # signed out
+
+
+def test_full_queue_drops_and_close_writes_the_rest(app):
+    sink = AuditSink(app.session_factory, maxsize=3, batch=2)
+    results = [sink.record("a@example.com", "bulk_probe", f"event {i}") for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert sink.stats()["dropped"] == 2
+
+    with count_queries(app.engine) as q:
+        sink.close()
+    assert sum(s.startswith("INSERT INTO audit_log") for s in q.statements) == 2  # batches of two, then one
+    assert _count(app, "bulk_probe") == 3
+    assert sink.stats() == {"queued": 0, "maxsize": 3, "written": 3, "dropped": 2, "batches": 2, "failures": 0}
+
+
+def test_sync_audit_commits_or_rolls_back_with_the_session(app):
+    with app.session_factory() as db:
+        audit(db, "a@example.com", "sync_probe", "kept")
+        db.commit()
+        audit(db, "a@example.com", "sync_probe", "discarded")
+        db.rollback()
+    assert _count(app, "sync_probe") == 1
+
+
+def test_rows_staged_by_before_commit_handlers_commit_with_the_change(app):
+    # Event handlers run first, so what they stage is still flushed in the same commit.
+    def handler(db, payload):
+        audit(db, "a@example.com", "handler_probe", payload["detail"])
+        queue_notification(db, 1, "handler_probe")
+    app.event_bus.subscribe("probe.raised", handler, phase="before_commit")
+
+    with app.session_factory() as db:
+        emit(db, "probe.raised", detail="from a handler")
+        db.commit()
+        assert db.execute(select(func.count()).select_from(Notification).where(Notification.message == "handler_probe")).scalar_one() == 1
+    assert _count(app, "handler_probe") == 1
+
+
+def test_concurrent_overflow_counts_every_dropped_row(app):
+    sink = AuditSink(app.session_factory, maxsize=1)
+    sink.record("a@example.com", "overflow_probe", "kept")
+
+    def flood():
+        for _ in range(2000):
+            sink.record("a@example.com", "overflow_probe", "dropped")
+    threads = [threading.Thread(target=flood) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sink.stats()["dropped"] == 16_000
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.models import BookingRequest, BookingItem, Machine
+from app.services.availability import free_machines, next_free_slots
+from conftest import login, count_queries
+
+
+def _approved(app, machine_id, start, hours):
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=start, end_at=start + timedelta(hours=hours), purpose="Held", status="approved")
+        db.add(b); db.flush()
+        db.add(BookingItem(booking_id=b.id, machine_id=machine_id))
+        booking_id = b.id
+        db.commit()
+    app.conflict_index.add(booking_id, [machine_id], start, start + timedelta(hours=hours))
+
+
+def test_free_machines_is_one_query_and_respects_filters(app):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    with app.session_factory() as db:
+        booked, other = db.execute(select(Machine.id).where(Machine.status == "available").limit(2)).scalars().all()
+        category = db.get(Machine, other).category
+    _approved(app, booked, start, 2)
+    with app.session_factory() as db:
+        with count_queries(app.engine) as q:
+            free = free_machines(db, start + timedelta(hours=1), start + timedelta(hours=3))
+        assert q.count == 1
+        ids = {m["id"] for m in free}
+        assert booked not in ids and other in ids
+
+        # touching windows do not overlap
+        assert booked in {m["id"] for m in free_machines(db, start + timedelta(hours=2), start + timedelta(hours=3))}
+        assert all(m["category"] == category for m in free_machines(db, start, start + timedelta(hours=1), category=category))
+
+
+def test_next_free_slots_index_and_database_agree(app):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    _approved(app, 5, start, 2)
+    _approved(app, 5, start + timedelta(hours=3), 2)
+    with app.session_factory() as db:
+        from_db = next_free_slots(db, 5, timedelta(hours=1), after=start - timedelta(hours=2), count=3)
+        from_index = next_free_slots(db, 5, timedelta(hours=1), after=start - timedelta(hours=2), count=3, index=app.conflict_index)
+    assert [s for s, _ in from_db] == [s for s, _ in from_index]
+    assert from_db[:2] == from_index[:2]
+    assert from_db[0] == (start - timedelta(hours=2), start)
+    assert from_db[1] == (start + timedelta(hours=2), start + timedelta(hours=3))
+    assert from_db[2][0] == start + timedelta(hours=5)
+
+
+def test_availability_endpoints(app, client):
+    start = datetime.utcnow().replace(microsecond=0, second=0) + timedelta(days=1)
+    with app.session_factory() as db:
+        booked = db.execute(select(Machine.id).where(Machine.status == "available").limit(1)).scalar_one()
+    _approved(app, booked, start, 2)
+    login(client)
+
+    r = client.get(f"/bookings/availability.json?start={start.isoformat()}&end={(start + timedelta(hours=1)).isoformat()}")
+    ids = {m["id"] for m in r.get_json()["machines"]}
+    assert booked not in ids and len(ids) > 50
+    assert client.get("/bookings/availability.json?start=yesterday").status_code == 400
+    # Offsets are converted to naive UTC: the same window written in +02:00 gives the same answer.
+    shifted = (start + timedelta(hours=2)).isoformat()
+    r = client.get(f"/bookings/availability.json?start={shifted}%2B02:00&end={(start + timedelta(hours=1)).isoformat()}Z")
+    assert r.status_code == 200 and {m["id"] for m in r.get_json()["machines"]} == ids
+    assert r.get_json()["start"] == start.isoformat()
+
+    slots = client.get(f"/bookings/availability/{booked}/slots.json?minutes=30&count=2").get_json()["slots"]
+    assert len(slots) == 2
+    r = client.get(f"/bookings/availability/{booked}/slots.json?minutes=30&count=2&after={start.isoformat()}Z")
+    assert r.status_code == 200 and r.get_json()["slots"][0]["start"] >= (start + timedelta(hours=2)).isoformat()
+    assert client.get("/bookings/availability/999999/slots.json").status_code == 404
+    r = client.get(f"/bookings/availability/{booked}/slots.json?minutes={10 ** 15}")
+    assert r.status_code == 200 and r.get_json()["slots"] == []
+    with app.session_factory() as db:
+        broken = db.execute(select(Machine.id).where(Machine.status == "available").offset(1).limit(1)).scalar_one()
+        db.get(Machine, broken).status = "out_of_service"
+        db.commit()
+    r = client.get(f"/bookings/availability/{broken}/slots.json")
+    assert r.status_code == 200 and r.get_json()["slots"] == []
+
+    r = client.post("/bookings/new", data={
+        "start_at": start.strftime("%Y-%m-%dT%H:%M"),
+        "end_at": (start + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M"),
+        "purpose": "Clashing request",
+        "machines": [str(booked)],
+    })
+    assert b"already booked" in r.data
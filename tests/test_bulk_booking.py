@@ -0,0 +1,165 @@
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from app.models import BookingRequest, BookingItem, AuditLog, Machine
+from app.services.booking_rules import find_conflicts
+from app.services.bulk_booking import expand_recurrence, parse_weekdays, MAX_IMPORT_BYTES
+from conftest import login, count_queries
+
+
+def _next_monday(hour=9):
+    d = datetime.utcnow().replace(hour=hour, minute=0, second=0, microsecond=0) + timedelta(days=7)
+    return d - timedelta(days=d.weekday())
+
+def _available(app, n=2):
+    with app.session_factory() as db:
+        return db.execute(select(Machine.id, Machine.name).where(Machine.status == "available").order_by(Machine.id).limit(n)).all()
+
+
+def test_expand_recurrence_weekdays_and_until():
+    start = _next_monday()
+    occ = expand_recurrence(start, start + timedelta(hours=2), "weekly", until=(start + timedelta(days=13)).date(), weekdays=parse_weekdays("MO WE FR"))
+    assert [s.weekday() for s, _ in occ] == [0, 2, 4, 0, 2, 4]
+    assert all(e - s == timedelta(hours=2) for s, e in occ)
+
+    every_other_day = expand_recurrence(start, start + timedelta(hours=1), "daily", until=(start + timedelta(days=6)).date(), interval=2)
+    assert len(every_other_day) == 4
+
+    # capped at the 90-day booking horizon
+    assert len(expand_recurrence(start, start + timedelta(hours=1), "daily")) <= 90
+
+
+def test_find_conflicts_first_come_within_batch(app):
+    start = _next_monday()
+    (mid, _), = _available(app, 1)
+    with app.session_factory() as db:
+        conflicts = find_conflicts(db, [
+            ("a", [mid], start, start + timedelta(hours=2)),
+            ("b", [mid], start + timedelta(hours=1), start + timedelta(hours=3)),
+            ("c", [mid], start + timedelta(hours=2), start + timedelta(hours=3)),
+        ])
+    assert conflicts == {"b": "overlaps another booking in this batch"}
+
+
+def test_csv_import_inserts_every_occurrence_in_one_transaction(app, client):
+    start = _next_monday()
+    (m1, name1), (m2, _) = _available(app)
+    csv_text = (
+        "start_at,end_at,machines,purpose,repeat,until,weekdays\n"
+        f"{start.isoformat()},{(start + timedelta(hours=2)).isoformat()},{name1};{m2},Nightly regression,weekly,{(start + timedelta(days=20)).date()},MO TU WE TH FR\n"
+        f"{(start + timedelta(hours=5)).isoformat()},{(start + timedelta(hours=6)).isoformat()},{m2},One-off smoke run,,,\n"
+    )
+    login(client)
+    with count_queries(app.engine) as q:
+        r = client.post("/bookings/import", data={"file": (io.BytesIO(csv_text.encode()), "plan.csv")}, content_type="multipart/form-data")
+    assert r.status_code == 200 and b"Imported 16 booking request(s)" in r.data
+    assert q.count <= 10
+
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(BookingRequest).where(BookingRequest.series_id.is_not(None))).scalar_one() == 16
+        assert db.execute(select(func.count()).select_from(BookingItem)).scalar_one() == 31
+        assert db.execute(select(func.count()).select_from(AuditLog).where(AuditLog.action == "booking_request_bulk")).scalar_one() == 1
+
+
+def test_import_conflicts_abort_or_skip(app, client):
+    start = _next_monday()
+    (mid, _), = _available(app, 1)
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=start + timedelta(days=2), end_at=start + timedelta(days=2, hours=1), purpose="Held", status="approved")
+        db.add(b); db.flush()
+        db.add(BookingItem(booking_id=b.id, machine_id=mid))
+        held = (b.id, [mid], b.start_at, b.end_at)
+        db.commit()
+    app.conflict_index.add(*held)
+    rows = json.dumps([{
+        "start_at": start.isoformat(), "end_at": (start + timedelta(hours=2)).isoformat(),
+        "machines": [mid], "purpose": "Daily soak test", "repeat": "daily", "until": str((start + timedelta(days=4)).date()),
+    }])
+    login(client)
+
+    def upload(**extra):
+        return client.post("/bookings/import", data={"file": (io.BytesIO(rows.encode()), "plan.json"), **extra}, content_type="multipart/form-data")
+
+    r = upload()
+    assert b"Nothing was imported" in r.data and b"clashes with an approved booking" in r.data
+    r = upload(skip_conflicts="y")
+    assert b"Imported 4 booking request(s)" in r.data and b"Skipped 1 clashing" in r.data
+
+
+def test_import_converts_utc_offsets_to_naive_utc(app, client):
+    start = _next_monday()
+    (mid, _), = _available(app, 1)
+    rows = json.dumps([{
+        "start_at": start.isoformat() + "Z", "end_at": (start + timedelta(hours=3)).isoformat() + "+02:00",
+        "machines": [mid], "purpose": "Offset timestamps",
+    }])
+    login(client)
+    r = client.post("/bookings/import", data={"file": (io.BytesIO(rows.encode()), "plan.json")}, content_type="multipart/form-data")
+    assert r.status_code == 200 and b"Imported 1 booking request(s)" in r.data
+    with app.session_factory() as db:
+        b = db.execute(select(BookingRequest).where(BookingRequest.purpose == "Offset timestamps")).scalar_one()
+        assert (b.start_at, b.end_at) == (start, start + timedelta(hours=1))
+
+
+def test_import_rejects_oversized_files_and_overlong_machine_ids(app, client):
+    start = _next_monday()
+    login(client)
+    rows = json.dumps([{"start_at": start.isoformat(), "end_at": (start + timedelta(hours=1)).isoformat(),
+                        "machines": ["9" * 40], "purpose": "Overlong machine id"}])
+    r = client.post("/bookings/import", data={"file": (io.BytesIO(rows.encode()), "plan.json")}, content_type="multipart/form-data")
+    assert r.status_code == 200 and b"Unknown machine(s): " + b"9" * 40 in r.data
+
+    too_big = rows.encode() + b" " * MAX_IMPORT_BYTES
+    r = client.post("/bookings/import", data={"file": (io.BytesIO(too_big), "plan.json")}, content_type="multipart/form-data")
+    assert b"Imports are limited to" in r.data and b"Unknown machine" not in r.data
+
+
+def test_open_ended_series_stops_at_the_horizon_instant(app, client):
+    # A time of day later than now: the series' last date on the 90th day would fall past the horizon.
+    start = (datetime.utcnow() + timedelta(days=1, minutes=30)).replace(second=0, microsecond=0)
+    end = start + timedelta(hours=1)
+    (mid, _), = _available(app, 1)
+    assert len(expand_recurrence(start, end, "daily")) == 89
+
+    login(client)
+    r = client.post("/bookings/new", data={
+        "start_at": start.strftime("%Y-%m-%dT%H:%M"), "end_at": end.strftime("%Y-%m-%dT%H:%M"),
+        "machines": [str(mid)], "purpose": "Open-ended form series", "repeat": "daily",
+    })
+    assert r.status_code == 302
+
+    rows = json.dumps([{"start_at": start.isoformat(), "end_at": end.isoformat(), "machines": [mid],
+                        "purpose": "Open-ended import series", "repeat": "daily"}])
+    r = client.post("/bookings/import", data={"file": (io.BytesIO(rows.encode()), "plan.json")}, content_type="multipart/form-data")
+    assert r.status_code == 200
+
+    with app.session_factory() as db:
+        counts = dict(db.execute(
+            select(BookingRequest.purpose, func.count()).where(BookingRequest.series_id.is_not(None)).group_by(BookingRequest.purpose)
+        ).all())
+    assert counts == {"Open-ended form series": 89, "Open-ended import series": 89}
+
+
+def test_series_without_occurrences_is_an_error(app, client):
+    start = _next_monday()
+    end = start + timedelta(hours=1)
+    (mid, _), = _available(app, 1)
+    login(client)
+
+    r = client.post("/bookings/new", data={
+        "start_at": start.strftime("%Y-%m-%dT%H:%M"), "end_at": end.strftime("%Y-%m-%dT%H:%M"),
+        "machines": [str(mid)], "purpose": "Series ending early", "repeat": "daily",
+        "repeat_until": str((start - timedelta(days=1)).date()),
+    })
+    assert r.status_code == 200 and b"The series has no occurrences before its end date." in r.data
+    assert b"clashes with an approved booking" not in r.data
+
+    # A Monday start that only repeats on Tuesdays, ending before the first Tuesday.
+    rows = json.dumps([{"start_at": start.isoformat(), "end_at": end.isoformat(), "machines": [mid],
+                        "purpose": "Series on no day", "repeat": "weekly", "weekdays": "TU", "until": str(start.date())}])
+    r = client.post("/bookings/import", data={"file": (io.BytesIO(rows.encode()), "plan.json")}, content_type="multipart/form-data")
+    assert b"Nothing was imported" in r.data and b"The series has no occurrences before its end date." in r.data
+
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(BookingRequest).where(BookingRequest.purpose.like("Series %"))).scalar_one() == 0
@@ -0,0 +1,63 @@
+import random
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.models import BookingRequest, BookingItem, Machine, User
+from app.services.decisions import decide_bookings
+
+
+def test_concurrent_approvers_never_double_book(app):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=5)
+    with app.session_factory() as db:
+        m1, m2 = db.execute(select(Machine.id).where(Machine.status == "available").limit(2)).scalars().all()
+        ids = []
+        for i in range(24):
+            # staggered windows on two machines, many pairwise overlaps, some spanning both machines
+            s = start + timedelta(minutes=20 * i)
+            b = BookingRequest(requester_id=3, start_at=s, end_at=s + timedelta(hours=2), purpose="Contended", status="pending")
+            db.add(b); db.flush()
+            for mid in ([m1] if i % 3 == 0 else [m2] if i % 3 == 1 else [m1, m2]):
+                db.add(BookingItem(booking_id=b.id, machine_id=mid))
+            ids.append(b.id)
+        db.commit()
+        approvers = db.execute(select(User).where(User.role.in_(["admin", "approver"]))).scalars().all()
+        approvers = [(u.id, u.email) for u in approvers]
+
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def approver(n):
+        rnd = random.Random(n)
+        mine = ids[:]
+        rnd.shuffle(mine)
+
+        class Actor:
+            id, email = approvers[n % len(approvers)]
+
+        try:
+            barrier.wait()
+            for booking_id in mine:
+                with app.session_factory() as db:
+                    decide_bookings(db, [booking_id], "approve", Actor)
+                    db.commit()
+        except Exception as e:  # surfaced below; a thread exception would otherwise be lost
+            errors.append(e)
+
+    threads = [threading.Thread(target=approver, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+    with app.session_factory() as db:
+        rows = db.execute(
+            select(BookingItem.machine_id, BookingRequest.start_at, BookingRequest.end_at)
+            .join(BookingRequest, BookingRequest.id == BookingItem.booking_id)
+            .where(BookingRequest.id.in_(ids), BookingRequest.status == "approved")
+            .order_by(BookingItem.machine_id, BookingRequest.start_at)
+        ).all()
+        assert db.execute(select(BookingRequest).where(BookingRequest.id.in_(ids), BookingRequest.status == "pending")).first() is None
+    assert rows
+    for (m_a, _, end_a), (m_b, start_b, _) in zip(rows, rows[1:]):
+        assert m_a != m_b or start_b >= end_a
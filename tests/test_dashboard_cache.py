@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from app.models import BookingRequest, BookingItem
+from app.services.cache import cache_version
+from app.services.dashboard import dashboard_summary
+from conftest import login
+
+
+def test_dashboard_cache_is_invalidated_by_booking_events(app, client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=start, end_at=start + timedelta(hours=2), purpose="Cache", status="pending")
+        db.add(b); db.flush()
+        db.add(BookingItem(booking_id=b.id, machine_id=1))
+        db.commit()
+        booking_id = b.id
+    login(client)
+
+    client.get("/admin/dashboard")
+    client.get("/admin/dashboard")
+    stats = client.get("/admin/metrics.json").get_json()["caches"]["dashboard"]
+    assert stats["misses"] == 1 and stats["hits"] == 1
+
+    with app.session_factory() as db:
+        before = cache_version(db, "dashboard")
+    client.post(f"/admin/booking/{booking_id}/approve")
+    with app.session_factory() as db:
+        assert cache_version(db, "dashboard") == before + 1
+    assert app.conflict_index.has_conflict([1], start, start + timedelta(hours=1))
+
+    client.get("/admin/dashboard")
+    assert app.dashboard_cache.stats()["misses"] == 2
+
+    client.get("/logout")
+    login(client, "user@example.com", "User123!")
+    client.post(f"/bookings/cancel/{booking_id}")
+    assert not app.conflict_index.has_conflict([1], start, start + timedelta(hours=1))
+
+
+def test_summary_counts_follow_the_selected_window(app):
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.session_factory() as db:
+        db.add_all([
+            BookingRequest(requester_id=3, start_at=now - timedelta(days=50), end_at=now - timedelta(days=50, hours=-1), purpose="Old cancel",
+                           status="cancelled", cancelled_at=now - timedelta(days=45)),
+            BookingRequest(requester_id=3, start_at=now - timedelta(days=45), end_at=now - timedelta(days=45, hours=-1), purpose="Old no-show",
+                           status="approved", no_show=True),
+        ])
+        db.commit()
+        short, wide = dashboard_summary(db, 30), dashboard_summary(db, 90)
+    assert wide["cancellations"] == short["cancellations"] + 1
+    assert wide["no_shows"] == short["no_shows"] + 1
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from app.models import BookingRequest, BookingItem, AuditLog, Machine
+from app.services.cache import cache_version
+from conftest import login, count_queries
+
+
+def _pending(app, windows):
+    with app.session_factory() as db:
+        mid = db.execute(select(Machine.id).where(Machine.status == "available").limit(1)).scalar_one()
+        ids = []
+        for start, hours in windows:
+            b = BookingRequest(requester_id=3, start_at=start, end_at=start + timedelta(hours=hours), purpose="Queued", status="pending")
+            db.add(b); db.flush()
+            db.add(BookingItem(booking_id=b.id, machine_id=mid))
+            ids.append(b.id)
+        db.commit()
+    return ids
+
+
+def test_bulk_approve_resolves_overlaps_first_come(app, client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=3)
+    first, clash, later = _pending(app, [(start, 2), (start + timedelta(hours=1), 2), (start + timedelta(hours=4), 1)])
+    login(client)
+    with app.session_factory() as db:
+        version = cache_version(db, "dashboard")
+
+    r = client.post("/admin/bookings/decide", json={"booking_ids": [clash, later, first, 999999], "action": "approve"})
+    outcomes = {o["id"]: o["outcome"] for o in r.get_json()["outcomes"]}
+    assert outcomes == {first: "approved", clash: "rejected", later: "approved", 999999: "skipped"}
+
+    with app.session_factory() as db:
+        assert cache_version(db, "dashboard") == version + 1  # one bump for the whole batch
+        assert db.execute(select(func.count()).select_from(AuditLog).where(AuditLog.action.in_(["booking_approve", "booking_reject"]))).scalar_one() == 3
+    assert app.conflict_index.has_conflict([_machine(app, first)], start, start + timedelta(minutes=30))
+
+
+def _machine(app, booking_id):
+    with app.session_factory() as db:
+        return db.execute(select(BookingItem.machine_id).where(BookingItem.booking_id == booking_id)).scalar_one()
+
+
+def test_bulk_approve_in_given_order_and_query_count(app, client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=3)
+    first, clash = _pending(app, [(start, 2), (start + timedelta(hours=1), 2)])
+    spread = _pending(app, [(start + timedelta(days=1, hours=3 * i), 2) for i in range(40)])
+    login(client)
+
+    r = client.post("/admin/bookings/decide", json={"booking_ids": [clash, first], "action": "approve", "order": "given"})
+    assert {o["id"]: o["outcome"] for o in r.get_json()["outcomes"]} == {clash: "approved", first: "rejected"}
+
+    with count_queries(app.engine) as q:
+        r = client.post("/admin/bookings/decide", data={"booking_ids": [str(i) for i in spread], "action": "approve"})
+    assert r.status_code == 302
+    assert q.count <= 16  # no per-booking round trips for locks, loads, checks or writes
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(BookingRequest).where(BookingRequest.id.in_(spread), BookingRequest.status == "approved")).scalar_one() == 40
+
+
+def test_bulk_decide_rejects_malformed_json(app, client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=3)
+    pending = _pending(app, [(start + timedelta(hours=3 * i), 1) for i in range(2)])
+    login(client)
+    for body in ([], {"booking_ids": "12", "action": "approve"}, {"booking_ids": [True], "action": "approve"},
+                 {"booking_ids": pending, "action": "approve", "note": 5}, {"booking_ids": pending, "action": ["approve"]}):
+        assert client.post("/admin/bookings/decide", json=body).status_code == 400
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(BookingRequest).where(BookingRequest.id.in_(pending), BookingRequest.status == "pending")).scalar_one() == 2
@@ -0,0 +1,20 @@
+from app.engine import make_engine, engine_options
+
+
+def test_sqlite_connections_get_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'e.db'}", env={"SQLITE_BUSY_TIMEOUT_MS": "1234"})
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("busy_timeout") == 1234
+        assert pragma("cache_size") == -65536
+    engine.dispose()
+
+
+def test_server_pool_settings_come_from_env():
+    options = engine_options("postgresql://db/app", env={"DB_POOL_SIZE": "3", "DB_POOL_PRE_PING": "0"})
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 20
+    assert options["pool_recycle"] == 1800
+    assert options["pool_pre_ping"] is False
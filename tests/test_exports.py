@@ -0,0 +1,42 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta
+from app.models import BookingRequest, BookingItem, AuditLog
+from conftest import login
+
+
+def _rows(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_booking_export_streams_filtered_rows(app, client):
+    day = datetime(2026, 3, 2, 9, 0)
+    with app.session_factory() as db:
+        for i, status in enumerate(["approved", "cancelled", "approved"]):
+            b = BookingRequest(requester_id=3, start_at=day + timedelta(days=i), end_at=day + timedelta(days=i, hours=2), purpose="Export", status=status)
+            db.add(b); db.flush()
+            db.add_all([BookingItem(booking_id=b.id, machine_id=2), BookingItem(booking_id=b.id, machine_id=1)])
+        db.commit()
+    login(client)
+
+    r = client.get("/admin/export/bookings.csv?status=approved")
+    rows = _rows(r.data)
+    assert rows[0][0] == "id" and len(rows) == 3
+    assert rows[1][5] == "TM-001; TM-002"
+    assert rows[1][1] == "user@example.com"
+
+    r = client.get("/admin/export/bookings.csv?from=2026-03-02&to=2026-03-03&gzip=1")
+    rows = _rows(gzip.decompress(r.data))
+    assert [row[4] for row in rows[1:]] == ["cancelled", "approved"]
+
+
+def test_audit_export_filters_by_action(app, client):
+    with app.session_factory() as db:
+        db.add_all([AuditLog(actor_email="a@example.com", action="machine_toggle", detail=f"Toggle {i}") for i in range(5)])
+        db.commit()
+    login(client)
+
+    rows = _rows(client.get("/admin/export/audit.csv?action=machine_toggle").data)
+    assert len(rows) == 6
+    assert client.get("/admin/export/audit.csv?from=yesterday").status_code == 302
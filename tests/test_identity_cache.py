@@ -0,0 +1,45 @@
+import dataclasses
+import pytest
+from app.models import User
+from app.services.identity import UserIdentity
+from conftest import login, count_queries
+
+
+def test_signed_in_requests_reuse_the_cached_identity(app, client):
+    login(client, "user@example.com", "User123!")
+    before = app.user_cache.stats()
+    with count_queries(app.engine) as q:
+        client.get("/bookings/my")
+    assert not any("FROM users" in s for s in q.statements)
+    assert app.user_cache.stats()["hits"] == before["hits"] + 1
+
+    identity = app.user_cache.get(3)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        identity.role = "admin"
+    assert not hasattr(identity, "__dict__")
+    assert identity.is_active and not dataclasses.replace(identity, status="rejected").is_active
+
+
+def test_user_approval_drops_the_cached_identity(app, client):
+    with app.session_factory() as db:
+        u = User(name="New Person", email="new@example.com", password_hash="x", team="QA", manager_email="m@example.com", role="user", status="pending")
+        db.add(u); db.commit()
+        user_id = u.id
+    app.user_cache.set(user_id, UserIdentity(user_id, "New Person", "new@example.com", "QA", "user", "pending"))
+
+    login(client)
+    client.post(f"/admin/users/{user_id}/approve")
+    assert app.user_cache.get(user_id) is None
+    assert client.get("/admin/metrics.json").get_json()["caches"]["users"]["misses"] >= 1
+
+
+def test_user_rejection_drops_the_cached_identity(app, client):
+    with app.session_factory() as db:
+        u = User(name="Other Person", email="other@example.com", password_hash="x", team="QA", manager_email="m@example.com", role="user", status="active")
+        db.add(u); db.commit()
+        user_id = u.id
+    app.user_cache.set(user_id, UserIdentity(user_id, "Other Person", "other@example.com", "QA", "user", "active"))
+
+    login(client)
+    client.post(f"/admin/users/{user_id}/reject")
+    assert app.user_cache.get(user_id) is None
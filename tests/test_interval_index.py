@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import Site, Machine, User, BookingRequest, BookingItem
+from app.security import hash_password
+from app.services.booking_rules import has_conflicts_for_approved_bookings
+from app.services.interval_index import IntervalIndex
+
+
+def _seed_one_booking(db):
+    s = Site(name="S", city="C", lat=0.0, lon=0.0)
+    db.add(s); db.flush()
+    m = Machine(name="TM-001", machine_type="lab", category="Core", status="available", site_id=s.id)
+    u = User(name="U", email="u@example.com", password_hash=hash_password("Password123!"), team="T", role="user", status="active", manager_email="m@example.com")
+    db.add_all([m, u]); db.flush()
+
+    start = datetime.utcnow() + timedelta(hours=1)
+    end = start + timedelta(hours=2)
+    b = BookingRequest(requester_id=u.id, start_at=start, end_at=end, purpose="x", status="approved")
+    db.add(b); db.flush()
+    db.add(BookingItem(booking_id=b.id, machine_id=m.id))
+    db.commit()
+    return m, b, start, end
+
+
+def test_index_matches_database_conflict_check():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, future=True)
+
+    with Session() as db:
+        m, b, start, end = _seed_one_booking(db)
+        index = IntervalIndex()
+        index.build(db)
+
+        windows = [
+            (start + timedelta(minutes=30), end + timedelta(minutes=30)),
+            (start - timedelta(hours=1), start),
+            (end, end + timedelta(hours=1)),
+            (start - timedelta(hours=1), end + timedelta(hours=1)),
+        ]
+        for s, e in windows:
+            assert has_conflicts_for_approved_bookings(db, [m.id], s, e, index=index) == has_conflicts_for_approved_bookings(db, [m.id], s, e)
+
+        index.remove(b.id)
+        assert has_conflicts_for_approved_bookings(db, [m.id], start, end, index=index) is False
+        assert index.verify(db) == 1
+        assert has_conflicts_for_approved_bookings(db, [m.id], start, end, index=index) is True
+
+
+def test_index_finds_long_span_behind_short_ones():
+    index = IntervalIndex()
+    index.built_at = datetime.utcnow()
+    t0 = datetime(2026, 1, 1)
+    index.add(1, [7], t0, t0 + timedelta(days=3))
+    index.add(2, [7], t0 + timedelta(hours=1), t0 + timedelta(hours=2))
+
+    assert index.overlapping(7, t0 + timedelta(days=1), t0 + timedelta(days=1, hours=1)) == [1]
+    index.prune(t0 + timedelta(days=4))
+    assert index.snapshot() == {}
+    assert not index.covers(t0)
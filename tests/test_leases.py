@@ -0,0 +1,52 @@
+from datetime import timedelta
+from app import create_app
+from app.services.leases import Lease, acquire_lease, release_lease
+
+
+def test_only_one_holder_until_the_lease_expires(app):
+    with app.session_factory() as db:
+        assert acquire_lease(db, "jobs", "a", timedelta(seconds=60))
+        assert not acquire_lease(db, "jobs", "b", timedelta(seconds=60))
+        assert acquire_lease(db, "jobs", "a", timedelta(seconds=60))
+
+        # An expired lease can be taken over.
+        assert acquire_lease(db, "jobs", "a", timedelta(seconds=-1))
+        assert acquire_lease(db, "jobs", "b", timedelta(seconds=60))
+        assert not acquire_lease(db, "jobs", "a", timedelta(seconds=60))
+
+        release_lease(db, "jobs", "b")
+        assert acquire_lease(db, "jobs", "a", timedelta(seconds=60))
+
+
+def test_guarded_job_runs_only_in_the_leader(app):
+    ran = []
+    leader = Lease(app.session_factory, "jobs", holder="leader")
+    standby = Lease(app.session_factory, "jobs", holder="standby")
+    leader.guard(lambda: ran.append("leader"))()
+    standby.guard(lambda: ran.append("standby"))()
+    assert ran == ["leader"]
+    assert leader.held and not standby.held
+
+
+def test_scheduler_flag_leaves_shared_jobs_to_the_worker(app, monkeypatch):
+    assert {j.id for j in app.scheduler.get_jobs()} >= {"notifications", "no_show", "conflict_index"}
+
+    monkeypatch.setenv("SCHEDULER_ENABLED", "0")
+    web = create_app()
+    try:
+        assert {j.id for j in web.scheduler.get_jobs()} == {"conflict_index", "occupancy"}
+    finally:
+        web.scheduler.shutdown(wait=False)
+        web.engine.dispose()
+
+
+def test_worker_app_skips_the_web_only_setup(app):
+    worker = create_app(web=False)
+    try:
+        assert worker.notification_dispatcher is not None and worker.no_show_timer is not None
+        for name in ("conflict_index", "occupancy", "audit_sink", "password_hasher", "scheduler"):
+            assert not hasattr(worker, name)
+        assert worker.blueprints == {}
+    finally:
+        worker.notification_dispatcher.shutdown()
+        worker.engine.dispose()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from app.models import Machine, Site, BookingItem
+from app.services.machine_search import search_machines, machine_facets
+from conftest import login
+
+
+def test_search_matches_prefixes_across_machine_and_site_fields(app):
+    with app.session_factory() as db:
+        london = db.execute(select(Site).where(Site.city == "London")).scalar_one()
+        in_london = db.execute(select(func.count()).select_from(Machine).where(Machine.site_id == london.id)).scalar_one()
+
+        assert [m.name for m in search_machines(db, "TM-04")] == [f"TM-04{i}" for i in range(10)]
+        assert len(search_machines(db, "lond")) == in_london
+        network_in_london = search_machines(db, "networking london")
+        assert all(m.site_id == london.id and m.category == "Networking" for m in network_in_london)
+
+        # Renames reach the index through the triggers.
+        db.get(Machine, 1).name = "Fuzzbox-1"
+        db.commit()
+        assert [m.id for m in search_machines(db, "fuzz")] == [1]
+        assert search_machines(db, "\"unbalanced").items == []
+
+
+def test_facets_count_each_dimension_without_its_own_filter(app):
+    with app.session_factory() as db:
+        everything = machine_facets(db)
+        assert sum(f["count"] for f in everything["site"]) == 100
+        assert {f["value"] for f in everything["status"]} <= {"available", "out_of_service"}
+
+        payments = machine_facets(db, category="Payments")
+        total_payments = next(f["count"] for f in everything["category"] if f["value"] == "Payments")
+        assert sum(f["count"] for f in payments["site"]) == total_payments
+        assert payments["category"] == everything["category"]
+
+
+def test_inventory_and_booking_picker_use_the_search(app, client):
+    login(client)
+    r = client.get("/admin/inventory?q=TM-001")
+    assert b"TM-001" in r.data and b"TM-002" not in r.data
+
+    r = client.get("/bookings/machines.json?category=Devices&per_page=200&facets=1").get_json()
+    with app.session_factory() as db:
+        devices = db.execute(select(Machine.id).where(Machine.category == "Devices", Machine.status == "available")).scalars().all()
+    assert sorted(m["id"] for m in r["machines"]) == sorted(devices)
+    assert {f["value"] for f in r["facets"]["category"]} >= {"Devices", "Payments"}
+
+    first = client.get("/bookings/machines.json?per_page=10").get_json()
+    second = client.get(f"/bookings/machines.json?per_page=10&after={first['next']}").get_json()
+    assert len(first["machines"]) == 10 and not {m["id"] for m in first["machines"]} & {m["id"] for m in second["machines"]}
+
+
+def test_booking_form_renders_no_machines_and_checks_submitted_ids(app, client):
+    login(client, "user@example.com", "User123!")
+    assert b"TM-050" not in client.get("/bookings/new").data
+
+    with app.session_factory() as db:
+        machine = db.execute(select(Machine).where(Machine.status == "available").order_by(Machine.id.desc())).scalars().first()
+        machine_id = machine.id
+    start = (datetime.utcnow() + timedelta(days=5)).replace(second=0, microsecond=0)
+    form = {"start_at": start.strftime("%Y-%m-%dT%H:%M"), "end_at": (start + timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M"),
+            "purpose": "Picker submission", "repeat": "none"}
+
+    r = client.post("/bookings/new", data={**form, "machines": ["999999"]})
+    assert b"One or more machines do not exist." in r.data
+
+    r = client.post("/bookings/new", data={**form, "machines": [str(machine_id)]})
+    assert r.status_code == 302
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(BookingItem).where(BookingItem.machine_id == machine_id)).scalar_one() >= 1
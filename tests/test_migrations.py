@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, inspect
+from app.db import Base
+from app.migrations import upgrade_schema
+
+
+def test_upgrade_schema_creates_missing_indexes_once():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for index in Base.metadata.tables["booking_requests"].indexes:
+            index.drop(bind=conn)
+
+    created = upgrade_schema(engine)
+    assert "ix_booking_requests_status_start" in created
+    assert all(name.startswith("ix_booking_requests") for name in created)
+    assert "ix_booking_requests_no_show_due" in {ix["name"] for ix in inspect(engine).get_indexes("booking_requests")}
+
+    assert upgrade_schema(engine) == []
+
+
+def test_upgrade_schema_relaxes_not_null_by_rebuilding_sqlite_table():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE notifications")
+        conn.exec_driver_sql(
+            "CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(id), "
+            "message VARCHAR(500) NOT NULL, created_at DATETIME, sent_at DATETIME)"
+        )
+        conn.exec_driver_sql("INSERT INTO notifications (user_id, message, created_at) VALUES (1, 'kept', '2026-01-01 00:00:00')")
+        conn.exec_driver_sql("CREATE TABLE receipts (id INTEGER PRIMARY KEY, notification_id INTEGER REFERENCES notifications(id))")
+        conn.exec_driver_sql("INSERT INTO receipts (notification_id) VALUES (1)")
+
+    created = upgrade_schema(engine)
+    assert "notifications.user_id nullable" in created
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT message, attempts FROM notifications").all() == [("kept", 0)]
+        conn.exec_driver_sql("INSERT INTO notifications (message, audience_roles, created_at) VALUES ('all approvers', 'approver', '2026-01-01 00:00:00')")
+        receipts = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'receipts'").scalar()
+        assert "REFERENCES notifications(id)" in receipts and "_old" not in receipts
+        # Only the dangling user id the test data started with.
+        assert conn.exec_driver_sql("PRAGMA foreign_key_check").all() == [("notifications", 1, "users", 0)]
+        assert "ix_notifications_unsent" in {ix["name"] for ix in inspect(conn).get_indexes("notifications")}
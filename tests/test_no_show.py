@@ -0,0 +1,107 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, func
+from app.models import BookingRequest, Notification
+from app.services import no_show
+from app.services.leases import Lease
+from app.services.no_show import NoShowTimer, GRACE, mark_no_shows
+from conftest import login
+
+
+def _approved(app, ends, checked_in=False) -> list[int]:
+    with app.session_factory() as db:
+        first = db.execute(select(func.coalesce(func.max(BookingRequest.id), 0))).scalar_one() + 1
+        db.execute(insert(BookingRequest), [
+            {"id": first + n, "requester_id": 3, "start_at": end - timedelta(hours=1), "end_at": end, "purpose": "Overnight run",
+             "status": "approved", "checked_in": checked_in, "no_show": False, "created_at": datetime.utcnow()}
+            for n, end in enumerate(ends)
+        ])
+        db.commit()
+    return list(range(first, first + len(ends)))
+
+
+def _marked(app, ids) -> int:
+    with app.session_factory() as db:
+        return db.execute(select(func.count()).select_from(BookingRequest).where(BookingRequest.id.in_(ids), BookingRequest.no_show.is_(True))).scalar_one()
+
+
+def test_backlog_is_marked_in_bulk_chunks(app, monkeypatch):
+    monkeypatch.setattr(no_show, "CHUNK", 50)
+    overdue = datetime.utcnow() - timedelta(days=2)
+    backlog = _approved(app, [overdue - timedelta(minutes=n) for n in range(120)])
+    attended = _approved(app, [overdue], checked_in=True)
+    with app.session_factory() as db:
+        before = db.execute(select(func.count()).select_from(Notification)).scalar_one()
+
+    assert mark_no_shows(app.session_factory) >= 120
+    assert _marked(app, backlog) == 120 and _marked(app, attended) == 0
+    with app.session_factory() as db:
+        assert db.execute(select(func.count()).select_from(Notification)).scalar_one() - before >= 120
+    assert mark_no_shows(app.session_factory) == 0
+
+
+def test_timer_tracks_approvals_cancellations_and_check_ins(app, client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=start, end_at=start + timedelta(hours=1), purpose="Timer test", status="pending")
+        db.add(b); db.commit()
+        booking_id = b.id
+    login(client)
+    client.post(f"/admin/booking/{booking_id}/approve")
+    assert app.no_show_timer._deadlines[booking_id] == start + timedelta(hours=1) + GRACE
+
+    client.get("/logout")
+    login(client, "user@example.com", "User123!")
+    client.post(f"/bookings/cancel/{booking_id}")
+    assert booking_id not in app.no_show_timer._deadlines
+
+
+def test_timer_fires_at_the_deadline(app):
+    timer = NoShowTimer(app.session_factory)
+    soon, later = _approved(app, [datetime.utcnow() - GRACE + timedelta(seconds=0.3), datetime.utcnow() + timedelta(hours=1)])
+    timer.schedule(later, datetime.utcnow() + timedelta(hours=1))
+    assert len(timer) == 0  # not running yet
+    timer.start()
+    assert len(timer) == 2
+    try:
+        deadline = time.monotonic() + 5
+        while _marked(app, [soon]) == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        timer.stop()
+    assert _marked(app, [soon]) == 1 and _marked(app, [later]) == 0
+    assert len(timer) == 1
+
+
+def test_timer_marks_only_while_holding_the_lease(app):
+    leader = Lease(app.session_factory, "no-show-test", holder="leader")
+    assert leader.acquire()
+    standby = NoShowTimer(app.session_factory)
+    [standby_due] = _approved(app, [datetime.utcnow() - GRACE + timedelta(seconds=0.2)])
+    standby.start(Lease(app.session_factory, "no-show-test", holder="standby"))
+    try:
+        deadline = time.monotonic() + 1
+        while len(standby) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+    finally:
+        standby.stop()
+    assert len(standby) == 0 and _marked(app, [standby_due]) == 0
+
+    timer = NoShowTimer(app.session_factory)
+    [due] = _approved(app, [datetime.utcnow() - GRACE + timedelta(seconds=0.2)])
+    timer.start(leader)
+    try:
+        deadline = time.monotonic() + 5
+        while _marked(app, [due]) == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        timer.stop()
+    assert _marked(app, [due]) == 1
+
+
+def test_booking_is_marked_at_exactly_its_deadline(app):
+    end = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=1)
+    [booking_id] = _approved(app, [end])
+    assert mark_no_shows(app.session_factory, booking_ids=[booking_id], now=end + GRACE) == 1
+    assert _marked(app, [booking_id]) == 1
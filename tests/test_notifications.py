@@ -0,0 +1,211 @@
+import threading
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import User, Notification, NotificationDelivery
+from app.security import hash_password
+from app.services.notifications import queue_notification, queue_broadcast, NotificationDispatcher
+from app.services.transports import FakeTransport
+
+
+def _session_factory():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, future=True)
+    with Session() as db:
+        db.add(User(name="U", email="u@example.com", password_hash=hash_password("Password123!"), team="T", role="user", status="active", manager_email="m@example.com"))
+        db.commit()
+    return Session
+
+
+def _count(db, *where):
+    return db.execute(select(func.count()).select_from(Notification).where(*where)).scalar_one()
+
+
+def test_outbox_is_written_only_on_commit():
+    Session = _session_factory()
+    with Session() as db:
+        for i in range(3):
+            queue_notification(db, 1, f"hello {i}")
+        assert _count(db) == 0
+        db.commit()
+        assert _count(db) == 3
+
+        queue_notification(db, 1, "discarded")
+        db.rollback()
+        db.commit()
+        assert _count(db) == 3
+
+
+def test_dispatcher_sends_backlog_and_retries_failures():
+    Session = _session_factory()
+    with Session() as db:
+        for i in range(300):
+            queue_notification(db, 1, f"msg {i}")
+        db.commit()
+
+    transport = FakeTransport(failure_rate=0.1, seed=7)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=4, min_batch=10, max_batch=80)
+    try:
+        for _ in range(20):
+            dispatcher.run()
+    finally:
+        dispatcher.shutdown()
+
+    assert len(transport.sent) == 300
+    assert len(set(transport.sent)) == 300
+    with Session() as db:
+        assert _count(db, Notification.sent_at.is_(None)) == 0
+        assert _count(db, Notification.attempts > 0) > 0
+
+
+class _FlakyOnce(FakeTransport):
+    def __init__(self, fail_user_id):
+        super().__init__()
+        self.fail_user_id = fail_user_id
+
+    def send(self, user_id, message):
+        if user_id == self.fail_user_id:
+            self.fail_user_id = None
+            raise ConnectionError("try again")
+        super().send(user_id, message)
+
+
+def test_broadcast_is_one_row_and_reaches_each_approver_once():
+    Session = _session_factory()
+    with Session() as db:
+        for i in range(3):
+            db.add(User(name=f"A{i}", email=f"a{i}@example.com", password_hash="x", team="QA", role="approver", status="active", manager_email="m@example.com"))
+        db.add(User(name="Gone", email="gone@example.com", password_hash="x", team="QA", role="approver", status="rejected", manager_email="m@example.com"))
+        db.commit()
+        queue_broadcast(db, ["approver", "admin"], "New booking request #1 awaiting approval.")
+        db.commit()
+        assert _count(db) == 1
+
+    transport = _FlakyOnce(fail_user_id=3)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=2)
+    try:
+        dispatcher.run()
+        assert sorted(uid for uid, _ in transport.sent) == [2, 4]
+        dispatcher.run()
+    finally:
+        dispatcher.shutdown()
+
+    assert sorted(uid for uid, _ in transport.sent) == [2, 3, 4]
+    with Session() as db:
+        assert _count(db, Notification.sent_at.is_(None)) == 0
+
+
+def test_missed_broadcast_is_retried_after_a_later_one_was_delivered():
+    Session = _session_factory()
+    with Session() as db:
+        for i in range(2):
+            db.add(User(name=f"A{i}", email=f"a{i}@example.com", password_hash="x", team="QA", role="approver", status="active", manager_email="m@example.com"))
+        db.commit()
+        queue_broadcast(db, ["approver"], "first")
+        queue_broadcast(db, ["approver"], "second")
+        db.commit()
+
+    transport = _FlakyOnce(fail_user_id=3)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=2)
+    try:
+        dispatcher.run()
+        assert sorted(transport.sent) == [(2, "first"), (2, "second"), (3, "second")]
+        dispatcher.run()
+    finally:
+        dispatcher.shutdown()
+
+    assert sorted(transport.sent) == [(2, "first"), (2, "second"), (3, "first"), (3, "second")]
+    with Session() as db:
+        assert _count(db, Notification.sent_at.is_(None)) == 0
+        assert db.execute(select(func.count()).select_from(NotificationDelivery)).scalar_one() == 4
+
+
+def test_message_that_keeps_failing_stops_being_claimed():
+    Session = _session_factory()
+    with Session() as db:
+        queue_notification(db, 1, "undeliverable")
+        queue_notification(db, 1, "fine")
+        db.commit()
+
+    transport = FakeTransport(failure_rate=1.0)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=1, max_attempts=3)
+    try:
+        for _ in range(5):
+            dispatcher.run()
+        transport.failure_rate = 0.0
+        dispatcher.run()
+    finally:
+        dispatcher.shutdown()
+
+    assert transport.sent == []
+    with Session() as db:
+        assert _count(db, Notification.attempts == 3) == 2
+        assert dispatcher.claim(10)[1] == []
+
+
+def test_concurrent_dispatchers_never_claim_the_same_row(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}", future=True, connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, future=True)
+    with Session() as db:
+        for i in range(200):
+            queue_notification(db, 1, f"msg {i}")
+        db.commit()
+
+    dispatchers = [NotificationDispatcher(Session, transport=FakeTransport(), workers=1) for _ in range(2)]
+    claimed = [[], []]
+    start = threading.Barrier(2)
+
+    def drain(n):
+        start.wait()
+        while rows := dispatchers[n].claim(7)[1]:
+            claimed[n].extend(r.id for r in rows)
+
+    threads = [threading.Thread(target=drain, args=(n,)) for n in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for d in dispatchers:
+        d.shutdown()
+
+    assert not set(claimed[0]) & set(claimed[1])
+    assert sorted(claimed[0] + claimed[1]) == list(range(1, 201))
+
+
+class _AlwaysFails(FakeTransport):
+    def __init__(self, fail_user_id):
+        super().__init__()
+        self.fail_user_id = fail_user_id
+
+    def send(self, user_id, message):
+        if user_id == self.fail_user_id:
+            raise ConnectionError("mailbox gone")
+        super().send(user_id, message)
+
+
+def test_dead_recipient_does_not_hold_back_later_broadcasts():
+    Session = _session_factory()
+    with Session() as db:
+        for i in range(3):
+            db.add(User(name=f"A{i}", email=f"a{i}@example.com", password_hash="x", team="QA", role="approver", status="active", manager_email="m@example.com"))
+        db.commit()
+        queue_broadcast(db, ["approver"], "first")
+        queue_broadcast(db, ["approver"], "second")
+        db.commit()
+
+    transport = _AlwaysFails(fail_user_id=3)
+    dispatcher = NotificationDispatcher(Session, transport=transport, workers=2, max_attempts=2)
+    try:
+        dispatcher.run()
+        assert sorted(transport.sent) == [(2, "first"), (2, "second"), (4, "first"), (4, "second")]
+        with Session() as db:
+            assert _count(db, Notification.sent_at.is_(None)) == 2
+        dispatcher.run()
+    finally:
+        dispatcher.shutdown()
+
+    assert len(transport.sent) == 4
+    with Session() as db:
+        assert _count(db, Notification.sent_at.is_(None)) == 0
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from app.models import BookingRequest, BookingItem
+from app.services.occupancy import OccupancyMap, SLOT, SLOTS_PER_DAY
+from conftest import login
+
+
+def _empty_map(now: datetime) -> OccupancyMap:
+    occ = OccupancyMap()
+    occ._swap(datetime.combine(now.date() - timedelta(days=7), datetime.min.time()), {})
+    return occ
+
+
+def test_add_remove_keeps_neighbours_sharing_a_slot():
+    day = datetime.combine(datetime.utcnow().date() + timedelta(days=3), datetime.min.time())
+    occ = _empty_map(datetime.utcnow())
+    occ.add(1, [7], day + timedelta(hours=9), day + timedelta(hours=10, minutes=5))
+    occ.add(2, [7], day + timedelta(hours=10, minutes=5), day + timedelta(hours=11))
+
+    assert occ.is_free(7, day + timedelta(hours=8), day + timedelta(hours=9)) is True
+    assert occ.is_free(7, day + timedelta(hours=9, minutes=30), day + timedelta(hours=9, minutes=45)) is False
+    assert occ.is_free(8, day + timedelta(hours=9), day + timedelta(hours=10)) is True
+
+    occ.remove(1)
+    assert occ.is_free(7, day + timedelta(hours=9), day + timedelta(hours=10)) is True
+    # Slot 10:00-10:15 is still touched by booking 2.
+    assert occ.is_free(7, day + timedelta(hours=10), day + timedelta(hours=10) + SLOT) is False
+
+    hours = occ.timeline([7], day.date(), 1, "hour")[7]
+    assert len(hours) == 24 and hours[9] == 0.0 and hours[10] == 1.0 and hours[11] == 0.0
+    assert occ.timeline([7], day.date(), 2)[7] == [round(4 / 96, 3), 0.0]
+    assert occ.is_free(7, day + timedelta(days=200), day + timedelta(days=200, hours=1)) is None
+
+
+def test_built_from_approved_bookings_and_updated_by_events(app, client):
+    start = datetime.combine(datetime.utcnow().date() + timedelta(days=5), datetime.min.time()) + timedelta(hours=14)
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=start, end_at=start + timedelta(hours=2), purpose="Timeline test", status="pending")
+        b.items = [BookingItem(machine_id=5), BookingItem(machine_id=6)]
+        db.add(b); db.commit()
+        booking_id = b.id
+    assert app.occupancy.is_free(5, start, start + timedelta(hours=1)) is True
+
+    login(client)
+    client.post(f"/admin/booking/{booking_id}/approve")
+    assert app.occupancy.is_free(5, start, start + timedelta(hours=1)) is False
+
+    rebuilt = OccupancyMap()
+    with app.session_factory() as db:
+        assert rebuilt.build(db)
+    assert rebuilt.is_free(6, start + timedelta(hours=1), start + timedelta(hours=2)) is False
+
+    r = client.get(f"/admin/timeline.json?from={start.date()}&days=1&resolution=hour&q=TM-005&start={start.isoformat()}&end={(start + timedelta(hours=1)).isoformat()}")
+    assert r.status_code == 200
+    [row] = r.get_json()["machines"]
+    assert row["id"] == 5 and row["free"] is False and row["occupancy"][14:16] == [1.0, 1.0]
+    assert client.get("/admin/timeline").status_code == 200
+    r = client.get(f"/admin/timeline.json?q=TM-005&start={start.isoformat()}Z&end={(start + timedelta(hours=3)).isoformat()}%2B02:00")
+    assert r.status_code == 200 and r.get_json()["machines"][0]["free"] is False
+    assert client.get("/admin/timeline.json?start=soon&end=later").status_code == 400
+    horizon = app.occupancy.origin.date() + timedelta(days=app.occupancy.slots // SLOTS_PER_DAY)
+    r = client.get(f"/admin/timeline.json?from={horizon - timedelta(days=3)}&days=28&q=TM-005").get_json()
+    assert r["days"] == 3 and len(r["machines"][0]["occupancy"]) == 3
+
+    client.get("/logout")
+    login(client, "user@example.com", "User123!")
+    assert client.get("/admin/timeline.json").status_code == 403
+    client.post(f"/bookings/cancel/{booking_id}")
+    assert app.occupancy.is_free(5, start, start + timedelta(hours=2)) is True
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from app.models import BookingRequest
+from app.services import queries
+from app.services.pagination import PageRequest, encode_cursor
+from conftest import login
+
+
+def test_keyset_pages_cover_every_row_once_in_both_directions(app):
+    with app.session_factory() as db:
+        seen, page = [], queries.search_machines(db, page=PageRequest(per_page=30))
+        assert not page.has_prev
+        while True:
+            seen += [m.name for m in page]
+            if not page.has_next:
+                break
+            page = queries.search_machines(db, page=PageRequest(per_page=30, after=page.next_cursor))
+        assert seen == sorted(seen) and len(seen) == len(set(seen)) == 100
+
+        back = []
+        while page.has_prev:
+            page = queries.search_machines(db, page=PageRequest(per_page=30, before=page.prev_cursor))
+            back = [m.name for m in page] + back
+        assert back == seen[:len(back)] and len(back) == 90
+
+
+def test_my_bookings_paginates_on_start_and_id(app, client):
+    # identical start times force the id tie-breaker
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+    with app.session_factory() as db:
+        db.add_all([BookingRequest(requester_id=1, start_at=start, end_at=start + timedelta(hours=1), purpose=f"p{i}") for i in range(7)])
+        db.commit()
+    login(client)
+
+    with app.session_factory() as db:
+        first = queries.bookings_for_user(db, 1, PageRequest(per_page=5))
+    assert len(first) == 5 and first.has_next
+
+    r = client.get(f"/bookings/my?per_page=5&after={first.next_cursor}")
+    assert r.status_code == 200
+    assert r.data.count(b"<td>#") == 2
+
+    r = client.get("/bookings/my?after=not-a-cursor")
+    assert r.status_code == 200 and r.data.count(b"<td>#") == 7
+
+    # Well-formed JSON of the wrong shape falls back to the first page too.
+    for bad in ([1, 2], [[1], 2], [{"a": 1}, 2]):
+        token = encode_cursor(bad)
+        r = client.get(f"/bookings/my?after={token}")
+        assert r.status_code == 200 and r.data.count(b"<td>#") == 7
+
+    # So does a forged cursor whose id is not an integer, or whose start is not a date.
+    iso = start.isoformat()
+    for bad in ([iso, "1 OR 1=1"], [iso, 2.5], [iso, True], [iso, None], [17, 1]):
+        r = client.get(f"/bookings/my?after={encode_cursor(bad)}")
+        assert r.status_code == 200 and r.data.count(b"<td>#") == 7
@@ -0,0 +1,53 @@
+import pytest
+from app.models import User
+from app.security import hash_password, needs_rehash
+from app.services.hashing import PasswordHasher, HasherBusy
+from conftest import login
+
+
+def test_needs_rehash_compares_full_cost_parameters():
+    old = hash_password("Secret123!", method="pbkdf2:sha256:2000")
+    assert needs_rehash(old, "pbkdf2:sha256:1000")
+    assert not needs_rehash(old, "pbkdf2:sha256:2000")
+    assert not needs_rehash(hash_password("x", method="scrypt"), "scrypt:32768:8:1")
+
+
+def test_login_rehashes_with_the_configured_parameters(app, client):
+    with app.session_factory() as db:
+        db.get(User, 3).password_hash = hash_password("User123!", method="pbkdf2:sha256:2000")
+        db.commit()
+
+    assert login(client, "user@example.com", "User123!").status_code == 302
+    with app.session_factory() as db:
+        assert db.get(User, 3).password_hash.startswith("pbkdf2:sha256:1000$")
+
+
+def test_process_pool_hashes_and_busy_logins_degrade(app, client):
+    pooled = PasswordHasher(workers=1, method="pbkdf2:sha256:1000")
+    try:
+        stored = pooled.hash("Pool123!")
+        assert pooled.verify(stored, "Pool123!") and not pooled.verify(stored, "wrong")
+        assert pooled.stats()["completed"] == 3
+    finally:
+        pooled.shutdown()
+
+    app.password_hasher = PasswordHasher(workers=0, max_pending=1, queue_timeout=0.01)
+    app.password_hasher._slots.acquire()  # another login holds the only slot
+    with pytest.raises(HasherBusy):
+        app.password_hasher.verify(stored, "Pool123!")
+    assert login(client).status_code == 503
+    assert app.password_hasher.stats()["rejected"] == 2
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    pooled = PasswordHasher(workers=1, method="pbkdf2:sha256:1000")
+    try:
+        stored = pooled.hash("Pool123!")
+        broken = pooled._pool
+        for proc in list(broken._processes.values()):
+            proc.kill()
+        assert pooled.verify(stored, "Pool123!")
+        assert pooled._pool is not broken
+        assert pooled.stats()["wait_ms_p50"] is not None
+    finally:
+        pooled.shutdown()
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from app.models import BookingRequest, BookingItem
+from conftest import assert_max_queries, login
+
+
+def _make_bookings(app, n=30):
+    start = datetime.utcnow() + timedelta(days=1)
+    with app.session_factory() as db:
+        for i in range(n):
+            b = BookingRequest(requester_id=1, start_at=start + timedelta(hours=i), end_at=start + timedelta(hours=i + 1),
+                               purpose="Regression", status="pending" if i % 2 else "approved")
+            db.add(b); db.flush()
+            db.add_all([BookingItem(booking_id=b.id, machine_id=1 + i % 7), BookingItem(booking_id=b.id, machine_id=50 + i % 5)])
+        db.commit()
+
+
+def test_pages_stay_within_query_budget(app, client):
+    _make_bookings(app)
+    login(client)
+
+    with assert_max_queries(app.engine, 3):
+        r = client.get("/bookings/my")
+    assert r.status_code == 200 and b"TM-001" in r.data
+
+    with assert_max_queries(app.engine, 10):
+        r = client.get("/admin/dashboard?status=approved")
+    assert r.status_code == 200 and b"admin@example.com" in r.data
+
+    # aggregates now come from the dashboard cache
+    with assert_max_queries(app.engine, 5):
+        r = client.get("/admin/dashboard?status=approved")
+    assert r.status_code == 200
+
+    with assert_max_queries(app.engine, 3):
+        r = client.get("/admin/export/bookings.csv")
+    assert r.status_code == 200 and r.data.count(b"\n") == 31
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from app.models import BookingRequest, BookingItem, Machine
+from conftest import count_queries, login
+
+
+def test_site_stats_is_one_query_and_refreshes_after_toggle(app, client):
+    now = datetime.utcnow()
+    with app.session_factory() as db:
+        b = BookingRequest(requester_id=3, start_at=now - timedelta(hours=1), end_at=now + timedelta(hours=1), purpose="Now", status="approved")
+        db.add(b); db.flush()
+        db.add(BookingItem(booking_id=b.id, machine_id=1))
+        db.commit()
+        site_of_1 = db.get(Machine, 1).site_id
+    login(client)
+
+    with count_queries(app.engine) as q:
+        sites = client.get("/map/stats.json").get_json()["sites"]
+    assert q.count == 2  # version stamp + the grouped aggregate; the user comes from the identity cache
+    assert sum(s["total_machines"] for s in sites) == 100
+    assert next(s for s in sites if s["id"] == site_of_1)["booked_now"] == 1
+
+    with count_queries(app.engine) as q:
+        assert client.get("/map/").status_code == 200
+    assert q.count == 1  # version stamp, stats served from cache
+
+    before = sum(s["out_of_service"] for s in sites)
+    client.post("/admin/machines/1/toggle_oos")
+    after = sum(s["out_of_service"] for s in client.get("/map/stats.json").get_json()["sites"])
+    assert abs(after - before) == 1
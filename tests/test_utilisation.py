@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import select
+from app.models import Site, Machine, User, BookingRequest, BookingItem
+from app.services.utilisation import booking_days, rebuild_utilisation_rollup, refresh_utilisation_rollup, utilisation_last_days
+from conftest import login
+
+
+def test_booking_days_excludes_midnight_end():
+    start = datetime(2026, 5, 1, 22, 0)
+    assert booking_days(start, datetime(2026, 5, 2, 0, 0)) == [start.date()]
+    assert len(booking_days(start, datetime(2026, 5, 3, 1, 0))) == 3
+
+
+def test_rollup_clips_bookings_at_the_window_edge(app, client):
+    midnight = datetime.combine(datetime.utcnow().date(), time.min)
+    edge = midnight - timedelta(days=6)  # first day of the 7-day window
+
+    with app.session_factory() as db:
+        site_id = db.execute(select(Site.id).limit(1)).scalar_one()
+        requester_id = db.execute(select(User.id).where(User.email == "user@example.com")).scalar_one()
+        m = Machine(name="TM-ROLLUP", machine_type="lab", category="Rollup probe", status="available", site_id=site_id)
+        db.add(m); db.flush()
+        b = BookingRequest(requester_id=requester_id, start_at=edge - timedelta(hours=3), end_at=edge + timedelta(hours=5), purpose="x", status="approved")
+        db.add(b); db.flush()
+        db.add(BookingItem(booking_id=b.id, machine_id=m.id))
+        db.commit()
+        booking_id, machine_id = b.id, m.id
+        rebuild_utilisation_rollup(db)
+
+    def hours(days):
+        with app.session_factory() as db:
+            util = utilisation_last_days(db, days=days, limit=10_000)
+        by_machine = {r["machine_id"]: r["hours"] for r in util["by_machine"]}
+        by_category = {r["category"]: r["hours"] for r in util["by_category"]}
+        return by_machine.get(machine_id), by_category.get("Rollup probe")
+
+    assert hours(7) == (5.0, 5.0)
+    assert hours(30) == (8.0, 8.0)
+
+    # Cancelling marks the booking's cells dirty through the booking.cancelled handler.
+    login(client, "user@example.com", "User123!")
+    client.post(f"/bookings/cancel/{booking_id}")
+    assert refresh_utilisation_rollup(app.session_factory) >= 2
+    assert hours(30) == (None, None)